@@ -0,0 +1,55 @@
+# assets.py
+
+import glob
+import os
+
+from PIL import Image
+
+import config
+
+_loaded = {}  # (path, size) -> decoded image, shared by light and dark mode
+
+
+def load_image(path, size):
+    """
+    Return the image at `path` scaled to `size` (width, height in pixels).
+
+    Scaled copies are cached on disk under config.ASSET_CACHE_DIR, keyed by the
+    source file's mtime and the target size, so later starts decode a small
+    pre-scaled file instead of the full-resolution original. Within a run each
+    (path, size) is decoded once.
+    """
+    size = (int(size[0]), int(size[1]))
+    key = (path, size)
+    if key in _loaded:
+        return _loaded[key]
+
+    stem, ext = os.path.splitext(os.path.basename(path))
+    mtime = os.stat(path).st_mtime_ns
+    cached = os.path.join(config.ASSET_CACHE_DIR, f"{stem}-{size[0]}x{size[1]}-{mtime}{ext}")
+    if os.path.exists(cached):
+        image = Image.open(cached)
+        image.load()
+    else:
+        image = _scale(path, size)
+        _store(image, cached, f"{stem}-{size[0]}x{size[1]}-*{ext}")
+    _loaded[key] = image
+    return image
+
+
+def _scale(path, size):
+    source = Image.open(path)
+    # JPEG can decode straight at a reduced scale, skipping most of the full-size work
+    source.draft(source.mode, size)
+    return source.resize(size, Image.LANCZOS)
+
+
+def _store(image, cached, pattern):
+    """Write the scaled copy and drop copies made from older versions of the source."""
+    try:
+        os.makedirs(config.ASSET_CACHE_DIR, exist_ok=True)
+        for old in glob.glob(os.path.join(config.ASSET_CACHE_DIR, pattern)):
+            os.remove(old)
+        image.save(cached)
+    except OSError as e:
+        print(f"Could not cache scaled image: {e}")
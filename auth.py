@@ -1,8 +1,7 @@
 import customtkinter as ctk
 import tkinter.messagebox as messagebox
-from PIL import Image
-from database import Database
-from ui import BloodBankUI
+from assets import load_image
+from storage import open_database
 
 
 class AdminLogin:
@@ -10,7 +9,7 @@ class AdminLogin:
         self.root = root
         self.root.title("Admin Login")
         self.root.geometry("1000x700")  # Increased window size
-        self.db = Database()
+        self.db = open_database()
 
         # Configure grid weights to center content
         self.root.grid_columnconfigure(0, weight=1)
@@ -19,17 +18,19 @@ class AdminLogin:
 
         self.create_widgets()
 
+    def load_ctk_image(self, path, size):
+        """One pre-scaled image used for both light and dark mode."""
+        scaling = ctk.ScalingTracker.get_widget_scaling(self.root)
+        image = load_image(path, (size[0] * scaling, size[1] * scaling))
+        return ctk.CTkImage(light_image=image, dark_image=image, size=size)
+
     def create_widgets(self):
         main_frame = ctk.CTkFrame(self.root, fg_color="transparent")
         main_frame.grid(row=0, column=1, sticky="nsew")
 
         # Left image
         try:
-            left_image = ctk.CTkImage(
-                light_image=Image.open("assets/left.jpg"),
-                dark_image=Image.open("assets/left.jpg"),
-                size=(250, 700),
-            )
+            left_image = self.load_ctk_image("assets/left.jpg", (250, 700))
             left_label = ctk.CTkLabel(self.root, image=left_image, text="")
             left_label.grid(row=0, column=0, sticky="nsew")
         except:
@@ -37,11 +38,7 @@ class AdminLogin:
 
         # Right image
         try:
-            right_image = ctk.CTkImage(
-                light_image=Image.open("assets/right.jpg"),
-                dark_image=Image.open("assets/right.jpg"),
-                size=(250, 700),
-            )
+            right_image = self.load_ctk_image("assets/right.jpg", (250, 700))
             right_label = ctk.CTkLabel(self.root, image=right_image, text="")
             right_label.grid(row=0, column=2, sticky="nsew")
         except:
@@ -49,11 +46,7 @@ class AdminLogin:
 
         # Logo at the top
         try:
-            logo_image = ctk.CTkImage(
-                light_image=Image.open("assets/logo.png"),
-                dark_image=Image.open("assets/logo.png"),
-                size=(150, 150),
-            )
+            logo_image = self.load_ctk_image("assets/logo.png", (150, 150))
             logo_label = ctk.CTkLabel(main_frame, image=logo_image, text="")
             logo_label.pack(pady=(50, 40))
         except:
@@ -122,7 +115,11 @@ class AdminLogin:
         # Authenticate credentials
         if self.db.authenticate_admin(username, password):
             messagebox.showinfo("Login Successful", "Welcome!")
+            self.db.close_connection()  # Hand the connection back to the pool
             self.root.destroy()  # Close login window
+            # Imported only now, so the login window doesn't wait for the main UI to load
+            from ui import BloodBankUI
+
             # Open main application window
             main_window = ctk.CTk()
             BloodBankUI(main_window)
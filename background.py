@@ -0,0 +1,212 @@
+# background.py
+
+import queue
+import threading
+import tkinter as tk
+from concurrent.futures import Future, ThreadPoolExecutor
+from tkinter import messagebox
+
+import config
+from storage import open_database
+
+
+class DatabaseWorker:
+    """
+    Runs Database calls on background threads and hands the results back on
+    the Tk thread, so a slow query never freezes the UI.
+
+    Each worker thread checks out its own pooled Database. A task is a callable
+    that takes that Database as its first argument:
+
+        worker.submit(lambda db: db.fetch_all_blood_records(), on_success=show)
+
+    Tasks submitted with an `owner` window are cancelled when that window is
+    destroyed, and their results are dropped if they finish afterwards.
+
+    Long jobs such as exports use start_job() instead, which gives them a
+    thread and connection of their own so they don't hold up short queries.
+    """
+
+    def __init__(self, root, on_busy=None):
+        self.root = root
+        self.on_busy = on_busy  # called with True/False when work starts/stops
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.DB_WORKER_THREADS, thread_name_prefix="db-worker"
+        )
+        self._local = threading.local()
+        self._databases = []
+        self._databases_lock = threading.Lock()
+        self._done = queue.Queue()  # futures finished on worker threads
+        self._progress = queue.Queue()  # (future, callback, args) posted by jobs
+        self._pending = {}  # future -> (owner, on_success, on_error)
+        self._jobs = {}  # future -> threading.Event set to ask a job to stop
+        self._watched = set()  # owner windows with a <Destroy> binding
+        self._quiet = set()  # pending futures that don't count as busy
+        self._poll_id = None
+        self._busy = False
+        self._closed = False
+
+    def _database(self):
+        """The calling worker thread's own Database."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = open_database()
+            self._local.db = db
+            with self._databases_lock:
+                self._databases.append(db)
+        return db
+
+    def _run(self, task, args):
+        return task(self._database(), *args)
+
+    def submit(self, task, *args, on_success=None, on_error=None, owner=None, quiet=False):
+        """
+        Queue task(db, *args) on a worker thread.
+        on_success(result) or on_error(exception) is later called on the Tk thread.
+        Errors without an on_error handler are shown in a message box.
+        Quiet tasks (background polling) don't show the busy indicator.
+        """
+        if self._closed:
+            return None
+        future = self._executor.submit(self._run, task, args)
+        self._pending[future] = (owner, on_success, on_error)
+        if quiet:
+            self._quiet.add(future)
+        if owner is not None:
+            self._watch(owner)
+        future.add_done_callback(self._done.put)
+        self._set_busy(self._has_visible_work())
+        self._schedule_poll()
+        return future
+
+    def start_job(self, job, *args, on_progress=None, on_success=None, on_error=None, owner=None):
+        """
+        Run job(db, report, cancelled, *args) on a dedicated thread with its own
+        Database. The job calls report(*values) to have on_progress(*values) run
+        on the Tk thread, and should stop early once cancelled() returns True,
+        which happens when its owner window is destroyed.
+        """
+        if self._closed:
+            return None
+        future = Future()
+        stop = threading.Event()
+        self._pending[future] = (owner, on_success, on_error)
+        self._jobs[future] = stop
+        if owner is not None:
+            self._watch(owner)
+
+        def report(*values):
+            if on_progress is not None:
+                self._progress.put((future, on_progress, values))
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            db = open_database()
+            try:
+                future.set_result(job(db, report, stop.is_set, *args))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                db.close_connection()
+
+        future.add_done_callback(self._done.put)
+        threading.Thread(target=run, name="db-job", daemon=True).start()
+        self._set_busy(True)
+        self._schedule_poll()
+        return future
+
+    def cancel(self, owner):
+        """Cancel queued tasks belonging to owner; running ones have their results dropped."""
+        for future, (task_owner, _, _) in list(self._pending.items()):
+            if task_owner is owner:
+                future.cancel()
+                if future in self._jobs:
+                    self._jobs[future].set()
+        self._watched.discard(owner)
+
+    def _watch(self, owner):
+        if owner in self._watched:
+            return
+        self._watched.add(owner)
+
+        def on_destroy(event):
+            if event.widget is owner:
+                self.cancel(owner)
+
+        owner.bind("<Destroy>", on_destroy, add="+")
+
+    def _schedule_poll(self):
+        if self._poll_id is None and not self._closed:
+            self._poll_id = self.root.after(config.DB_WORKER_POLL_MS, self._poll)
+
+    def _poll(self):
+        """Deliver finished tasks on the Tk thread; keep polling while work is pending."""
+        self._poll_id = None
+        while True:
+            try:
+                future, callback, values = self._progress.get_nowait()
+            except queue.Empty:
+                break
+            owner = self._pending.get(future, (None,))[0]
+            if future in self._pending and _alive(owner):
+                callback(*values)
+        while True:
+            try:
+                future = self._done.get_nowait()
+            except queue.Empty:
+                break
+            self._deliver(future)
+        self._set_busy(self._has_visible_work())
+        if self._pending:
+            self._schedule_poll()
+
+    def _deliver(self, future):
+        owner, on_success, on_error = self._pending.pop(future, (None, None, None))
+        self._jobs.pop(future, None)
+        self._quiet.discard(future)
+        if future.cancelled() or not _alive(owner):
+            return
+        error = future.exception()
+        if error is not None:
+            if on_error is not None:
+                on_error(error)
+            else:
+                messagebox.showerror("Database Error", str(error))
+        elif on_success is not None:
+            on_success(future.result())
+
+    def _has_visible_work(self):
+        return any(future not in self._quiet for future in self._pending)
+
+    def _set_busy(self, busy):
+        if busy != self._busy:
+            self._busy = busy
+            if self.on_busy is not None:
+                self.on_busy(busy)
+
+    def shutdown(self):
+        """Drop queued work, wait for running tasks and return every connection to the pool."""
+        self._closed = True
+        for stop in self._jobs.values():
+            stop.set()
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._pending.clear()
+        self._quiet.clear()
+        with self._databases_lock:
+            for db in self._databases:
+                db.close_connection()
+            self._databases.clear()
+
+
+def _alive(widget):
+    """True if widget is None (no owner) or still exists."""
+    if widget is None:
+        return True
+    try:
+        return bool(widget.winfo_exists())
+    except tk.TclError:
+        return False
@@ -0,0 +1,89 @@
+# benchmarks/batch_request.py
+"""
+Cost of filling multi-group hospital orders all or nothing with
+process_batch_request, against calling process_request + add_transaction
+once per line inside one transaction.
+
+    python -m benchmarks.batch_request --orders 200 --lines 4
+
+process_batch_request is there for atomicity, not speed: it checks every
+line before writing any and fails the whole order on a short group. This
+shows what that costs per order.
+
+This writes stock and ledger rows to the configured database, so point
+config.py at a scratch database first.
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from config import BLOOD_GROUPS
+from storage import open_database
+
+
+def make_orders(count, lines, seed):
+    rng = random.Random(seed)
+    return [
+        [(group, rng.randint(1, 3)) for group in rng.sample(BLOOD_GROUPS, lines)]
+        for _ in range(count)
+    ]
+
+
+def top_up(db, orders):
+    """Add enough stock for every order to succeed."""
+    needed = {}
+    for order in orders:
+        for group, units in order:
+            needed[group] = needed.get(group, 0) + units
+    db.apply_stock_deltas(needed)
+
+
+def run_loop(db, orders):
+    for order in orders:
+        with db.transaction():
+            for group, units in order:
+                success, msg, _ = db.process_request(group, units)
+                if not success:
+                    raise RuntimeError(msg)
+                db.add_transaction("benchmark", group, units, "REQUEST")
+
+
+def run_batch(db, orders):
+    for order in orders:
+        success, msg, _ = db.process_batch_request("benchmark", order)
+        if not success:
+            raise RuntimeError(msg)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark batch order processing.")
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=4, help="blood groups per order")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    db = open_database()
+    try:
+        orders = make_orders(args.orders, args.lines, args.seed)
+        results = {}
+        for label, run in (("process_request loop", run_loop), ("process_batch_request", run_batch)):
+            top_up(db, orders)
+            started = time.perf_counter()
+            run(db, orders)
+            elapsed = time.perf_counter() - started
+            results[label] = elapsed
+            print(
+                f"{label:24} {args.orders / elapsed:8.1f} orders/s"
+                f"  {elapsed / args.orders * 1000:7.2f} ms/order"
+            )
+        cost = results["process_batch_request"] / results["process_request loop"]
+        print(f"batch takes {cost:.2f}x the loop's time per order")
+    finally:
+        db.close_connection()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+# benchmarks/data_layer.py
+"""
+Latency of every data layer method at several dataset sizes.
+
+    python -m benchmarks.data_layer                       sqlite, 10k and 100k transactions
+    python -m benchmarks.data_layer --sizes 10k,1M,10M --repeat 200
+    python -m benchmarks.data_layer --save-baseline       record the numbers to compare against
+    python -m benchmarks.data_layer --backend mysql       the database in config.py (emptied!)
+
+Each size gets its own synthetic dataset (benchmarks.datagen, same seed every
+time). With the sqlite backend the datasets are files under benchmarks/data/,
+built on first use and copied for each run; nothing touches the network. With
+the mysql backend the configured database is emptied and refilled per size,
+so point config.py at a scratch database on the local machine.
+
+Every call is timed on its own and reported as p50/p95/p99 in milliseconds.
+If a baseline exists for the backend, each result is compared with it and the
+run exits non-zero when a p95 grew by more than --tolerance.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import time
+
+import config
+import migrate
+from benchmarks import datagen
+from storage import open_database
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, "data")
+BASELINE_DIR = os.path.join(HERE, "baselines")
+
+PAGE_SIZE = config.HISTORY_PAGE_SIZE
+WARMUP_CALLS = 3
+NOISE_FLOOR_MS = 0.05  # p95 changes smaller than this are never reported as regressions
+
+
+class Context:
+    """What the benchmark cases need to know about the dataset."""
+
+    def __init__(self, db, rng, years):
+        cursor = db.connection.cursor()
+        cursor.execute("SELECT MIN(id), MAX(id) FROM Donors")
+        self.min_donor_id, self.max_donor_id = cursor.fetchone()
+        cursor.execute("SELECT MAX(id) FROM BloodTransactions")
+        (self.max_transaction_id,) = cursor.fetchone()
+        cursor.close()
+        self.rng = rng
+        self.end_date = datagen.DEFAULT_END_DATE
+        self.mid_date = self.end_date - datetime.timedelta(days=years * 365 // 2)
+        self.registered = []  # donors added by register_donor, removed by delete_donor
+        self.change_position, _ = db.changes_since(None)
+
+    def group(self):
+        return self.rng.choice(config.BLOOD_GROUPS)
+
+    def prefix(self):
+        return self.rng.choice(datagen.FIRST_NAMES)[:2]
+
+    def name(self):
+        return datagen.random_name(self.rng)
+
+    def donor_id(self):
+        return self.rng.randint(self.min_donor_id, self.max_donor_id)
+
+
+def _register(db, ctx):
+    ctx.registered.append(db.register_donor(ctx.name(), ctx.group(), "0200000000", ctx.end_date))
+
+
+def _delete(db, ctx):
+    if ctx.registered:
+        db.delete_donor(ctx.registered.pop())
+
+
+def _insert_transactions(db, ctx):
+    rows = [(ctx.name(), ctx.group(), 1, ctx.end_date, "DONATION") for _ in range(1000)]
+    with db.transaction():
+        db.insert_transactions(rows)
+
+
+def _stream_all(db, ctx):
+    for _ in db.stream_rows("transactions", config.EXPORT_BATCH_SIZE):
+        pass
+
+
+# (label, call, whole_table). Cases that read a whole table run fewer times.
+CASES = [
+    ("fetch_all_blood_records", lambda db, ctx: db.fetch_all_blood_records(), False),
+    ("get_units_for_blood_group", lambda db, ctx: db.get_units_for_blood_group(ctx.group()), False),
+    ("add_donation", lambda db, ctx: db.add_donation(ctx.group(), 1), False),
+    ("discard_expired_batches", lambda db, ctx: db.discard_expired_batches(), False),
+    ("process_request", lambda db, ctx: db.process_request(ctx.group(), 1), False),
+    (
+        "process_compatible_request (plan only)",
+        lambda db, ctx: db.process_compatible_request("Benchmark", ctx.group(), 50, apply=False),
+        False,
+    ),
+    (
+        "process_batch_request (3 groups)",
+        lambda db, ctx: db.process_batch_request(
+            "Benchmark", [(g, 1) for g in ctx.rng.sample(config.BLOOD_GROUPS, 3)]
+        ),
+        False,
+    ),
+    (
+        "add_transaction",
+        lambda db, ctx: db.add_transaction(ctx.name(), ctx.group(), 1, "DONATION"),
+        False,
+    ),
+    (
+        "authenticate_admin",
+        lambda db, ctx: db.authenticate_admin("benchmark", "not-the-password"),
+        False,
+    ),
+    ("changes_since", lambda db, ctx: db.changes_since(ctx.change_position), False),
+    ("register_donor", _register, False),
+    ("delete_donor", _delete, False),
+    ("search_donors", lambda db, ctx: db.search_donors(ctx.prefix()), False),
+    ("get_donor", lambda db, ctx: db.get_donor(ctx.donor_id()), False),
+    ("get_donor_details", lambda db, ctx: db.get_donor_details(ctx.name()), False),
+    (
+        "fetch_full_donor_list (name)",
+        lambda db, ctx: db.fetch_full_donor_list(name=ctx.prefix()),
+        False,
+    ),
+    (
+        "fetch_full_donor_list (blood group)",
+        lambda db, ctx: db.fetch_full_donor_list(blood_group=ctx.group()),
+        True,
+    ),
+    ("fetch_donors", lambda db, ctx: db.fetch_donors(), True),
+    (
+        "fetch_transaction_history (first page)",
+        lambda db, ctx: db.fetch_transaction_history(limit=PAGE_SIZE),
+        False,
+    ),
+    (
+        "fetch_transaction_history (deep page)",
+        lambda db, ctx: db.fetch_transaction_history(
+            after=(ctx.mid_date, ctx.max_transaction_id), limit=PAGE_SIZE
+        ),
+        False,
+    ),
+    (
+        "fetch_transaction_history (type)",
+        lambda db, ctx: db.fetch_transaction_history(transaction_type="REQUEST", limit=PAGE_SIZE),
+        False,
+    ),
+    (
+        "fetch_transaction_history (blood group)",
+        lambda db, ctx: db.fetch_transaction_history(blood_group=ctx.group(), limit=PAGE_SIZE),
+        False,
+    ),
+    (
+        "fetch_transaction_history (name)",
+        lambda db, ctx: db.fetch_transaction_history(name=ctx.prefix(), limit=PAGE_SIZE),
+        False,
+    ),
+    (
+        "fetch_transaction_history (one month)",
+        lambda db, ctx: db.fetch_transaction_history(
+            start_date=ctx.mid_date,
+            end_date=ctx.mid_date + datetime.timedelta(days=30),
+            limit=PAGE_SIZE,
+        ),
+        False,
+    ),
+    (
+        "fetch_daily_totals (one month)",
+        lambda db, ctx: db.fetch_daily_totals(ctx.mid_date, ctx.mid_date + datetime.timedelta(days=30)),
+        False,
+    ),
+    (
+        "fetch_monthly_totals (one year)",
+        lambda db, ctx: db.fetch_monthly_totals(ctx.end_date - datetime.timedelta(days=364), ctx.end_date),
+        False,
+    ),
+    ("insert_transactions (1000 rows)", _insert_transactions, False),
+    ("count_rows", lambda db, ctx: db.count_rows("transactions"), False),
+    ("stream_rows (all transactions)", _stream_all, True),
+]
+
+
+def percentiles(samples):
+    """p50, p95 and p99 of a list of at least two timings."""
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+def run_cases(db, ctx, repeat):
+    results = {}
+    for label, call, whole_table in CASES:
+        times = max(repeat // 10, 3) if whole_table else repeat
+        for _ in range(WARMUP_CALLS):
+            call(db, ctx)
+        samples = []
+        for _ in range(times):
+            started = time.perf_counter()
+            call(db, ctx)
+            samples.append((time.perf_counter() - started) * 1000)
+        results[label] = percentiles(samples)
+    return results
+
+
+def _remove_sqlite_file(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def open_dataset(backend, transactions, donors, years, seed, regenerate):
+    """
+    Point config at a fresh copy of the dataset for this size and open it.
+    The write cases add rows, so every run starts from the same data: sqlite
+    datasets are built once and copied, mysql ones are rebuilt.
+    """
+    if backend == "sqlite":
+        os.makedirs(DATA_DIR, exist_ok=True)
+        path = os.path.join(DATA_DIR, f"bench-{transactions}-{donors}-{years}y-seed{seed}.db")
+        if regenerate:
+            _remove_sqlite_file(path)
+        config.DB_BACKEND = "sqlite"
+        if not os.path.exists(path):
+            config.SQLITE_PATH = path
+            db = open_database()
+            try:
+                migrate.apply_migrations(db)
+                datagen.populate(db, donors, transactions, years=years, seed=seed)
+            finally:
+                db.close_connection()  # the last connection to close folds the WAL into the file
+        working = os.path.join(DATA_DIR, "run.db")
+        _remove_sqlite_file(working)
+        shutil.copyfile(path, working)
+        config.SQLITE_PATH = working
+        return open_database()
+
+    config.DB_BACKEND = "mysql"
+    db = open_database()
+    migrate.apply_migrations(db)
+    datagen.reset(db)
+    datagen.populate(db, donors, transactions, years=years, seed=seed)
+    return db
+
+
+def baseline_path(backend):
+    return os.path.join(BASELINE_DIR, f"data_layer-{backend}.json")
+
+
+def compare(results, baseline, tolerance):
+    """Return (size, label, old p95, new p95) for every p95 that grew beyond tolerance."""
+    regressions = []
+    for size, cases in results.items():
+        for label, stats in cases.items():
+            old = baseline.get(size, {}).get(label)
+            if old is None:
+                continue
+            grew = stats["p95"] - old["p95"]
+            if stats["p95"] > old["p95"] * (1 + tolerance) and grew > NOISE_FLOOR_MS:
+                regressions.append((size, label, old["p95"], stats["p95"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the data layer at several sizes.")
+    parser.add_argument("--backend", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--sizes", default="10k,100k", help="transaction counts, e.g. 10k,1M,10M")
+    parser.add_argument("--donors-per-transaction", type=float, default=0.1)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=50, help="timed calls per method")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--regenerate", action="store_true", help="rebuild sqlite datasets")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="allowed p95 growth (0.25 = 25%%)"
+    )
+    args = parser.parse_args(argv)
+
+    results = {}
+    for size in [datagen.parse_count(s) for s in args.sizes.split(",")]:
+        donors = max(int(size * args.donors_per_transaction), 100)
+        print(f"\n== {size:,} transactions, {donors:,} donors ({args.backend}) ==")
+        db = open_dataset(args.backend, size, donors, args.years, args.seed, args.regenerate)
+        try:
+            ctx = Context(db, random.Random(args.seed), args.years)
+            cases = run_cases(db, ctx, args.repeat)
+        finally:
+            db.close_connection()
+        print(f"{'method':42} {'p50':>9} {'p95':>9} {'p99':>9}  (ms)")
+        for label, stats in cases.items():
+            print(f"{label:42} {stats['p50']:9.3f} {stats['p95']:9.3f} {stats['p99']:9.3f}")
+        results[str(size)] = cases
+
+    path = baseline_path(args.backend)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "recorded": datetime.datetime.now().isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "sqlite": sqlite3.sqlite_version,
+                    "machine": platform.platform(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"\nBaseline saved to {path}")
+        return 0
+
+    if not os.path.exists(path):
+        print("\nNo baseline yet; run with --save-baseline to record one.")
+        return 0
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline["results"], args.tolerance)
+    for size, label, old, new in regressions:
+        print(f"REGRESSION {int(size):,} rows, {label}: p95 {old:.3f} -> {new:.3f} ms")
+    if regressions:
+        return 1
+    print(f"\nNo p95 regressions against the baseline from {baseline['recorded']}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
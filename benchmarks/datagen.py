@@ -0,0 +1,212 @@
+# benchmarks/datagen.py
+"""
+Reproducible synthetic data for benchmarks: donors with a realistic blood
+group mix, years of transactions and live stock batches.
+
+    python -m benchmarks.datagen --transactions 1000000
+    python -m benchmarks.datagen --transactions 10000 --donors 2000 --years 3 --seed 7
+
+Rows go into the database config.py points at, through the same batched
+insert methods bulk_import.py uses. The same arguments always produce the
+same rows (stock batches are dated back from today). Existing rows are kept unless --reset is given, which empties the
+tables first, so use a scratch database.
+"""
+
+import argparse
+import datetime
+import random
+import sys
+import time
+
+import config
+from storage import open_database
+
+# Approximate share of each blood group among donors
+BLOOD_GROUP_WEIGHTS = {
+    "O+": 37.4,
+    "A+": 35.7,
+    "B+": 8.5,
+    "O-": 6.6,
+    "A-": 6.3,
+    "AB+": 3.4,
+    "B-": 1.5,
+    "AB-": 0.6,
+}
+
+FIRST_NAMES = (
+    "Ama", "Kofi", "Jane", "John", "Amina", "Kwame", "Maria", "David", "Fatima", "Peter",
+    "Grace", "Samuel", "Esi", "Yaw", "Linda", "Michael", "Abena", "Joseph", "Sarah", "Daniel",
+    "Akosua", "Emmanuel", "Ruth", "Isaac", "Mercy", "Kojo", "Hannah", "Paul", "Adwoa", "James",
+)
+LAST_NAMES = (
+    "Mensah", "Owusu", "Boateng", "Asante", "Smith", "Johnson", "Addo", "Osei", "Appiah", "Brown",
+    "Agyeman", "Darko", "Williams", "Ofori", "Nkrumah", "Garcia", "Amoah", "Quaye", "Tetteh", "Lee",
+)
+
+# Fraction of transactions that are donations (the rest are requests)
+DONATION_SHARE = 0.7
+
+# Generated history ends here by default, so a seed always gives the same dates
+DEFAULT_END_DATE = datetime.date(2025, 12, 31)
+
+TABLES = ("BloodTransactions", "DailyBloodTotals", "Donors", "BloodBatches", "BloodBank", "StockChanges")
+
+
+def random_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _group_picker(rng):
+    groups = list(BLOOD_GROUP_WEIGHTS)
+    weights = list(BLOOD_GROUP_WEIGHTS.values())
+    return lambda: rng.choices(groups, weights)[0]
+
+
+def generate_donors(count, seed=1, years=5, end_date=DEFAULT_END_DATE):
+    """Yield (name, blood_group, contact, donation_date) rows."""
+    rng = random.Random(seed)
+    pick_group = _group_picker(rng)
+    days = years * 365
+    for _ in range(count):
+        donated = None
+        if rng.random() < 0.8:
+            donated = end_date - datetime.timedelta(days=rng.randrange(days))
+        yield (random_name(rng), pick_group(), f"0{rng.randrange(200000000, 599999999)}", donated)
+
+
+def generate_transactions(count, seed=1, years=5, end_date=DEFAULT_END_DATE):
+    """
+    Yield (name, blood_group, units, transaction_date, transaction_type) rows,
+    spread evenly over `years` ending at end_date.
+    """
+    rng = random.Random(seed + 1)
+    pick_group = _group_picker(rng)
+    days = years * 365
+    for _ in range(count):
+        if rng.random() < DONATION_SHARE:
+            transaction_type, units = "DONATION", 1
+        else:
+            transaction_type, units = "REQUEST", rng.randint(1, 4)
+        date = end_date - datetime.timedelta(days=rng.randrange(days))
+        yield (random_name(rng), pick_group(), units, date, transaction_type)
+
+
+def generate_batches(count, seed=1, today=None):
+    """Yield (blood_group, 1, collected_on) stock batches that are still in date."""
+    rng = random.Random(seed + 2)
+    pick_group = _group_picker(rng)
+    today = today or datetime.date.today()
+    for _ in range(count):
+        collected_on = today - datetime.timedelta(days=rng.randrange(config.BLOOD_SHELF_LIFE_DAYS))
+        yield (pick_group(), 1, collected_on)
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def reset(db):
+    """Empty the data tables (schema and admins are kept)."""
+    with db.transaction():
+        # Plain DELETE works on both backends; TRUNCATE is MySQL-only
+        cursor = db.connection.cursor()
+        for table in TABLES:
+            cursor.execute(f"DELETE FROM {table}")
+        cursor.close()
+
+
+def populate(
+    db,
+    donors,
+    transactions,
+    years=5,
+    seed=1,
+    end_date=DEFAULT_END_DATE,
+    batch_size=5000,
+    progress=print,
+    live_units=None,
+):
+    """
+    Insert generated donors and transactions, then replace the stock with
+    `live_units` one-unit batches (default a tenth of the transactions)
+    collected over the last shelf life, so requests have real batches to
+    allocate from. Stock is dated from today, not end_date, or it would
+    all be expired.
+    """
+    started = time.perf_counter()
+    for batch in _batches(generate_donors(donors, seed, years, end_date), batch_size):
+        db.insert_donors(batch)
+    if progress:
+        progress(f"{donors:,} donors in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    done = 0
+    for batch in _batches(generate_transactions(transactions, seed, years, end_date), batch_size):
+        db.insert_transactions(batch)
+        done += len(batch)
+        if progress and done % (batch_size * 20) == 0:
+            progress(f"... {done:,} transactions")
+    if progress:
+        progress(f"{transactions:,} transactions in {time.perf_counter() - started:.1f}s")
+
+    if live_units is None:
+        live_units = max(transactions // 10, 1000)
+    started = time.perf_counter()
+    with db.transaction():
+        for blood_group in BLOOD_GROUP_WEIGHTS:
+            if db.get_units_for_blood_group(blood_group) is not None:
+                db.update_blood_units(blood_group, 0)
+        for batch in _batches(generate_batches(live_units, seed), batch_size):
+            db.insert_batches(batch)
+    if progress:
+        progress(f"{live_units:,} live units in {time.perf_counter() - started:.1f}s")
+
+
+def parse_count(text):
+    """Parse 10000, 10k or 1M."""
+    multipliers = {"k": 1_000, "m": 1_000_000}
+    text = text.strip().lower().replace("_", "")
+    if text and text[-1] in multipliers:
+        return int(float(text[:-1]) * multipliers[text[-1]])
+    return int(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill the database with synthetic benchmark data.")
+    parser.add_argument(
+        "--transactions", type=parse_count, default=10_000, help="e.g. 10000, 10k, 1M"
+    )
+    parser.add_argument("--donors", type=parse_count, help="default: a tenth of --transactions")
+    parser.add_argument("--years", type=int, default=5, help="years of history")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--live-units", type=parse_count, help="default: a tenth of --transactions")
+    parser.add_argument("--reset", action="store_true", help="empty the tables first")
+    args = parser.parse_args(argv)
+
+    donors = args.donors if args.donors is not None else max(args.transactions // 10, 100)
+    db = open_database()
+    try:
+        if args.reset:
+            reset(db)
+        populate(
+            db,
+            donors,
+            args.transactions,
+            years=args.years,
+            seed=args.seed,
+            live_units=args.live_units,
+        )
+    finally:
+        db.close_connection()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# benchmarks/prepared_statements.py
+"""
+Per-call latency of the hot MySQL statements, prepared versus plain.
+
+    python -m benchmarks.prepared_statements                 100k transactions, 2000 calls each
+    python -m benchmarks.prepared_statements --repeat 10000
+
+"plain" is how every call used to run: open a dictionary cursor, send the
+SQL text (SELECT * where the method used it), fetch and close. "prepared" is
+Database._execute(), which reuses the connection's prepared cursor for the
+statement and only sends the parameters. The two are timed alternately on the
+same connection, so both see the same server and cache state.
+
+MySQL only: the configured database is emptied and refilled like
+benchmarks.data_layer --backend mysql, so point config.py at a scratch
+database. SQLite keeps its own cache of compiled statements
+(config.SQLITE_STATEMENT_CACHE) and needs nothing like this.
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from benchmarks import datagen
+from benchmarks.data_layer import Context, open_dataset, percentiles
+from config import BLOOD_GROUPS, DONOR_SEARCH_LIMIT
+
+# (label, SQL as sent before, registry statement, params(rng, ctx))
+CASES = [
+    (
+        "fetch_all_blood_records",
+        "SELECT * FROM BloodBank",
+        "blood_records",
+        lambda rng, ctx: (),
+    ),
+    (
+        "get_units_for_blood_group",
+        "SELECT units_available FROM BloodBank WHERE blood_group = %s",
+        "group_units",
+        lambda rng, ctx: (rng.choice(BLOOD_GROUPS),),
+    ),
+    (
+        "authenticate_admin",
+        "SELECT * FROM Admins WHERE username = %s AND password_hash = %s",
+        "authenticate_admin",
+        lambda rng, ctx: ("admin", "not-the-password"),
+    ),
+    (
+        "get_donor",
+        "SELECT id, name, blood_group, contact, donation_date FROM Donors WHERE id = %s",
+        "donor_by_id",
+        lambda rng, ctx: (rng.randint(ctx.min_donor_id, ctx.max_donor_id),),
+    ),
+    (
+        "get_donor_details",
+        "SELECT * FROM Donors WHERE name = %s",
+        "donor_by_name",
+        lambda rng, ctx: (datagen.random_name(rng),),
+    ),
+    (
+        "search_donors",
+        "SELECT id, name, blood_group FROM Donors WHERE name LIKE %s ORDER BY name, id LIMIT %s",
+        "search_donors",
+        lambda rng, ctx: (rng.choice(datagen.FIRST_NAMES)[:2] + "%", DONOR_SEARCH_LIMIT),
+    ),
+    (
+        "changes_since",
+        "SELECT id, blood_group, units_available FROM StockChanges WHERE id > %s ORDER BY id",
+        "changes_after",
+        lambda rng, ctx: (1 << 30,),
+    ),
+]
+
+
+def plain(db, sql, params):
+    cursor = db._cursor(dictionary=True)
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def prepared(db, name, params):
+    return db._query(name, params)
+
+
+def run(db, ctx, repeat, seed):
+    """{label: (plain samples, prepared samples)} in milliseconds."""
+    rng = random.Random(seed)
+    results = {}
+    for label, sql, name, make_params in CASES:
+        # The first prepared call pays for the PREPARE; warm both paths up
+        for _ in range(3):
+            params = make_params(rng, ctx)
+            plain(db, sql, params)
+            prepared(db, name, params)
+        before, after = [], []
+        for _ in range(repeat):
+            params = make_params(rng, ctx)
+            started = time.perf_counter()
+            plain(db, sql, params)
+            middle = time.perf_counter()
+            prepared(db, name, params)
+            before.append((middle - started) * 1000)
+            after.append((time.perf_counter() - middle) * 1000)
+        results[label] = (before, after)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare prepared and plain MySQL statements.")
+    parser.add_argument("--transactions", type=datagen.parse_count, default=100_000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    donors = max(args.transactions // 10, 100)
+    db = open_dataset("mysql", args.transactions, donors, 5, args.seed, False)
+    try:
+        results = run(db, Context(db, random.Random(args.seed), 5), args.repeat, args.seed)
+    finally:
+        db.close_connection()
+
+    print(f"{'statement':26} {'plain p50':>10} {'p95':>8} {'prepared p50':>13} {'p95':>8} {'speedup':>8}  (ms)")
+    for label, (before, after) in results.items():
+        old, new = percentiles(before), percentiles(after)
+        print(
+            f"{label:26} {old['p50']:10.3f} {old['p95']:8.3f} {new['p50']:13.3f} {new['p95']:8.3f}"
+            f" {old['p50'] / new['p50']:7.2f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# benchmarks/service.py
+"""
+Throughput and latency of the HTTP service (service.py) under concurrent clients.
+
+    python -m benchmarks.service                         sqlite, 100k transactions, 32 clients
+    python -m benchmarks.service --clients 64 --seconds 20
+
+The service runs in this process on a free localhost port, over a copy of a
+benchmarks.data_layer sqlite dataset, so nothing outside the machine is
+touched. Each client holds one keep-alive connection and sends a weighted
+mix of reads and writes back to back.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from benchmarks import datagen
+from benchmarks.data_layer import open_dataset, percentiles
+from config import BLOOD_GROUPS
+from service import Service
+
+# (label, weight, method, path, body) - weights roughly match a lab system's traffic
+MIX = [
+    ("GET /inventory", 30, "GET", lambda rng: "/inventory", None),
+    ("GET /history", 20, "GET", lambda rng: "/history?limit=50", None),
+    (
+        "GET /donors/search",
+        15,
+        "GET",
+        lambda rng: f"/donors/search?prefix={rng.choice(datagen.FIRST_NAMES)[:2]}",
+        None,
+    ),
+    (
+        "POST /donations",
+        20,
+        "POST",
+        lambda rng: "/donations",
+        lambda rng: {"name": datagen.random_name(rng), "blood_group": rng.choice(BLOOD_GROUPS), "units": 1},
+    ),
+    (
+        "POST /requests",
+        15,
+        "POST",
+        lambda rng: "/requests",
+        lambda rng: {
+            "name": datagen.random_name(rng),
+            "blood_group": rng.choice(BLOOD_GROUPS),
+            "units": 1,
+            "substitute": True,
+        },
+    ),
+]
+
+
+async def call(reader, writer, method, path, body):
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(payload)}\r\n\r\n".encode()
+        + payload
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(port, seed, deadline, samples, statuses):
+    rng = random.Random(seed)
+    labels = [entry[0] for entry in MIX]
+    weights = [entry[1] for entry in MIX]
+    entries = {entry[0]: entry for entry in MIX}
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while time.perf_counter() < deadline:
+            label = rng.choices(labels, weights)[0]
+            _, _, method, path, body = entries[label]
+            started = time.perf_counter()
+            status = await call(reader, writer, method, path(rng), body(rng) if body else None)
+            samples.setdefault(label, []).append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(clients, seconds, seed):
+    service = await Service(port=0).start()
+    try:
+        samples, statuses = {}, {}
+        deadline = time.perf_counter() + seconds
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(client(service.port, seed + i, deadline, samples, statuses) for i in range(clients))
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        await service.close()
+    return samples, statuses, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the HTTP service.")
+    parser.add_argument("--transactions", type=datagen.parse_count, default=100_000)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    donors = max(args.transactions // 10, 100)
+    open_dataset("sqlite", args.transactions, donors, 5, args.seed, False).close_connection()
+    samples, statuses, elapsed = asyncio.run(run(args.clients, args.seconds, args.seed))
+
+    total = sum(len(times) for times in samples.values())
+    print(f"{total:,} requests in {elapsed:.1f}s: {total / elapsed:,.0f} requests/s")
+    print(f"statuses: {dict(sorted(statuses.items()))}")
+    print(f"{'route':22} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9}  (ms)")
+    for label, times in sorted(samples.items()):
+        if len(times) < 2:
+            continue
+        stats = percentiles(times)
+        print(f"{label:22} {len(times):7} {stats['p50']:9.3f} {stats['p95']:9.3f} {stats['p99']:9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# bulk_import.py
+"""
+Bulk import of donors and blood transactions from CSV.
+
+    python bulk_import.py donors donors.csv
+    python bulk_import.py transactions ledger.csv --rejects rejected.csv
+
+Expected columns:
+    donors:        name, blood_group, contact, donation_date (optional)
+    transactions:  name, blood_group, units, transaction_date, transaction_type
+
+The file is streamed and written in batches of config.IMPORT_BATCH_SIZE rows,
+each batch one multi-row INSERT in its own transaction, so memory use stays
+flat whatever the file size. Transaction imports also update the stock (skip
+that with --no-stock for ledger history only): each DONATION becomes a batch
+collected on its transaction_date, so old donations arrive already expired,
+and each REQUEST takes units from the batches on the shelf on its own date,
+in file order. A REQUEST for more than those batches hold is rejected rather
+than clamped.
+Invalid rows are skipped and, with --rejects, written out with the reason.
+"""
+
+import argparse
+import csv
+import datetime
+import sys
+import time
+
+import config
+from storage import open_database
+
+DONOR_COLUMNS = ("name", "blood_group", "contact", "donation_date")
+TRANSACTION_COLUMNS = ("name", "blood_group", "units", "transaction_date", "transaction_type")
+
+
+class ImportReport:
+    """Counts and timing for one import run."""
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return (self.accepted + self.rejected) / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.accepted} rows imported, {self.rejected} rejected "
+            f"in {self.elapsed:.1f}s ({self.rows_per_second:,.0f} rows/s)"
+        )
+
+
+def _text(row, column, max_length):
+    value = (row.get(column) or "").strip()
+    if not value:
+        raise ValueError(f"missing {column}")
+    if len(value) > max_length:
+        raise ValueError(f"{column} longer than {max_length} characters")
+    return value
+
+
+def _blood_group(row):
+    value = (row.get("blood_group") or "").strip().upper()
+    if value not in config.BLOOD_GROUPS:
+        raise ValueError(f"unknown blood group {value!r}")
+    return value
+
+
+def _date(row, column, required=True):
+    value = (row.get(column) or "").strip()
+    if not value:
+        if required:
+            raise ValueError(f"missing {column}")
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{column} is not a YYYY-MM-DD date")
+
+
+def validate_donor(row):
+    """Return a row for Database.insert_donors, or raise ValueError with the reason."""
+    return (
+        _text(row, "name", 255),
+        _blood_group(row),
+        _text(row, "contact", 15),
+        _date(row, "donation_date", required=False),
+    )
+
+
+def validate_transaction(row):
+    """Return a row for Database.insert_transactions, or raise ValueError with the reason."""
+    try:
+        units = int((row.get("units") or "").strip())
+    except ValueError:
+        raise ValueError("units is not a whole number")
+    if units <= 0:
+        raise ValueError("units must be positive")
+    transaction_type = (row.get("transaction_type") or "").strip().upper()
+    if transaction_type not in ("DONATION", "REQUEST"):
+        raise ValueError(f"unknown transaction type {transaction_type!r}")
+    return (
+        _text(row, "name", 255),
+        _blood_group(row),
+        units,
+        _date(row, "transaction_date"),
+        transaction_type,
+    )
+
+
+def _write_donors(db, batch, update_stock):
+    db.insert_donors(batch)
+    return []
+
+
+def _write_transactions(db, batch, update_stock):
+    """Write one batch; returns [(index in batch, reason)] for requests the stock can't cover."""
+    if not update_stock:
+        db.insert_transactions(batch)
+        return []
+    return db.import_transactions(batch)
+
+
+KINDS = {
+    "donors": (DONOR_COLUMNS, validate_donor, _write_donors),
+    "transactions": (TRANSACTION_COLUMNS, validate_transaction, _write_transactions),
+}
+
+
+def import_csv(kind, path, db=None, rejects_path=None, update_stock=True, batch_size=None, progress=print):
+    """
+    Stream `path` into the database. `kind` is "donors" or "transactions".
+    Returns an ImportReport. A database error aborts the import; batches
+    committed before it stay in place.
+    """
+    columns, validate, write = KINDS[kind]
+    batch_size = batch_size or config.IMPORT_BATCH_SIZE
+    own_db = db is None
+    if own_db:
+        db = open_database()
+    report = ImportReport()
+    rejects_file = open(rejects_path, "w", newline="", encoding="utf-8") if rejects_path else None
+    try:
+        rejects = csv.writer(rejects_file) if rejects_file else None
+        if rejects:
+            rejects.writerow(("line", "reason") + columns)
+
+        def reject(line, reason, values):
+            report.rejected += 1
+            if rejects:
+                rejects.writerow((line, reason) + values)
+
+        def flush(batch, sources):
+            refused = write(db, batch, update_stock)
+            for i, reason in refused:
+                line, values = sources[i]
+                reject(line, reason, values)
+            report.accepted += len(batch) - len(refused)
+
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            missing = [c for c in columns if c not in (reader.fieldnames or []) and c != "donation_date"]
+            if missing:
+                raise ValueError(f"{path} has no column(s): {', '.join(missing)}")
+
+            # (line, raw values) of each batch row, for rows the write refuses
+            batch, sources = [], []
+            for row in reader:
+                values = tuple(row.get(c, "") for c in columns)
+                try:
+                    batch.append(validate(row))
+                except ValueError as e:
+                    reject(reader.line_num, str(e), values)
+                    continue
+                sources.append((reader.line_num, values))
+                if len(batch) >= batch_size:
+                    flush(batch, sources)
+                    batch, sources = [], []
+                    report.elapsed = time.perf_counter() - report.started
+                    if progress:
+                        progress(f"... {report}")
+            if batch:
+                flush(batch, sources)
+    finally:
+        report.elapsed = time.perf_counter() - report.started
+        if rejects_file:
+            rejects_file.close()
+        if own_db:
+            db.close_connection()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import donors or transactions from CSV.")
+    parser.add_argument("kind", choices=sorted(KINDS))
+    parser.add_argument("path", help="CSV file with a header row")
+    parser.add_argument("--rejects", help="write rejected rows and the reason to this CSV")
+    parser.add_argument("--batch-size", type=int, help=f"rows per commit (default {config.IMPORT_BATCH_SIZE})")
+    parser.add_argument("--no-stock", action="store_true", help="don't adjust BloodBank totals")
+    args = parser.parse_args(argv)
+
+    report = import_csv(
+        args.kind,
+        args.path,
+        rejects_path=args.rejects,
+        update_stock=not args.no_stock,
+        batch_size=args.batch_size,
+    )
+    print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+# compatibility.py
+"""
+ABO/Rh red cell compatibility and substitution planning.
+
+A recipient can take red cells whose ABO antigens it also carries (O has
+none, AB has both) and, if it is Rh-negative, only Rh-negative cells. The
+table of compatible donor groups for every recipient in BLOOD_GROUPS is
+built once at import, so planning a substitution is a dictionary lookup and
+a walk over at most eight groups, with the stock of all eight read in one
+query beforehand.
+
+Donor groups are tried in an order that protects scarce stock: the exact
+group first, then Rh-positive before Rh-negative (Rh-negative recipients
+have no alternative), then groups that suit fewer recipients before more
+universal ones, so O- is always the last resort.
+"""
+
+from config import BLOOD_GROUPS
+
+
+def _antigens(blood_group):
+    abo = blood_group.rstrip("+-")
+    return set() if abo == "O" else set(abo), blood_group.endswith("+")
+
+
+def is_compatible(donor, recipient):
+    """Whether red cells of group `donor` can be given to a `recipient`."""
+    donor_abo, donor_rh = _antigens(donor)
+    recipient_abo, recipient_rh = _antigens(recipient)
+    return donor_abo <= recipient_abo and (recipient_rh or not donor_rh)
+
+
+def _preference_order(recipient):
+    donors = [d for d in BLOOD_GROUPS if is_compatible(d, recipient)]
+
+    def key(donor):
+        recipients = sum(is_compatible(donor, r) for r in BLOOD_GROUPS)
+        return (donor != recipient, donor.endswith("-"), recipients, BLOOD_GROUPS.index(donor))
+
+    return tuple(sorted(donors, key=key))
+
+
+# Recipient group -> compatible donor groups, most preferred first
+COMPATIBLE_DONORS = {recipient: _preference_order(recipient) for recipient in BLOOD_GROUPS}
+
+
+def plan_substitution(stock, blood_group, units):
+    """
+    Cover `units` of `blood_group` from {group: units available}, taking the
+    requested group first and then compatible groups in preference order.
+    Returns [(group, units)] in the order taken, or None if all compatible
+    stock together is not enough.
+    """
+    plan = []
+    for donor in COMPATIBLE_DONORS.get(blood_group, ()):
+        available = stock.get(donor, 0)
+        if available <= 0:
+            continue
+        take = min(available, units)
+        plan.append((donor, take))
+        units -= take
+        if units == 0:
+            return plan
+    return None
+
+
+def compatible_units(stock, blood_group):
+    """Units in `stock` that a `blood_group` recipient could receive."""
+    return sum(stock.get(donor, 0) for donor in COMPATIBLE_DONORS.get(blood_group, ()))
+
+
+def describe_plan(blood_group, plan):
+    """One line for the user, e.g. "4 units for A+: A+ 2, O+ 1, O- 1"."""
+    units = sum(n for _, n in plan)
+    return f"{units} units for {blood_group}: " + ", ".join(f"{g} {n}" for g, n in plan)
@@ -1,6 +1,82 @@
 # configuration for the app:
 
+# MySQL server (8.0.19 or later, for INSERT ... AS alias ON DUPLICATE KEY UPDATE)
 DB_HOST = "localhost"
 DB_USER = "root"
 DB_PASSWORD = ""
 DB_NAME = "bloodpy"
+
+# storage backend: "mysql" (the server above, for several stations) or
+# "sqlite" (a single local file, for a single-station clinic)
+DB_BACKEND = "mysql"
+SQLITE_PATH = "bloodpy.db"
+SQLITE_BUSY_TIMEOUT = 10  # seconds a write waits for another connection's write to finish
+SQLITE_STATEMENT_CACHE = 128  # compiled statements kept per connection
+
+# Define blood groups
+BLOOD_GROUPS = ["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"]
+
+# MySQL connection pool shared by every Database() in the process
+DB_POOL_SIZE = 5
+DB_POOL_TIMEOUT = 10  # seconds to wait for a free connection when the pool is exhausted
+DB_RECONNECT_ATTEMPTS = 3
+DB_RECONNECT_DELAY = 1  # seconds between reconnect attempts
+
+# rows fetched per page in the transaction history window
+HISTORY_PAGE_SIZE = 200
+
+# apply pending schema migrations (migrations/<backend>/*.sql) when the app starts
+DB_AUTO_MIGRATE = True
+
+# background database work for the main window (each thread holds one pooled connection)
+DB_WORKER_THREADS = 2
+DB_WORKER_POLL_MS = 30  # how often finished work is handed back to the Tk thread
+
+# donor typeahead on the donation form
+DONOR_SEARCH_LIMIT = 20  # matches shown per search
+DONOR_SEARCH_DEBOUNCE_MS = 250  # wait this long after the last keystroke before searching
+DONOR_SEARCH_CACHE_SIZE = 64  # recent searches kept in memory
+DONOR_CACHE_SIZE = 1024  # donor records kept in memory by id
+
+# bulk CSV import (bulk_import.py): rows validated and written per batch, one commit each
+IMPORT_BATCH_SIZE = 1000
+
+# streaming export (export.py / history window)
+EXPORT_BATCH_SIZE = 5000  # rows read from the server and written per batch
+
+# data layer instrumentation (instrumentation.py)
+SLOW_QUERY_MS = 200  # statements slower than this are written to the slow query log
+SLOW_QUERY_LOG = ".cache/slow_queries.log"  # empty string to disable
+METRICS_DUMP_PATH = ".cache/metrics.json"  # per-method counters as JSON; empty string to disable
+METRICS_DUMP_INTERVAL = 60  # seconds between dumps
+
+# pre-scaled copies of the login screen images
+ASSET_CACHE_DIR = ".cache/assets"
+# one line per start with time-to-login-window (empty string to disable)
+STARTUP_TIMING_LOG = ".cache/startup_timing.csv"
+
+# demand forecasting and shortage alerts (forecast.py)
+FORECAST_HISTORY_DAYS = 365  # days of issued units loaded per forecast
+FORECAST_SHORT_WINDOW = 7  # days in the rolling average that reacts to surges
+FORECAST_LONG_WINDOW = 28  # days in the rolling average that smooths quiet weeks
+SHORTAGE_WARNING_DAYS = 7  # groups with fewer days of supply than this are "low"
+SHORTAGE_CRITICAL_DAYS = 3  # ... and fewer than this are "critical"
+
+# per-batch stock with expiry (BloodBatches)
+BLOOD_SHELF_LIFE_DAYS = 42  # days a donated unit can be issued after collection
+ALLOCATION_FETCH_ROWS = 50  # batches read per query while filling a request
+
+# headless HTTP/JSON service (service.py)
+SERVICE_HOST = "127.0.0.1"  # localhost only; other machines need a proxy in front
+SERVICE_PORT = 8765
+SERVICE_WORKERS = 4  # threads running database calls, one connection each (keep <= DB_POOL_SIZE)
+SERVICE_MAX_IN_FLIGHT = 64  # requests handled at once; beyond this clients get 503
+SERVICE_MAX_BODY = 1024 * 1024  # largest request body accepted, in bytes
+SERVICE_IDLE_TIMEOUT = 30  # seconds a keep-alive connection may sit idle
+SERVICE_TOKEN = ""  # when set, clients must send "Authorization: Bearer <token>"
+
+# live stock refresh between stations (StockChanges change log)
+CHANGE_POLL_MS = 3000  # how often the main window asks for stock changed elsewhere
+CHANGE_FEED_OVERLAP = 32  # log rows re-read per poll, for ids that commit out of order
+CHANGE_LOG_RETENTION_HOURS = 24  # older log rows are pruned; stations further behind reload
+HOUSEKEEPING_INTERVAL_MS = 60 * 60 * 1000  # how often a station discards expired batches and prunes the log
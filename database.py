@@ -1,158 +1,869 @@
+import atexit
+import datetime
+import queue
+import threading
+import weakref
+from contextlib import contextmanager
+
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, InterfaceError, OperationalError
+from mysql.connector.errors import PoolError
 import config
+from cache import LRUCache
+from compatibility import describe_plan, plan_substitution
+from instrumentation import TimedCursor, instrumented
+from storage import (
+    DONOR_SORT_COLUMNS,
+    EXPORT_TABLES,
+    HISTORY_SORT_COLUMNS,
+    Storage,
+    daily_total_rows,
+    plan_allocation,
+    prefix_pattern,
+    where_clause,
+)
 
 
-class Database:
-    def __init__(self):
+class ConnectionPool:
+    """
+    Process-wide pool of MySQL connections.
+    Connections are opened lazily (up to `size`) and handed back on
+    close_connection(), so logging out and in again reuses an open session
+    instead of paying for a new TCP + auth handshake.
+    """
+
+    def __init__(self, size, timeout=None):
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = mysql.connector.connect(
+            host=config.DB_HOST,
+            user=config.DB_USER,
+            password=config.DB_PASSWORD,
+            database=config.DB_NAME,
+            # Standalone statements commit on their own; Database.transaction()
+            # opens an explicit transaction when several must commit together.
+            autocommit=True,
+        )
+        print("Connected to MySQL database")
+        return connection
+
+    def checkout(self):
+        """Return a healthy connection, opening a new one only if none is idle."""
         try:
-            self.connection = mysql.connector.connect(
-                host=config.DB_HOST,
-                user=config.DB_USER,
-                password=config.DB_PASSWORD,
-                database=config.DB_NAME,
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.size
+                if can_open:
+                    self._opened += 1
+            if can_open:
+                try:
+                    return self._connect()
+                except Error:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            try:
+                connection = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise PoolError("Connection pool exhausted")
+
+        # Health check: an idle connection may have been dropped by the server
+        # (wait_timeout, network blip). A ping is one round trip; reconnect only if it fails.
+        try:
+            connection.ping(
+                reconnect=True,
+                attempts=config.DB_RECONNECT_ATTEMPTS,
+                delay=config.DB_RECONNECT_DELAY,
             )
-            if self.connection.is_connected():
-                print("Connected to MySQL database")
+        except Error:
+            self.discard(connection)
+            raise
+        return connection
+
+    def release(self, connection):
+        """Hand a connection back to the pool, discarding it if it is broken."""
+        try:
+            connection.rollback()  # never leak an open transaction to the next user
+        except Error:
+            self.discard(connection)
+            return
+        self._idle.put(connection)
+
+    def discard(self, connection):
+        with self._lock:
+            self._opened -= 1
+        try:
+            connection.close()
+        except Error:
+            pass
+
+    def close_all(self):
+        """Close every idle connection (called at interpreter exit)."""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self.discard(connection)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Donor records by id, shared by every Database in the process
+_donor_cache = LRUCache(config.DONOR_CACHE_SIZE)
+
+# The hot statements, prepared once per connection by Database._execute()
+STATEMENTS = {
+    "blood_records": "SELECT blood_group, units_available FROM BloodBank",
+    "group_units": "SELECT units_available FROM BloodBank WHERE blood_group = %s",
+    "lock_group_units": "SELECT units_available FROM BloodBank WHERE blood_group = %s FOR UPDATE",
+    "take_group_units": "UPDATE BloodBank SET units_available = units_available - %s WHERE blood_group = %s",
+    "live_batches": """
+        SELECT id, units_remaining, expires_on FROM BloodBatches
+        WHERE blood_group = %s AND expires_on >= CURDATE()
+            AND (expires_on > %s OR (expires_on = %s AND id > %s))
+        ORDER BY expires_on, id
+        LIMIT %s
+        FOR UPDATE
+    """,
+    "batches_on_day": """
+        SELECT id, units_remaining, expires_on FROM BloodBatches
+        WHERE blood_group = %s AND expires_on >= %s AND collected_on <= %s
+            AND (expires_on > %s OR (expires_on = %s AND id > %s))
+        ORDER BY expires_on, id
+        LIMIT %s
+        FOR UPDATE
+    """,
+    "shrink_batch": "UPDATE BloodBatches SET units_remaining = %s WHERE id = %s",
+    "add_transaction": """
+        INSERT INTO BloodTransactions
+        (name, blood_group, units, transaction_date, transaction_type)
+        VALUES (%s, %s, %s, CURDATE(), %s)
+    """,
+    "add_daily_total": """
+        INSERT INTO DailyBloodTotals
+        (day, blood_group, donations, donated_units, requests, requested_units)
+        VALUES (COALESCE(%s, CURDATE()), %s, %s, %s, %s, %s) AS new
+        ON DUPLICATE KEY UPDATE
+            donations = DailyBloodTotals.donations + new.donations,
+            donated_units = DailyBloodTotals.donated_units + new.donated_units,
+            requests = DailyBloodTotals.requests + new.requests,
+            requested_units = DailyBloodTotals.requested_units + new.requested_units
+    """,
+    "change_position": "SELECT COALESCE(MAX(id), 0) FROM StockChanges",
+    "changes_after": """
+        SELECT id, blood_group, units_available FROM StockChanges
+        WHERE id > %s ORDER BY id
+    """,
+    "first_change": "SELECT MIN(id) FROM StockChanges",
+    "authenticate_admin": "SELECT 1 FROM Admins WHERE username = %s AND password_hash = %s",
+    "search_donors": """
+        SELECT id, name, blood_group FROM Donors
+        WHERE name LIKE %s
+        ORDER BY name, id
+        LIMIT %s
+    """,
+    "donor_by_id": "SELECT id, name, blood_group, contact, donation_date FROM Donors WHERE id = %s",
+    "donor_by_name": "SELECT id, name, blood_group, contact, donation_date FROM Donors WHERE name = %s",
+}
+
+# connection -> (server session id, {statement name: prepared cursor})
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the shared connection pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(config.DB_POOL_SIZE, timeout=config.DB_POOL_TIMEOUT)
+            atexit.register(_pool.close_all)
+        return _pool
+
+
+@instrumented
+class Database(Storage):
+    """The MySQL backend."""
+
+    dialect = "mysql"
+
+    def __init__(self):
+        self.connection = None
+        self._in_transaction = False
+        try:
+            self.connection = get_pool().checkout()
         except Error as e:
             print("Error while connecting to MySQL", e)
 
+    def _cursor(self, **kwargs):
+        """Open a timed cursor, transparently reconnecting if the server dropped us."""
+        try:
+            return TimedCursor(self.connection.cursor(**kwargs))
+        except (InterfaceError, OperationalError):
+            if self._in_transaction:
+                raise  # a fresh session would silently lose the open transaction
+            self.connection.reconnect(
+                attempts=config.DB_RECONNECT_ATTEMPTS, delay=config.DB_RECONNECT_DELAY
+            )
+            return TimedCursor(self.connection.cursor(**kwargs))
+
+    def _execute(self, name, params=()):
+        """
+        Run STATEMENTS[name] on this connection's prepared cursor for it and
+        return the cursor; read any rows with fetchall() so the connection is
+        free for the next statement. The statement is prepared on the server
+        the first time a connection runs it; after that only the parameters are
+        sent and rows come back in the binary protocol. A reconnect starts a
+        server session without the old statements, so the registry is keyed on
+        the session id as well as the connection.
+        Like _cursor(), a dropped connection is reconnected outside a
+        transaction and the statement tried once more.
+        """
+        try:
+            return self._execute_prepared(name, params)
+        except (InterfaceError, OperationalError):
+            if self._in_transaction:
+                raise  # a fresh session would silently lose the open transaction
+            self.connection.reconnect(
+                attempts=config.DB_RECONNECT_ATTEMPTS, delay=config.DB_RECONNECT_DELAY
+            )
+            with _prepared_lock:
+                _prepared.pop(self.connection, None)
+            return self._execute_prepared(name, params)
+
+    def _execute_prepared(self, name, params):
+        session = self.connection.connection_id
+        with _prepared_lock:
+            entry = _prepared.get(self.connection)
+            if entry is None or entry[0] != session:
+                entry = _prepared[self.connection] = (session, {})
+        cursors = entry[1]
+        cursor = cursors.get(name)
+        if cursor is None:
+            cursor = cursors[name] = TimedCursor(self.connection.cursor(prepared=True))
+        cursor.execute(STATEMENTS[name], params)
+        return cursor
+
+    def _query(self, name, params=()):
+        """Rows of a registered statement as dictionaries."""
+        cursor = self._execute(name, params)
+        columns = cursor.column_names
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run several calls as one unit of work: a single commit on success,
+        a rollback if the block raises. Nested blocks join the outer one.
+
+            with db.transaction():
+                db.add_donation("A+", 2)
+                db.add_transaction("Jane", "A+", 2, "DONATION")
+        """
+        if self._in_transaction:
+            yield self
+            return
+        self.connection.start_transaction()
+        self._in_transaction = True
+        try:
+            yield self
+        except BaseException:
+            self.connection.rollback()
+            raise
+        else:
+            self.connection.commit()
+        finally:
+            self._in_transaction = False
+
     def fetch_all_blood_records(self):
         """
         Fetches all records from the BloodBank table.
         Returns:
             List of dictionaries with keys: blood_group, units_available.
         """
-        cursor = self.connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM BloodBank")
-        records = cursor.fetchall()
-        cursor.close()
-        return records
+        return self._query("blood_records")
 
     def update_blood_units(self, blood_group, new_units):
         """
-        Updates the units_available for a given blood group.
+        Sets the units_available for a given blood group, replacing its batches
+        with a single batch of new_units collected today.
         """
-        cursor = self.connection.cursor()
-        sql = "UPDATE BloodBank SET units_available = %s WHERE blood_group = %s"
-        cursor.execute(sql, (new_units, blood_group))
-        self.connection.commit()
-        cursor.close()
+        with self.transaction():
+            cursor = self._cursor()
+            sql = "UPDATE BloodBank SET units_available = %s WHERE blood_group = %s"
+            cursor.execute(sql, (new_units, blood_group))
+            cursor.execute("DELETE FROM BloodBatches WHERE blood_group = %s", (blood_group,))
+            if new_units > 0:
+                self._add_batches(cursor, [(blood_group, new_units, None)])
+            cursor.close()
 
     def get_units_for_blood_group(self, blood_group):
         """
         Retrieves the current units available for a given blood group.
         """
-        cursor = self.connection.cursor()
-        sql = "SELECT units_available FROM BloodBank WHERE blood_group = %s"
-        cursor.execute(sql, (blood_group,))
-        record = cursor.fetchone()
-        cursor.close()
-        if record:
-            return record[0]
+        rows = self._execute("group_units", (blood_group,)).fetchall()
+        if rows:
+            return rows[0][0]
         else:
             return None
 
-    def add_donation(self, blood_group, units):
+    def add_donation(self, blood_group, units, collected_on=None):
         """
-        Increases the blood units for the given blood group.
+        Increases the blood units for the given blood group and returns the new balance.
         If the blood group does not exist, it inserts a new record.
+        The units are stored as one batch collected on `collected_on` (default
+        today) that expires config.BLOOD_SHELF_LIFE_DAYS later.
         """
-        current_units = self.get_units_for_blood_group(blood_group)
-        if current_units is not None:
-            new_units = current_units + units
-            self.update_blood_units(blood_group, new_units)
-        else:
-            cursor = self.connection.cursor()
-            sql = "INSERT INTO BloodBank (blood_group, units_available) VALUES (%s, %s)"
-            cursor.execute(sql, (blood_group, units))
-            self.connection.commit()
+        if units <= 0:
+            raise ValueError("Units must be a positive number.")
+        with self.transaction():
+            cursor = self._cursor()
+            # LAST_INSERT_ID(expr) sends the new balance back in the OK packet, so the
+            # increment and the read are one atomic round trip.
+            sql = """
+                UPDATE BloodBank
+                SET units_available = LAST_INSERT_ID(units_available + %s)
+                WHERE blood_group = %s
+            """
+            cursor.execute(sql, (units, blood_group))
+            if cursor.rowcount:
+                balance = cursor.lastrowid
+            else:
+                sql = "INSERT INTO BloodBank (blood_group, units_available) VALUES (%s, %s)"
+                cursor.execute(sql, (blood_group, units))
+                balance = units
+            self._add_batches(cursor, [(blood_group, units, collected_on)])
             cursor.close()
+        return balance
+
+    def _add_batches(self, cursor, batches):
+        """Insert (blood_group, units, collected_on) batches; a date of None means CURDATE()."""
+        if not batches:
+            return
+        sql = """
+            INSERT INTO BloodBatches (blood_group, units_remaining, collected_on, expires_on)
+            VALUES (%s, %s, COALESCE(%s, CURDATE()), COALESCE(%s, CURDATE()) + INTERVAL %s DAY)
+        """
+        cursor.executemany(
+            sql,
+            [
+                (blood_group, units, collected_on, collected_on, config.BLOOD_SHELF_LIFE_DAYS)
+                for blood_group, units, collected_on in batches
+            ],
+        )
+
+    def _live_batches(self, blood_group, day=None):
+        """
+        Yield (id, units_remaining) for a group's unexpired batches, soonest-expiring
+        first, locked for update. Rows are read ALLOCATION_FETCH_ROWS at a time
+        from idx_batches_group_expiry, so a request reads only the batches it uses.
+        With a `day`, the batches on the shelf that day instead: collected by
+        then and not yet expired.
+        """
+        after = (datetime.date.min, datetime.date.min, 0)
+        while True:
+            if day is None:
+                params = (blood_group, *after, config.ALLOCATION_FETCH_ROWS)
+                rows = self._execute("live_batches", params).fetchall()
+            else:
+                params = (blood_group, day, day, *after, config.ALLOCATION_FETCH_ROWS)
+                rows = self._execute("batches_on_day", params).fetchall()
+            for batch_id, remaining, _ in rows:
+                yield batch_id, remaining
+            if len(rows) < config.ALLOCATION_FETCH_ROWS:
+                return
+            _, _, expires_on = rows[-1]
+            after = (expires_on, expires_on, rows[-1][0])
+
+    def _apply_allocation(self, plan):
+        """Write a plan from plan_allocation(): delete emptied batches, shrink the partial one."""
+        emptied, partial = plan
+        if emptied:
+            # The id list varies in length, so this one is not worth preparing
+            placeholders = ", ".join(["%s"] * len(emptied))
+            cursor = self._cursor()
+            cursor.execute(f"DELETE FROM BloodBatches WHERE id IN ({placeholders})", emptied)
+            cursor.close()
+        if partial:
+            self._execute("shrink_batch", partial)
 
     def process_request(self, blood_group, units):
         """
-        Checks if the requested blood units are available. If yes,
-        it deducts the units and returns a success message. Otherwise,
-        it returns a failure message.
+        Issues the requested units from the group's unexpired batches,
+        soonest-expiring first, if there are enough of them.
+        Returns (success, message, balance) where balance is the units left
+        after the deduction, or None when the request failed.
+        """
+        if units <= 0:
+            return False, "Units must be a positive number.", None
+        with self.transaction():
+            # Locking the group's BloodBank row serializes requests for the group,
+            # so two stations can never both take the last units or the same batch.
+            rows = self._execute("lock_group_units", (blood_group,)).fetchall()
+            if not rows:
+                return False, "Blood group not found.", None
+            available = rows[0][0]
+            if available < units:
+                return False, "Insufficient units available.", None
+            plan = plan_allocation(self._live_batches(blood_group), units)
+            if plan is None:
+                return False, "Insufficient unexpired units available.", None
+            self._apply_allocation(plan)
+            self._execute("take_group_units", (units, blood_group))
+        return True, "Request completed successfully.", available - units
+
+    def process_batch_request(self, name, lines):
+        """
+        Fill a multi-group order in full or not at all.
+        lines is an iterable of (blood_group, units); repeated groups are summed.
+        The affected BloodBank rows are locked once, in blood group order so two
+        orders can never deadlock, then checked and updated in one transaction
+        with one ledger row per group written by a single multi-row INSERT.
+        Each group's units come from its soonest-expiring unexpired batches.
+        Returns (success, message, balances) where balances maps each group to
+        its units left (empty when the order failed).
+        """
+        wanted = {}
+        for blood_group, units in lines:
+            if units <= 0:
+                return False, "Units must be a positive number.", {}
+            wanted[blood_group] = wanted.get(blood_group, 0) + units
+        if not wanted:
+            return False, "The order has no lines.", {}
+        groups = sorted(wanted)
+        placeholders = ", ".join(["%s"] * len(groups))
+
+        with self.transaction():
+            cursor = self._cursor()
+            try:
+                sql = f"""
+                    SELECT blood_group, units_available FROM BloodBank
+                    WHERE blood_group IN ({placeholders})
+                    ORDER BY blood_group
+                    FOR UPDATE
+                """
+                cursor.execute(sql, groups)
+                stock = dict(cursor.fetchall())
+                missing = [g for g in groups if g not in stock]
+                if missing:
+                    return False, f"Blood group not found: {', '.join(missing)}.", {}
+                short = [g for g in groups if stock[g] < wanted[g]]
+                if short:
+                    return False, f"Insufficient units available for {', '.join(short)}.", {}
+                # Plan every group before writing any, so a short group leaves nothing changed
+                plans = {g: plan_allocation(self._live_batches(g), wanted[g]) for g in groups}
+                expired = [g for g in groups if plans[g] is None]
+                if expired:
+                    return (
+                        False,
+                        f"Insufficient unexpired units available for {', '.join(expired)}.",
+                        {},
+                    )
+                for blood_group in groups:
+                    self._apply_allocation(plans[blood_group])
+
+                cases = " ".join(["WHEN %s THEN %s"] * len(groups))
+                params = []
+                for blood_group in groups:
+                    params += [blood_group, wanted[blood_group]]
+                sql = f"""
+                    UPDATE BloodBank
+                    SET units_available = units_available - CASE blood_group {cases} END
+                    WHERE blood_group IN ({placeholders})
+                """
+                cursor.execute(sql, params + groups)
+
+                sql = """
+                    INSERT INTO BloodTransactions
+                    (name, blood_group, units, transaction_date, transaction_type)
+                    VALUES (%s, %s, %s, CURDATE(), 'REQUEST')
+                """
+                cursor.executemany(sql, [(name, g, wanted[g]) for g in groups])
+                self._add_to_daily_totals(
+                    cursor, daily_total_rows((None, g, wanted[g], "REQUEST") for g in groups)
+                )
+            finally:
+                cursor.close()
+
+        balances = {g: stock[g] - wanted[g] for g in groups}
+        return True, "Order completed successfully.", balances
+
+    def process_compatible_request(self, name, blood_group, units, apply=True, expected=None):
+        """
+        Fill a request from the requested group, substituting compatible groups
+        where it is short; see Storage.process_compatible_request. All of
+        BloodBank is locked in one query and the unexpired units of every group
+        summed in another; the plan is made in memory from those sums, so
+        expired batches nobody has discarded yet never count as stock.
         """
-        current_units = self.get_units_for_blood_group(blood_group)
-        if current_units is None:
-            return False, "Blood group not found."
-        if current_units < units:
-            return False, "Insufficient units available."
-        new_units = current_units - units
-        self.update_blood_units(blood_group, new_units)
-        return True, "Request completed successfully."
+        if units <= 0:
+            return False, "Units must be a positive number.", []
+        with self.transaction():
+            cursor = self._cursor()
+            try:
+                # All groups in one read, locked in the usual blood group order
+                sql = "SELECT blood_group, units_available FROM BloodBank ORDER BY blood_group"
+                cursor.execute(sql + (" FOR UPDATE" if apply else ""))
+                totals = dict(cursor.fetchall())
+                sql = """
+                    SELECT blood_group, SUM(units_remaining) FROM BloodBatches
+                    WHERE expires_on >= CURDATE()
+                    GROUP BY blood_group
+                """
+                cursor.execute(sql)
+                # SUM() comes back as Decimal
+                stock = {g: int(units) for g, units in cursor.fetchall() if g in totals}
+                plan = plan_substitution(stock, blood_group, units)
+                if plan is None:
+                    return False, f"Not enough units compatible with {blood_group} available.", []
+                if expected is not None and [tuple(step) for step in expected] != plan:
+                    return False, "Stock changed since the substitution was proposed.", []
+                allocation = [(g, n, totals[g] - n) for g, n in plan]
+                if not apply:
+                    return True, describe_plan(blood_group, plan), allocation
+
+                batch_plans = {g: plan_allocation(self._live_batches(g), n) for g, n in plan}
+                expired = [g for g, batch_plan in batch_plans.items() if batch_plan is None]
+                if expired:
+                    return (
+                        False,
+                        f"Insufficient unexpired units available for {', '.join(expired)}.",
+                        [],
+                    )
+                for batch_plan in batch_plans.values():
+                    self._apply_allocation(batch_plan)
+                self._adjust_stock(cursor, {g: -n for g, n in plan})
+                sql = """
+                    INSERT INTO BloodTransactions
+                    (name, blood_group, units, transaction_date, transaction_type)
+                    VALUES (%s, %s, %s, CURDATE(), 'REQUEST')
+                """
+                cursor.executemany(sql, [(name, g, n) for g, n in plan])
+                self._add_to_daily_totals(
+                    cursor, daily_total_rows((None, g, n, "REQUEST") for g, n in plan)
+                )
+            finally:
+                cursor.close()
+        return True, describe_plan(blood_group, plan), allocation
+
+    def changes_since(self, position):
+        """
+        Stock changes after change-log `position`; see Storage.changes_since.
+        One primary key range read, so an idle station's poll costs next to nothing.
+        The last CHANGE_FEED_OVERLAP rows before `position` are read again:
+        InnoDB assigns ids when a row is written, not when it commits, so a
+        lower id can become visible after higher ones were seen. The rows hold
+        absolute units, so applying one twice is harmless.
+        """
+        if position is None:
+            return self._execute("change_position").fetchall()[0][0], {}
+        rows = self._execute("changes_after", (position - config.CHANGE_FEED_OVERLAP,)).fetchall()
+        if not rows:
+            return position, {}
+        if rows[0][0] > position + 1:
+            # A gap right after `position` is either pruned rows or ids
+            # skipped by rolled-back writes; only pruning empties the log below it
+            if self._execute("first_change").fetchall()[0][0] == rows[0][0]:
+                return rows[-1][0], None
+        changes = {}
+        for _, blood_group, units_available in rows:
+            changes[blood_group] = units_available
+        return max(position, rows[-1][0]), changes
+
+    def prune_stock_changes(self):
+        """Delete change-log rows older than the retention period, keeping the newest."""
+        cursor = self._cursor()
+        cursor.execute("SELECT MAX(id) FROM StockChanges")
+        (newest,) = cursor.fetchone()
+        if newest is not None:
+            cursor.execute(
+                "DELETE FROM StockChanges WHERE changed_at < NOW() - INTERVAL %s HOUR AND id < %s",
+                (config.CHANGE_LOG_RETENTION_HOURS, newest),
+            )
+        cursor.close()
 
     def authenticate_admin(self, username, password):
         """Authenticate admin credentials against the Admins table."""
-        cursor = self.connection.cursor(dictionary=True)
-        sql = "SELECT * FROM Admins WHERE username = %s AND password_hash = %s"
-        cursor.execute(sql, (username, password))
-        admin = cursor.fetchone()
-        cursor.close()
-        return admin is not None
+        return bool(self._execute("authenticate_admin", (username, password)).fetchall())
 
     def register_donor(self, name, blood_group, contact, donation_date):
-        """Register a new donor and record the donation date."""
-        cursor = self.connection.cursor()
+        """Register a new donor and record the donation date. Returns the new donor's id."""
+        cursor = self._cursor()
         sql = "INSERT INTO Donors (name, blood_group, contact, donation_date) VALUES (%s, %s, %s, %s)"
         cursor.execute(sql, (name, blood_group, contact, donation_date))
-        self.connection.commit()
+        donor_id = cursor.lastrowid
         cursor.close()
+        return donor_id
 
-    def fetch_transaction_history(self):
-        """Fetch all blood transactions (donations and requests) sorted by date."""
-        cursor = self.connection.cursor(dictionary=True)
-        sql = """
-            SELECT name, blood_group, units, transaction_date, transaction_type 
-            FROM BloodTransactions 
-            ORDER BY transaction_date DESC, id DESC
+    def fetch_transaction_history(
+        self,
+        after=None,
+        limit=None,
+        start_date=None,
+        end_date=None,
+        transaction_type=None,
+        blood_group=None,
+        name=None,
+        sort_by="transaction_date",
+        descending=True,
+    ):
         """
-        cursor.execute(sql)
+        Fetch blood transactions (donations and requests), newest first by default.
+        Filters (date range, type, blood group, name prefix) and sorting run in SQL.
+        Pass `limit` to fetch a single page, and the (sort value, id) of the last
+        row already shown as `after` to fetch the page that follows it.
+        Keyset paging keeps every page as cheap as the first, however deep.
+        """
+        if sort_by not in HISTORY_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort transactions by {sort_by!r}")
+        conditions = []
+        params = []
+        if start_date is not None:
+            conditions.append("transaction_date >= %s")
+            params.append(start_date)
+        if end_date is not None:
+            conditions.append("transaction_date <= %s")
+            params.append(end_date)
+        if transaction_type:
+            conditions.append("transaction_type = %s")
+            params.append(transaction_type)
+        if blood_group:
+            conditions.append("blood_group = %s")
+            params.append(blood_group)
+        if name:
+            conditions.append("name LIKE %s")
+            params.append(prefix_pattern(name))
+        op = "<" if descending else ">"
+        if after is not None:
+            after_value, after_id = after
+            conditions.append(f"({sort_by} {op} %s OR ({sort_by} = %s AND id {op} %s))")
+            params += [after_value, after_value, after_id]
+
+        direction = "DESC" if descending else "ASC"
+        sql = f"""
+            SELECT id, name, blood_group, units, transaction_date, transaction_type
+            FROM BloodTransactions{where_clause(conditions)}
+            ORDER BY {sort_by} {direction}, id {direction}
+        """
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        cursor = self._cursor(dictionary=True)
+        cursor.execute(sql, params)
         records = cursor.fetchall()
         cursor.close()
         return records
 
     def add_transaction(self, name, blood_group, units, transaction_type):
-        """Record a blood transaction (donation or request)."""
-        cursor = self.connection.cursor()
+        """
+        Record a blood transaction (donation or request), and add it to today's
+        DailyBloodTotals row in the same transaction.
+        """
+        with self.transaction():
+            self._execute("add_transaction", (name, blood_group, units, transaction_type))
+            for row in daily_total_rows([(None, blood_group, units, transaction_type)]):
+                self._execute("add_daily_total", row)
+
+    def _add_to_daily_totals(self, cursor, rows):
+        """
+        Add (day, blood_group, donations, donated_units, requests, requested_units)
+        increments to DailyBloodTotals. A day of None means the server's CURDATE(),
+        the date the ledger rows were given.
+        """
+        # A plain cursor sends many rows as one multi-row INSERT; a prepared one would loop
+        cursor.executemany(STATEMENTS["add_daily_total"], rows)
+
+    def fetch_daily_totals(self, start_date, end_date, blood_group=None):
+        """
+        Per-day, per-group donation and request totals between two dates
+        (inclusive), read from DailyBloodTotals rather than the ledger.
+        """
         sql = """
-            INSERT INTO BloodTransactions 
-            (name, blood_group, units, transaction_date, transaction_type) 
-            VALUES (%s, %s, %s, CURDATE(), %s)
+            SELECT day, blood_group, donations, donated_units, requests, requested_units
+            FROM DailyBloodTotals
+            WHERE day BETWEEN %s AND %s
         """
-        cursor.execute(sql, (name, blood_group, units, transaction_type))
-        self.connection.commit()
+        params = [start_date, end_date]
+        if blood_group:
+            sql += " AND blood_group = %s"
+            params.append(blood_group)
+        sql += " ORDER BY day, blood_group"
+        cursor = self._cursor(dictionary=True)
+        cursor.execute(sql, params)
+        totals = cursor.fetchall()
         cursor.close()
+        return totals
+
+    def fetch_monthly_totals(self, start_date, end_date, blood_group=None):
+        """The daily totals between two dates summed per month ("YYYY-MM") and group."""
+        sql = """
+            SELECT SUBSTR(day, 1, 7) AS month, blood_group,
+                SUM(donations) AS donations, SUM(donated_units) AS donated_units,
+                SUM(requests) AS requests, SUM(requested_units) AS requested_units
+            FROM DailyBloodTotals
+            WHERE day BETWEEN %s AND %s
+        """
+        params = [start_date, end_date]
+        if blood_group:
+            sql += " AND blood_group = %s"
+            params.append(blood_group)
+        sql += " GROUP BY month, blood_group ORDER BY month, blood_group"
+        cursor = self._cursor(dictionary=True)
+        cursor.execute(sql, params)
+        totals = cursor.fetchall()
+        cursor.close()
+        # SUM() comes back as Decimal
+        for row in totals:
+            for column in ("donations", "donated_units", "requests", "requested_units"):
+                row[column] = int(row[column])
+        return totals
+
+    def fetch_daily_usage(self, start_date, end_date):
+        """
+        Units issued per day and group between two dates (inclusive), as
+        columns (days, blood_groups, units) ready to load into arrays.
+        """
+        cursor = self._cursor()
+        sql = """
+            SELECT day, blood_group, requested_units FROM DailyBloodTotals
+            WHERE day BETWEEN %s AND %s AND requested_units > 0
+        """
+        cursor.execute(sql, (start_date, end_date))
+        rows = cursor.fetchall()
+        cursor.close()
+        if not rows:
+            return (), (), ()
+        days, blood_groups, units = zip(*rows)
+        return days, blood_groups, units
+
+    def ledger_date_range(self):
+        """(first, last) transaction date, or (None, None) for an empty ledger."""
+        cursor = self._cursor()
+        cursor.execute("SELECT MIN(transaction_date), MAX(transaction_date) FROM BloodTransactions")
+        first, last = cursor.fetchone()
+        cursor.close()
+        return first, last
+
+    def rebuild_daily_totals(self, start_date, end_date):
+        """
+        Recompute DailyBloodTotals between two dates (inclusive) from the ledger,
+        in one transaction. The ledger rows read are locked until it commits, so
+        a transaction added meanwhile is counted exactly once.
+        """
+        with self.transaction():
+            cursor = self._cursor()
+            cursor.execute(
+                "DELETE FROM DailyBloodTotals WHERE day BETWEEN %s AND %s", (start_date, end_date)
+            )
+            sql = """
+                INSERT INTO DailyBloodTotals
+                (day, blood_group, donations, donated_units, requests, requested_units)
+                SELECT transaction_date, blood_group,
+                    SUM(transaction_type = 'DONATION'),
+                    SUM(CASE WHEN transaction_type = 'DONATION' THEN units ELSE 0 END),
+                    SUM(transaction_type = 'REQUEST'),
+                    SUM(CASE WHEN transaction_type = 'REQUEST' THEN units ELSE 0 END)
+                FROM BloodTransactions
+                WHERE transaction_date BETWEEN %s AND %s
+                GROUP BY transaction_date, blood_group
+            """
+            cursor.execute(sql, (start_date, end_date))
+            cursor.close()
 
     def fetch_donors(self):
         """Fetch all registered donors."""
-        cursor = self.connection.cursor(dictionary=True)
+        cursor = self._cursor(dictionary=True)
         sql = "SELECT name, blood_group FROM Donors ORDER BY name"
         cursor.execute(sql)
         donors = cursor.fetchall()
         cursor.close()
         return donors
 
+    def search_donors(self, prefix, limit=None):
+        """
+        Find donors whose name starts with `prefix`, alphabetically.
+        Served by the name index and capped at `limit` rows, so the cost does not
+        grow with the size of the Donors table.
+        """
+        if limit is None:
+            limit = config.DONOR_SEARCH_LIMIT
+        return self._query("search_donors", (prefix_pattern(prefix), limit))
+
+    def get_donor(self, donor_id, cached=True):
+        """
+        Fetch one donor by id.
+        Records are kept in a bounded LRU cache shared by the connections of
+        this process, so selecting the same donor again needs no round trip.
+        Edits made by other processes or stations don't evict it, so anything
+        that writes stock on the strength of the record passes cached=False
+        to read it fresh.
+        """
+        donor = _donor_cache.get(donor_id) if cached else None
+        if donor is None:
+            rows = self._query("donor_by_id", (donor_id,))
+            if not rows:
+                return None
+            donor = rows[0]
+            _donor_cache.put(donor_id, donor)
+        return dict(donor)
+
     def get_donor_details(self, donor_name):
         """Fetch details for a specific donor."""
-        cursor = self.connection.cursor(dictionary=True)
-        sql = "SELECT * FROM Donors WHERE name = %s"
-        cursor.execute(sql, (donor_name,))
-        donor = cursor.fetchone()
-        cursor.close()
-        return donor
+        rows = self._query("donor_by_name", (donor_name,))
+        return rows[0] if rows else None
 
-    def fetch_full_donor_list(self):
-        """Fetch all donors with complete information."""
-        cursor = self.connection.cursor(dictionary=True)
-        sql = "SELECT id, name, blood_group, contact, donation_date FROM Donors ORDER BY name"
-        cursor.execute(sql)
+    def fetch_full_donor_list(self, blood_group=None, name=None, sort_by="name", descending=False):
+        """Fetch donors with complete information, filtered and sorted in SQL."""
+        if sort_by not in DONOR_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort donors by {sort_by!r}")
+        conditions = []
+        params = []
+        if blood_group:
+            conditions.append("blood_group = %s")
+            params.append(blood_group)
+        if name:
+            conditions.append("name LIKE %s")
+            params.append(prefix_pattern(name))
+        direction = "DESC" if descending else "ASC"
+        sql = f"""
+            SELECT id, name, blood_group, contact, donation_date
+            FROM Donors{where_clause(conditions)}
+            ORDER BY {sort_by} {direction}, id {direction}
+        """
+        cursor = self._cursor(dictionary=True)
+        cursor.execute(sql, params)
         donors = cursor.fetchall()
         cursor.close()
         return donors
 
+    def update_donor(self, donor_id, name, blood_group, contact, donation_date):
+        """
+        Replace a donor's details. Returns False if there is no such donor.
+        The cached record is dropped, so the next get_donor reads the new one.
+        """
+        cursor = self._cursor()
+        sql = """
+            UPDATE Donors SET name = %s, blood_group = %s, contact = %s, donation_date = %s
+            WHERE id = %s
+        """
+        cursor.execute(sql, (name, blood_group, contact, donation_date, donor_id))
+        found = cursor.rowcount > 0
+        if not found:
+            # MySQL counts only changed rows, so an unchanged donor also gives 0
+            cursor.execute("SELECT 1 FROM Donors WHERE id = %s", (donor_id,))
+            found = cursor.fetchone() is not None
+        cursor.close()
+        _donor_cache.pop(donor_id)
+        return found
+
     def delete_donor(self, donor_id):
         """
         Delete a donor by ID.
@@ -160,17 +871,291 @@ class Database:
         history in the BloodTransactions table intact.
         """
         try:
-            cursor = self.connection.cursor()
+            cursor = self._cursor()
             sql = "DELETE FROM Donors WHERE id = %s"
             cursor.execute(sql, (donor_id,))
-            self.connection.commit()
             affected_rows = cursor.rowcount
             cursor.close()
+            _donor_cache.pop(donor_id)
             return affected_rows > 0
         except Error as e:
             print(f"Error deleting donor: {e}")
             return False
 
+    def insert_donors(self, donors):
+        """Insert many (name, blood_group, contact, donation_date) rows in one statement."""
+        cursor = self._cursor()
+        sql = "INSERT INTO Donors (name, blood_group, contact, donation_date) VALUES (%s, %s, %s, %s)"
+        cursor.executemany(sql, donors)  # sent as a single multi-row INSERT
+        cursor.close()
+
+    def insert_transactions(self, transactions):
+        """
+        Insert many (name, blood_group, units, transaction_date, transaction_type)
+        rows in one statement, and add them to the daily totals in the same transaction.
+        """
+        with self.transaction():
+            cursor = self._cursor()
+            sql = """
+                INSERT INTO BloodTransactions
+                (name, blood_group, units, transaction_date, transaction_type)
+                VALUES (%s, %s, %s, %s, %s)
+            """
+            cursor.executemany(sql, transactions)  # sent as a single multi-row INSERT
+            self._add_to_daily_totals(
+                cursor, daily_total_rows((row[3], row[1], row[2], row[4]) for row in transactions)
+            )
+            cursor.close()
+
+    def import_transactions(self, transactions):
+        """
+        Insert (name, blood_group, units, transaction_date, transaction_type)
+        ledger rows with their stock changes, in one transaction and in the
+        order given. Each DONATION becomes a batch collected on its date; each
+        REQUEST takes its units from the batches on the shelf on its date,
+        soonest-expiring first, and is refused if they fall short. The groups'
+        BloodBank rows are locked first, in blood group order.
+        Returns [(index, reason)] for the refused rows.
+        """
+        groups = sorted({row[1] for row in transactions})
+        if not groups:
+            return []
+        deltas, accepted, rejected = {}, [], []
+        with self.transaction():
+            cursor = self._cursor()
+            sql = f"""
+                SELECT blood_group FROM BloodBank
+                WHERE blood_group IN ({", ".join(["%s"] * len(groups))})
+                ORDER BY blood_group
+                FOR UPDATE
+            """
+            cursor.execute(sql, groups)
+            cursor.fetchall()
+            for i, row in enumerate(transactions):
+                _, blood_group, units, transaction_date, transaction_type = row
+                if transaction_type == "REQUEST":
+                    plan = plan_allocation(self._live_batches(blood_group, transaction_date), units)
+                    if plan is None:
+                        rejected.append(
+                            (i, f"request for {units} units exceeds the stock on {transaction_date}")
+                        )
+                        continue
+                    self._apply_allocation(plan)
+                    deltas[blood_group] = deltas.get(blood_group, 0) - units
+                else:
+                    self._add_batches(cursor, [(blood_group, units, transaction_date)])
+                    deltas[blood_group] = deltas.get(blood_group, 0) + units
+                accepted.append(row)
+            if deltas:
+                self._adjust_stock(cursor, deltas)
+            cursor.close()
+            if accepted:
+                self.insert_transactions(accepted)
+        return rejected
+
+    def apply_stock_deltas(self, deltas):
+        """
+        Add {blood_group: units} (negative to take units away) to BloodBank as one
+        aggregate change per group. Missing groups are created; totals never drop
+        below zero. Units added become a batch collected today; units taken
+        away come from the soonest-expiring unexpired batches, then from
+        expired ones, oldest first.
+        """
+        if not deltas:
+            return
+        with self.transaction():
+            cursor = self._cursor()
+            # BloodBank rows first, the lock order process_request uses
+            self._adjust_stock(cursor, deltas)
+            self._add_batches(cursor, [(g, units, None) for g, units in deltas.items() if units > 0])
+            for blood_group, units in deltas.items():
+                if units >= 0:
+                    continue
+                plan = plan_allocation(self._live_batches(blood_group), -units)
+                if plan is None:
+                    # Too few unexpired units: take them all and the rest from expired
+                    # batches, oldest first, so the batches left still add up to the total
+                    sql = """
+                        SELECT id, units_remaining FROM BloodBatches WHERE blood_group = %s
+                        ORDER BY expires_on < CURDATE(), expires_on, id
+                        FOR UPDATE
+                    """
+                    cursor.execute(sql, (blood_group,))
+                    plan = plan_allocation(cursor.fetchall(), -units)
+                if plan is None:
+                    # Fewer units than asked for: take them all
+                    cursor.execute("DELETE FROM BloodBatches WHERE blood_group = %s", (blood_group,))
+                else:
+                    self._apply_allocation(plan)
+            cursor.close()
+
+    def _adjust_stock(self, cursor, deltas):
+        """
+        Add {blood_group: units} to BloodBank totals, never below zero. Two
+        statements; rows are locked in blood group order, as everywhere else.
+        """
+        groups = sorted(deltas)
+        placeholders = ", ".join(["%s"] * len(groups))
+        # Make sure every group has a row (a no-op for the ones that already do)
+        sql = f"""
+            INSERT INTO BloodBank (blood_group, units_available)
+            VALUES {", ".join(["(%s, 0)"] * len(groups))}
+            ON DUPLICATE KEY UPDATE units_available = units_available
+        """
+        cursor.execute(sql, groups)
+        cases = " ".join(["WHEN %s THEN %s"] * len(groups))
+        params = []
+        for blood_group in groups:
+            params += [blood_group, deltas[blood_group]]
+        sql = f"""
+            UPDATE BloodBank
+            SET units_available = GREATEST(units_available + CASE blood_group {cases} END, 0)
+            WHERE blood_group IN ({placeholders})
+        """
+        cursor.execute(sql, params + groups)
+
+    def insert_batches(self, batches):
+        """
+        Add many (blood_group, units, collected_on) batches, and their units to
+        BloodBank, in one transaction.
+        """
+        deltas = {}
+        for blood_group, units, _ in batches:
+            deltas[blood_group] = deltas.get(blood_group, 0) + units
+        if not deltas:
+            return
+        with self.transaction():
+            cursor = self._cursor()
+            self._adjust_stock(cursor, deltas)
+            self._add_batches(cursor, batches)
+            cursor.close()
+
+    def discard_expired_batches(self):
+        """
+        Delete batches past their expiry date and take their units off BloodBank.
+        Returns {blood_group: units discarded}.
+        """
+        with self.transaction():
+            cursor = self._cursor()
+            try:
+                # Same lock order as process_batch_request
+                cursor.execute("SELECT blood_group FROM BloodBank ORDER BY blood_group FOR UPDATE")
+                groups = [row[0] for row in cursor.fetchall()]
+                if not groups:
+                    return {}
+                placeholders = ", ".join(["%s"] * len(groups))
+                sql = f"""
+                    SELECT blood_group, SUM(units_remaining) FROM BloodBatches
+                    WHERE blood_group IN ({placeholders}) AND expires_on < CURDATE()
+                    GROUP BY blood_group
+                """
+                cursor.execute(sql, groups)
+                # SUM() comes back as Decimal
+                expired = {blood_group: int(units) for blood_group, units in cursor.fetchall()}
+                if not expired:
+                    return {}
+                sql = f"""
+                    DELETE FROM BloodBatches
+                    WHERE blood_group IN ({placeholders}) AND expires_on < CURDATE()
+                """
+                cursor.execute(sql, groups)
+                self._adjust_stock(cursor, {g: -units for g, units in expired.items()})
+            finally:
+                cursor.close()
+        return expired
+
+    def count_rows(self, table):
+        """Number of rows in an export table (for progress reporting)."""
+        table_name, _ = EXPORT_TABLES[table]
+        cursor = self._cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+        (count,) = cursor.fetchone()
+        cursor.close()
+        return count
+
+    def stream_rows(self, table, batch_size):
+        """
+        Yield the rows of an export table as lists of at most `batch_size` tuples,
+        in primary key order. The cursor is unbuffered, so rows are read off the
+        socket batch by batch instead of the whole table being held in memory.
+        The connection is busy until the generator finishes; if it is closed
+        early the connection is dropped rather than draining the rest of the table.
+        """
+        table_name, columns = EXPORT_TABLES[table]
+        cursor = self._cursor(buffered=False)
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {table_name} ORDER BY id")
+        finished = False
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    finished = True
+                    return
+                yield rows
+        finally:
+            if finished:
+                cursor.close()
+            else:
+                get_pool().discard(self.connection)
+                self.connection = None
+
+    def applied_migrations(self):
+        """Return the set of schema versions already applied."""
+        cursor = self._cursor()
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS SchemaMigrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        cursor.execute("SELECT version FROM SchemaMigrations")
+        versions = {row[0] for row in cursor.fetchall()}
+        cursor.close()
+        return versions
+
+    def apply_migration(self, version, name, statements):
+        """
+        Run one migration's statements and record its version.
+        MySQL commits DDL implicitly, so a failing migration is not rolled back.
+        """
+        cursor = self._cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.execute(
+            "INSERT INTO SchemaMigrations (version, name) VALUES (%s, %s)", (version, name)
+        )
+        cursor.close()
+
+    def explain(self, sql, params=()):
+        """Return the EXPLAIN plan rows for a query."""
+        cursor = self._cursor(dictionary=True)
+        cursor.execute("EXPLAIN " + sql, params)
+        plan = cursor.fetchall()
+        cursor.close()
+        return plan
+
+    def query_plan_problems(self, sql, params, needs_index_order, bounded_scan=False):
+        """
+        A plan fails if MySQL has no index it could use (a full table scan
+        whatever the data size), if it reads a whole index where a bounded scan
+        isn't expected, or if it must be sorted and falls back to a filesort.
+        """
+        problems = []
+        for row in self.explain(sql, params):
+            extra = row.get("Extra") or ""
+            if row.get("type") == "ALL" and not row.get("possible_keys"):
+                problems.append(f"full scan of {row.get('table')}")
+            elif row.get("type") == "index" and not bounded_scan:
+                problems.append(f"full index scan of {row.get('table')}")
+            elif needs_index_order and "Using filesort" in extra:
+                problems.append(f"filesort on {row.get('table')}")
+        return problems
+
     def close_connection(self):
-        if self.connection.is_connected():
-            self.connection.close()
+        """Return the connection to the shared pool."""
+        if self.connection is not None:
+            get_pool().release(self.connection)
+            self.connection = None
@@ -0,0 +1,135 @@
+# export.py
+"""
+Streaming export of the transaction ledger and the donor list.
+
+    python export.py transactions ledger.csv
+    python export.py donors donors.parquet
+
+Rows are streamed from the server in batches of config.EXPORT_BATCH_SIZE and
+written as they arrive, so memory use stays bounded however large the table.
+The format follows the file extension (.csv or .parquet) unless --format is
+given. Parquet output needs pyarrow.
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import config
+from storage import EXPORT_TABLES, open_database
+
+FORMATS = ("csv", "parquet")
+
+
+def format_for(path):
+    """Guess the export format from a file name."""
+    return "parquet" if path.lower().endswith(".parquet") else "csv"
+
+
+class _CsvWriter:
+    def __init__(self, path, columns):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        types = {
+            "id": pa.int64(),
+            "units": pa.int32(),
+            "transaction_date": pa.date32(),
+            "donation_date": pa.date32(),
+        }
+        self._pa = pa
+        self._schema = pa.schema([(column, types.get(column, pa.string())) for column in columns])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows):
+        # Each batch becomes one row group
+        columns = list(zip(*rows))
+        arrays = [
+            self._pa.array(values, type=field.type) for values, field in zip(columns, self._schema)
+        ]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def export_table(table, path, fmt=None, db=None, batch_size=None, progress=None, cancelled=None):
+    """
+    Write `table` ("transactions" or "donors") to `path` and return the number
+    of rows written. progress(done, total) is called after every batch. If
+    cancelled() returns True the export stops, the partial file is removed and
+    None is returned.
+    """
+    _, columns = EXPORT_TABLES[table]
+    fmt = fmt or format_for(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    batch_size = batch_size or config.EXPORT_BATCH_SIZE
+    own_db = db is None
+    if own_db:
+        db = open_database()
+
+    writer = _ParquetWriter(path, columns) if fmt == "parquet" else _CsvWriter(path, columns)
+    done = 0
+    completed = False
+    try:
+        total = db.count_rows(table)
+        if progress:
+            progress(0, total)
+        batches = db.stream_rows(table, batch_size)
+        try:
+            for rows in batches:
+                if cancelled and cancelled():
+                    return None
+                writer.write(rows)
+                done += len(rows)
+                if progress:
+                    progress(done, total)
+        finally:
+            batches.close()
+        completed = True
+        return done
+    finally:
+        writer.close()
+        if not completed and os.path.exists(path):
+            os.remove(path)
+        if own_db:
+            db.close_connection()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export transactions or donors to CSV or Parquet.")
+    parser.add_argument("table", choices=sorted(EXPORT_TABLES))
+    parser.add_argument("path", help="output file (.csv or .parquet)")
+    parser.add_argument("--format", choices=FORMATS, help="override the format implied by the extension")
+    parser.add_argument("--batch-size", type=int, help=f"rows per batch (default {config.EXPORT_BATCH_SIZE})")
+    args = parser.parse_args(argv)
+
+    def progress(done, total):
+        print(f"\r{done:,} / {total:,} rows", end="", flush=True)
+
+    written = export_table(
+        args.table, args.path, fmt=args.format, batch_size=args.batch_size, progress=progress
+    )
+    print(f"\nExported {written:,} rows to {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# forecast.py
+"""
+Demand forecasting and shortage alerts per blood group.
+
+    python forecast.py
+
+Daily issued units come from the DailyBloodTotals summary as columns and are
+laid out as one NumPy matrix (blood group x day), so the rolling consumption
+rates of all eight groups over the whole history are a couple of cumulative
+sums. Each group's rate is the higher of its short and long rolling averages,
+so a recent surge shows up at once while a quiet week doesn't hide normal
+demand. Days of supply is current stock divided by that rate.
+"""
+
+import datetime
+import sys
+import time
+
+import numpy as np
+
+import config
+from config import BLOOD_GROUPS
+
+# Alert levels, most urgent first
+CRITICAL = "critical"
+LOW = "low"
+OK = "ok"
+
+
+def usage_matrix(days, blood_groups, units, start_date, n_days):
+    """
+    Scatter the (days, blood_groups, units) columns into a float array of
+    shape (len(BLOOD_GROUPS), n_days); column 0 is start_date.
+    """
+    matrix = np.zeros((len(BLOOD_GROUPS), n_days))
+    if not len(days):
+        return matrix
+    offsets = (np.array(days, dtype="datetime64[D]") - np.datetime64(start_date, "D")).astype(np.int64)
+    names, codes = np.unique(np.array(blood_groups), return_inverse=True)
+    # Rows of unknown groups get -1 and are dropped
+    group_rows = np.array([BLOOD_GROUPS.index(n) if n in BLOOD_GROUPS else -1 for n in names])[codes]
+    keep = (group_rows >= 0) & (offsets >= 0) & (offsets < n_days)
+    np.add.at(matrix, (group_rows[keep], offsets[keep]), np.asarray(units, dtype=float)[keep])
+    return matrix
+
+
+def rolling_rates(matrix, window):
+    """
+    Mean daily usage over every `window`-day span, per group: an array of
+    shape (groups, n_days - window + 1) whose last column ends on the last day.
+    """
+    window = min(window, matrix.shape[1])
+    totals = np.cumsum(matrix, axis=1)
+    totals = np.concatenate([np.zeros((matrix.shape[0], 1)), totals], axis=1)
+    return (totals[:, window:] - totals[:, :-window]) / window
+
+
+def consumption_rates(db, today=None):
+    """Current expected units issued per day for each blood group, as {group: rate}."""
+    today = today or datetime.date.today()
+    # Today is still in progress, so the history ends yesterday
+    end_date = today - datetime.timedelta(days=1)
+    n_days = config.FORECAST_HISTORY_DAYS
+    start_date = end_date - datetime.timedelta(days=n_days - 1)
+    days, blood_groups, units = db.fetch_daily_usage(start_date, end_date)
+    matrix = usage_matrix(days, blood_groups, units, start_date, n_days)
+    short = rolling_rates(matrix, config.FORECAST_SHORT_WINDOW)[:, -1]
+    long = rolling_rates(matrix, config.FORECAST_LONG_WINDOW)[:, -1]
+    rates = np.maximum(short, long)
+    return dict(zip(BLOOD_GROUPS, rates.tolist()))
+
+
+def project(stock, rates, today=None):
+    """
+    Days of supply, stock-out date and alert level per group, from the units
+    in stock {group: units} and consumption rates {group: units per day}.
+    Groups with no recent demand have infinite supply and no stock-out date.
+    """
+    today = today or datetime.date.today()
+    units = np.array([stock.get(group, 0) for group in BLOOD_GROUPS], dtype=float)
+    rate = np.array([rates.get(group, 0.0) for group in BLOOD_GROUPS])
+    days_of_supply = np.divide(units, rate, out=np.full(len(BLOOD_GROUPS), np.inf), where=rate > 0)
+    alerts = np.where(
+        days_of_supply < config.SHORTAGE_CRITICAL_DAYS,
+        CRITICAL,
+        np.where(days_of_supply < config.SHORTAGE_WARNING_DAYS, LOW, OK),
+    )
+    projections = {}
+    for i, group in enumerate(BLOOD_GROUPS):
+        days = days_of_supply[i]
+        projections[group] = {
+            "units": int(units[i]),
+            "daily_rate": float(rate[i]),
+            "days_of_supply": float(days),
+            "stockout_date": today + datetime.timedelta(days=int(days)) if np.isfinite(days) else None,
+            "alert": str(alerts[i]),
+        }
+    return projections
+
+
+def shortage_alerts(projections):
+    """(group, projection) pairs that are critical or low, most urgent first."""
+    at_risk = [(g, p) for g, p in projections.items() if p["alert"] != OK]
+    return sorted(at_risk, key=lambda item: item[1]["days_of_supply"])
+
+
+def main(argv=None):
+    from storage import open_database
+
+    db = open_database()
+    try:
+        started = time.perf_counter()
+        rates = consumption_rates(db)
+        stock = {r["blood_group"]: r["units_available"] for r in db.fetch_all_blood_records()}
+        projections = project(stock, rates)
+        elapsed = time.perf_counter() - started
+    finally:
+        db.close_connection()
+
+    print(f"{'group':5} {'units':>6} {'per day':>8} {'days left':>10}  stock-out   alert")
+    for group, p in projections.items():
+        days = "-" if p["stockout_date"] is None else f"{p['days_of_supply']:.1f}"
+        stockout = p["stockout_date"].isoformat() if p["stockout_date"] else "-"
+        print(f"{group:5} {p['units']:6} {p['daily_rate']:8.2f} {days:>10}  {stockout:10}  {p['alert']}")
+    print(f"\nForecast over {config.FORECAST_HISTORY_DAYS} days of history in {elapsed * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
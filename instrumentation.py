@@ -0,0 +1,290 @@
+# instrumentation.py
+"""
+Metrics for the data layer.
+
+Every storage method is timed by the @instrumented class decorator (call
+count, errors, rows returned and a latency histogram per method), and every
+statement a backend runs goes through a timed cursor that writes statements
+slower than config.SLOW_QUERY_MS to config.SLOW_QUERY_LOG. The log records the
+SQL and the shape of its parameters (types and row counts), never the values,
+so donor details stay out of it.
+
+The numbers are shown in the main window's diagnostics panel and, while
+start_periodic_dump() runs, written to config.METRICS_DUMP_PATH as JSON.
+"""
+
+import atexit
+import datetime
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+import config
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open-ended
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+# Storage methods that are not queries and are left untimed
+UNTIMED = {"transaction", "close_connection"}
+
+
+class MethodStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * len(BUCKETS_MS)
+
+    def record(self, elapsed_ms, rows, failed):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if failed:
+            self.errors += 1
+        if rows:
+            self.rows += rows
+        for i, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of calls (an estimate)."""
+        wanted = fraction * self.calls
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= wanted and count:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "mean_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "p50_ms": round(self.percentile(0.50), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.max_ms, 3),
+            "histogram": {
+                ("inf" if bound == float("inf") else str(bound)): count
+                for bound, count in zip(BUCKETS_MS, self.buckets)
+            },
+        }
+
+
+class Metrics:
+    """Per-method statistics shared by every thread in the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods = {}
+        self.started = datetime.datetime.now()
+
+    def record(self, method, elapsed_ms, rows=None, failed=False):
+        with self._lock:
+            stats = self._methods.get(method)
+            if stats is None:
+                stats = self._methods[method] = MethodStats()
+            stats.record(elapsed_ms, rows, failed)
+
+    def snapshot(self):
+        """{method: stats dict}, sorted by method name."""
+        with self._lock:
+            return {name: self._methods[name].as_dict() for name in sorted(self._methods)}
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+            self.started = datetime.datetime.now()
+
+
+metrics = Metrics()
+
+_current = threading.local()  # the storage method running on this thread, for the slow log
+_slow_log_lock = threading.Lock()
+
+
+def _row_count(result):
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        return 1
+    return None
+
+
+def _timed_rows(method, rows):
+    """Wrap a generator of row batches so the whole iteration is timed and counted."""
+    started = time.perf_counter()
+    count = 0
+    failed = False
+    try:
+        while True:
+            # The generator's statements run here, so attribute them to its method
+            outer = getattr(_current, "method", None)
+            _current.method = method
+            try:
+                batch = next(rows)
+            except StopIteration:
+                return
+            finally:
+                _current.method = outer
+            count += len(batch)
+            yield batch
+    except Exception:
+        failed = True
+        raise
+    finally:
+        rows.close()  # closing early must reach the backend's cleanup now, not at GC
+        metrics.record(method, (time.perf_counter() - started) * 1000, count, failed)
+
+
+def _timed(method, function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        outer = getattr(_current, "method", None)
+        _current.method = method
+        started = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        except Exception:
+            metrics.record(method, (time.perf_counter() - started) * 1000, failed=True)
+            raise
+        finally:
+            _current.method = outer
+        if inspect.isgenerator(result):
+            return _timed_rows(method, result)
+        metrics.record(method, (time.perf_counter() - started) * 1000, _row_count(result))
+        return result
+
+    return wrapper
+
+
+def instrumented(cls):
+    """Class decorator: time every public storage method of a backend."""
+    for name, function in list(vars(cls).items()):
+        if name.startswith("_") or name in UNTIMED or not inspect.isfunction(function):
+            continue
+        setattr(cls, name, _timed(name, function))
+    return cls
+
+
+def parameter_shape(params, many=False):
+    """Describe bound parameters by type only, e.g. "(str, int)" or "1000 x (str, date)"."""
+    if many:
+        params = list(params)
+        if not params:
+            return "0 rows"
+        return f"{len(params)} x {parameter_shape(params[0])}"
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in params) + ")"
+
+
+def _log_slow(elapsed_ms, sql, shape):
+    if not config.SLOW_QUERY_LOG:
+        return
+    method = getattr(_current, "method", None) or "-"
+    line = (
+        f"{datetime.datetime.now().isoformat(timespec='milliseconds')}"
+        f"\t{elapsed_ms:.1f}ms\t{method}\t{' '.join(sql.split())}\t{shape}\n"
+    )
+    try:
+        with _slow_log_lock:
+            directory = os.path.dirname(config.SLOW_QUERY_LOG)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(config.SLOW_QUERY_LOG, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        print(f"Could not write slow query log: {e}")
+
+
+class TimedCursor:
+    """Cursor proxy that logs statements slower than config.SLOW_QUERY_MS."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, params)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= config.SLOW_QUERY_MS:
+                _log_slow(elapsed_ms, sql, parameter_shape(params))
+
+    def executemany(self, sql, seq_params):
+        seq_params = list(seq_params)
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, seq_params)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= config.SLOW_QUERY_MS:
+                _log_slow(elapsed_ms, sql, parameter_shape(seq_params, many=True))
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+def dump(path=None):
+    """Write the current metrics to `path` (default config.METRICS_DUMP_PATH) as JSON."""
+    path = path or config.METRICS_DUMP_PATH
+    document = {
+        "written": datetime.datetime.now().isoformat(timespec="seconds"),
+        "since": metrics.started.isoformat(timespec="seconds"),
+        "backend": config.DB_BACKEND,
+        "methods": metrics.snapshot(),
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Write then rename, so a reader never sees a half-written file
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    os.replace(temporary, path)
+
+
+_dump_thread = None
+
+
+def start_periodic_dump(interval=None):
+    """Dump the metrics every `interval` seconds on a daemon thread, and once more at exit."""
+    global _dump_thread
+    if not config.METRICS_DUMP_PATH or _dump_thread is not None:
+        return
+    interval = interval or config.METRICS_DUMP_INTERVAL
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                dump()
+            except OSError as e:
+                print(f"Could not write metrics: {e}")
+
+    def final_dump():
+        stop.set()
+        try:
+            dump()
+        except OSError as e:
+            print(f"Could not write metrics: {e}")
+
+    _dump_thread = threading.Thread(target=run, name="metrics-dump", daemon=True)
+    _dump_thread.start()
+    atexit.register(final_dump)
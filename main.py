@@ -1,9 +1,23 @@
+from startup_timing import StartupTimer
 import customtkinter as ctk
 from auth import AdminLogin
 import tkinter as tk
+import config
+import instrumentation
+import migrate
 
 if __name__ == "__main__":
+    timer = StartupTimer()
+    timer.mark("imports")
     try:
+        # Bring the database schema up to date
+        if config.DB_AUTO_MIGRATE:
+            migrate.apply_migrations()
+        timer.mark("migrations")
+
+        # Write the data layer metrics to disk every METRICS_DUMP_INTERVAL seconds
+        instrumentation.start_periodic_dump()
+
         # Set appearance mode
         ctk.set_appearance_mode("light")
         
@@ -12,6 +26,14 @@ if __name__ == "__main__":
         
         # Initialize login screen
         app = AdminLogin(root)
+        timer.mark("login widgets")
+
+        # Runs once the login window has been drawn
+        def on_first_frame():
+            timer.mark("login window")
+            timer.report()
+
+        root.after(0, on_first_frame)
         
         # Start the application
         root.mainloop()
@@ -0,0 +1,277 @@
+# migrate.py
+"""
+Versioned schema migrations.
+
+The numbered .sql files in migrations/<backend>/ (mysql or sqlite, after
+config.DB_BACKEND) are applied in order and recorded in the SchemaMigrations
+table, so running this again only applies new files. Both directories define
+the same schema, version for version.
+
+    python migrate.py            apply pending migrations
+    python migrate.py --status   list applied and pending migrations
+    python migrate.py --check    EXPLAIN the hot queries and fail on full scans
+"""
+
+import argparse
+import os
+import re
+import sys
+
+from storage import open_database
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# The queries the backends run against tables that grow, with sample parameters,
+# written in MySQL's dialect (the SQLite backend translates them). Where the
+# backends phrase a query differently, its SQL and parameters are {dialect: ...} dicts.
+# The last field marks queries whose ORDER BY must come from an index (no filesort).
+PLAN_CHECKS = [
+    (
+        "get_units_for_blood_group",
+        "SELECT units_available FROM BloodBank WHERE blood_group = %s",
+        ("A+",),
+        False,
+    ),
+    (
+        "process_request",
+        "UPDATE BloodBank SET units_available = units_available - %s WHERE blood_group = %s",
+        (1, "A+"),
+        False,
+    ),
+    (
+        "process_request (batch allocation)",
+        "SELECT id, units_remaining, expires_on FROM BloodBatches"
+        " WHERE blood_group = %s AND expires_on >= %s"
+        " AND (expires_on > %s OR (expires_on = %s AND id > %s))"
+        " ORDER BY expires_on, id LIMIT %s FOR UPDATE",
+        ("A+", "2024-01-01", "2024-01-01", "2024-01-01", 0, 50),
+        True,
+    ),
+    (
+        "import_transactions (batches on a day)",
+        "SELECT id, units_remaining, expires_on FROM BloodBatches"
+        " WHERE blood_group = %s AND expires_on >= %s AND collected_on <= %s"
+        " AND (expires_on > %s OR (expires_on = %s AND id > %s))"
+        " ORDER BY expires_on, id LIMIT %s FOR UPDATE",
+        ("A+", "2020-03-01", "2020-03-01", "2020-03-01", "2020-03-01", 0, 50),
+        True,
+    ),
+    (
+        "process_batch_request",
+        "SELECT blood_group, units_available FROM BloodBank"
+        " WHERE blood_group IN (%s, %s) ORDER BY blood_group FOR UPDATE",
+        ("A+", "O-"),
+        False,
+    ),
+    (
+        "changes_since",
+        "SELECT id, blood_group, units_available FROM StockChanges WHERE id > %s ORDER BY id",
+        (1000,),
+        True,
+    ),
+    (
+        "authenticate_admin",
+        "SELECT 1 FROM Admins WHERE username = %s AND password_hash = %s",
+        ("admin", "secret"),
+        False,
+    ),
+    (
+        "search_donors",
+        "SELECT id, name, blood_group FROM Donors WHERE name LIKE %s ORDER BY name, id LIMIT %s",
+        ("Ja%", 20),
+        True,
+    ),
+    (
+        "get_donor",
+        "SELECT id, name, blood_group, contact, donation_date FROM Donors WHERE id = %s",
+        (1,),
+        False,
+    ),
+    (
+        "get_donor_details",
+        "SELECT id, name, blood_group, contact, donation_date FROM Donors WHERE name = %s",
+        ("Jane",),
+        False,
+    ),
+    (
+        "delete_donor",
+        "DELETE FROM Donors WHERE id = %s",
+        (1,),
+        False,
+    ),
+    (
+        "fetch_full_donor_list (name filter)",
+        "SELECT id, name, blood_group, contact, donation_date FROM Donors"
+        " WHERE name LIKE %s ORDER BY name ASC, id ASC",
+        ("Ja%",),
+        True,
+    ),
+    (
+        "fetch_full_donor_list (blood group filter)",
+        "SELECT id, name, blood_group, contact, donation_date FROM Donors"
+        " WHERE blood_group = %s ORDER BY name ASC, id ASC",
+        ("A+",),
+        True,
+    ),
+    (
+        "fetch_transaction_history (first page)",
+        "SELECT id, name, blood_group, units, transaction_date, transaction_type"
+        " FROM BloodTransactions ORDER BY transaction_date DESC, id DESC LIMIT %s",
+        (200,),
+        True,
+    ),
+    (
+        "fetch_transaction_history (next page)",
+        {
+            "mysql": "SELECT id, name, blood_group, units, transaction_date, transaction_type"
+            " FROM BloodTransactions"
+            " WHERE (transaction_date < %s OR (transaction_date = %s AND id < %s))"
+            " ORDER BY transaction_date DESC, id DESC LIMIT %s",
+            "sqlite": "SELECT id, name, blood_group, units, transaction_date, transaction_type"
+            " FROM BloodTransactions WHERE (transaction_date, id) < (%s, %s)"
+            " ORDER BY transaction_date DESC, id DESC LIMIT %s",
+        },
+        {"mysql": ("2024-01-01", "2024-01-01", 1000, 200), "sqlite": ("2024-01-01", 1000, 200)},
+        True,
+    ),
+    (
+        "fetch_transaction_history (type filter)",
+        "SELECT id, name, blood_group, units, transaction_date, transaction_type"
+        " FROM BloodTransactions WHERE transaction_type = %s"
+        " ORDER BY transaction_date DESC, id DESC LIMIT %s",
+        ("DONATION", 200),
+        True,
+    ),
+    (
+        "fetch_transaction_history (blood group filter)",
+        "SELECT id, name, blood_group, units, transaction_date, transaction_type"
+        " FROM BloodTransactions WHERE blood_group = %s"
+        " ORDER BY transaction_date DESC, id DESC LIMIT %s",
+        ("A+", 200),
+        True,
+    ),
+    (
+        "fetch_transaction_history (name filter)",
+        "SELECT id, name, blood_group, units, transaction_date, transaction_type"
+        " FROM BloodTransactions WHERE name LIKE %s"
+        " ORDER BY transaction_date DESC, id DESC LIMIT %s",
+        ("Ja%", 200),
+        False,
+    ),
+    (
+        "fetch_daily_totals",
+        "SELECT day, blood_group, donations, donated_units, requests, requested_units"
+        " FROM DailyBloodTotals WHERE day BETWEEN %s AND %s ORDER BY day, blood_group",
+        ("2024-01-01", "2024-01-31"),
+        True,
+    ),
+]
+
+# Checks whose plan may walk an index from one end, because a LIMIT stops it early
+BOUNDED_SCANS = {"fetch_transaction_history (first page)"}
+
+
+def discover_migrations(dialect):
+    """Return (version, name, path) for every migration file of a backend, in order."""
+    directory = os.path.join(MIGRATIONS_DIR, dialect)
+    migrations = []
+    for filename in os.listdir(directory):
+        match = re.match(r"^(\d+)_(\w+)\.sql$", filename)
+        if match:
+            migrations.append(
+                (int(match.group(1)), match.group(2), os.path.join(directory, filename))
+            )
+    return sorted(migrations)
+
+
+def split_statements(script):
+    """
+    Split a migration file into statements, dropping -- comments. A trigger
+    body (CREATE TRIGGER ... BEGIN ...; END) is kept whole.
+    """
+    lines = [line for line in script.splitlines() if not line.strip().startswith("--")]
+    statements = []
+    pending = ""
+    for part in "\n".join(lines).split(";"):
+        pending = f"{pending};{part}" if pending else part
+        text = pending.strip()
+        words = text.upper().split()
+        if words[:2] == ["CREATE", "TRIGGER"] and "BEGIN" in words and words[-1] != "END":
+            continue  # inside the trigger body; the next ";" doesn't end the statement
+        if text:
+            statements.append(text)
+        pending = ""
+    return statements
+
+
+def apply_migrations(db=None):
+    """Apply every pending migration. Returns the names of the ones applied."""
+    own_db = db is None
+    if own_db:
+        db = open_database()
+    try:
+        applied = db.applied_migrations()
+        newly_applied = []
+        for version, name, path in discover_migrations(db.dialect):
+            if version in applied:
+                continue
+            with open(path, encoding="utf-8") as f:
+                statements = split_statements(f.read())
+            print(f"Applying migration {version:04d}_{name}")
+            db.apply_migration(version, name, statements)
+            newly_applied.append(name)
+        return newly_applied
+    finally:
+        if own_db:
+            db.close_connection()
+
+
+def check_query_plans(db):
+    """
+    EXPLAIN every query in PLAN_CHECKS. A query fails if it scans a whole table
+    or index (unless it is one of the BOUNDED_SCANS), or if it must be sorted
+    and the index can't give the order. Returns a list of (label, reason) failures.
+    """
+    failures = []
+    for label, sql, params, needs_index_order in PLAN_CHECKS:
+        if isinstance(sql, dict):
+            sql, params = sql[db.dialect], params[db.dialect]
+        problems = db.query_plan_problems(sql, params, needs_index_order, label in BOUNDED_SCANS)
+        for reason in problems:
+            failures.append((label, reason))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply or inspect schema migrations.")
+    parser.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    parser.add_argument("--check", action="store_true", help="fail if a hot query needs a full scan")
+    args = parser.parse_args(argv)
+
+    db = open_database()
+    try:
+        if args.status:
+            applied = db.applied_migrations()
+            for version, name, _ in discover_migrations(db.dialect):
+                state = "applied" if version in applied else "pending"
+                print(f"{version:04d}_{name}: {state}")
+            return 0
+
+        if args.check:
+            failures = check_query_plans(db)
+            for label, reason in failures:
+                print(f"FAIL {label}: {reason}")
+            if failures:
+                return 1
+            print(f"All {len(PLAN_CHECKS)} query plans use an index.")
+            return 0
+
+        applied = apply_migrations(db)
+        print(f"Applied {len(applied)} migration(s)." if applied else "Schema is up to date.")
+        return 0
+    finally:
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+-- Base tables (the layout of the old schema.sql, named the way database.py queries them)
+
+CREATE TABLE IF NOT EXISTS BloodBank (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    blood_group VARCHAR(5) NOT NULL,
+    units_available INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS Donors (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    blood_group VARCHAR(5) NOT NULL,
+    contact VARCHAR(15) NOT NULL,
+    donation_date DATE
+);
+
+CREATE TABLE IF NOT EXISTS BloodTransactions (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    blood_group VARCHAR(5) NOT NULL,
+    units INT NOT NULL,
+    transaction_date DATE NOT NULL,
+    transaction_type ENUM('DONATION', 'REQUEST') NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS Admins (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(50) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL
+);
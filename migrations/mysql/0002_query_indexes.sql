@@ -0,0 +1,30 @@
+-- Indexes for the lookups and sort orders in database.py.
+-- InnoDB appends the primary key to every secondary index, so (x) also serves ORDER BY x, id.
+
+-- get_units_for_blood_group / add_donation / process_request: one row per group.
+-- Older versions could insert a second row for a group, so first fold every
+-- group's rows into its oldest one, summing the units.
+UPDATE BloodBank b
+JOIN (
+    SELECT MIN(id) AS keep_id, SUM(units_available) AS total FROM BloodBank
+    GROUP BY blood_group HAVING COUNT(*) > 1
+) d ON b.id = d.keep_id
+SET b.units_available = d.total;
+
+DELETE b FROM BloodBank b
+JOIN (SELECT blood_group, MIN(id) AS keep_id FROM BloodBank GROUP BY blood_group) d
+    ON b.blood_group = d.blood_group AND b.id <> d.keep_id;
+
+ALTER TABLE BloodBank ADD UNIQUE KEY uq_bloodbank_blood_group (blood_group);
+
+-- get_donor_details, name-prefix search, blood group filter sorted by name
+ALTER TABLE Donors
+    ADD INDEX idx_donors_name (name),
+    ADD INDEX idx_donors_blood_group_name (blood_group, name);
+
+-- fetch_transaction_history: default order and keyset paging, plus each filter
+ALTER TABLE BloodTransactions
+    ADD INDEX idx_transactions_date (transaction_date),
+    ADD INDEX idx_transactions_type_date (transaction_type, transaction_date),
+    ADD INDEX idx_transactions_group_date (blood_group, transaction_date),
+    ADD INDEX idx_transactions_name (name);
@@ -0,0 +1,20 @@
+-- Stock per donated batch with its collection and expiry dates. BloodBank keeps
+-- each group's total; requests take units from the soonest-expiring unexpired
+-- batches through idx_batches_group_expiry, and used-up batches are deleted, so
+-- the table only ever holds live stock.
+
+CREATE TABLE IF NOT EXISTS BloodBatches (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    blood_group VARCHAR(5) NOT NULL,
+    units_remaining INT NOT NULL,
+    collected_on DATE NOT NULL,
+    expires_on DATE NOT NULL,
+    INDEX idx_batches_group_expiry (blood_group, expires_on)
+);
+
+-- Stock held before batches were tracked has no dates: one batch per group,
+-- counted as collected today. The 42 days are fixed here (the default
+-- config.BLOOD_SHELF_LIFE_DAYS); a changed config value applies to new batches only.
+INSERT INTO BloodBatches (blood_group, units_remaining, collected_on, expires_on)
+SELECT blood_group, units_available, CURDATE(), CURDATE() + INTERVAL 42 DAY
+FROM BloodBank WHERE units_available > 0;
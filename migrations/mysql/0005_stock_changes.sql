@@ -0,0 +1,22 @@
+-- Change log of BloodBank, read by changes_since() so stations can pick up
+-- stock changed elsewhere with one primary key range read instead of a reload.
+-- Triggers fill it, so every writer is covered (the app, bulk imports, manual SQL).
+-- Creating triggers needs the TRIGGER privilege, and with binary logging on
+-- either SUPER or log_bin_trust_function_creators = 1.
+
+CREATE TABLE IF NOT EXISTS StockChanges (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    blood_group VARCHAR(5) NOT NULL,
+    units_available INT NOT NULL,
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TRIGGER stock_changes_insert AFTER INSERT ON BloodBank FOR EACH ROW
+INSERT INTO StockChanges (blood_group, units_available)
+VALUES (NEW.blood_group, NEW.units_available);
+
+-- Updates that leave the units as they were are not logged
+CREATE TRIGGER stock_changes_update AFTER UPDATE ON BloodBank FOR EACH ROW
+INSERT INTO StockChanges (blood_group, units_available)
+SELECT NEW.blood_group, NEW.units_available FROM DUAL
+WHERE NOT (NEW.units_available <=> OLD.units_available);
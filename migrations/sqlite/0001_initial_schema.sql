@@ -0,0 +1,32 @@
+-- Base tables, same columns and constraints as migrations/mysql/0001_initial_schema.sql.
+-- Names compare case-insensitively (NOCASE) like MySQL's default collation, which
+-- also lets name-prefix LIKE searches use the name indexes.
+
+CREATE TABLE IF NOT EXISTS BloodBank (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    blood_group VARCHAR(5) NOT NULL,
+    units_available INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS Donors (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL COLLATE NOCASE,
+    blood_group VARCHAR(5) NOT NULL,
+    contact VARCHAR(15) NOT NULL,
+    donation_date DATE
+);
+
+CREATE TABLE IF NOT EXISTS BloodTransactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL COLLATE NOCASE,
+    blood_group VARCHAR(5) NOT NULL,
+    units INT NOT NULL,
+    transaction_date DATE NOT NULL,
+    transaction_type VARCHAR(8) NOT NULL CHECK (transaction_type IN ('DONATION', 'REQUEST'))
+);
+
+CREATE TABLE IF NOT EXISTS Admins (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(50) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL
+);
@@ -0,0 +1,25 @@
+-- Indexes for the lookups and sort orders in sqlite_database.py, matching
+-- migrations/mysql/0002_query_indexes.sql. SQLite appends the rowid (id) to every
+-- index, so (x) also serves ORDER BY x, id.
+
+-- get_units_for_blood_group / add_donation / process_request: one row per group.
+-- Fold any duplicate rows for a group into its oldest one first, summing the units.
+UPDATE BloodBank
+SET units_available = (
+    SELECT SUM(units_available) FROM BloodBank AS other WHERE other.blood_group = BloodBank.blood_group
+)
+WHERE id IN (SELECT MIN(id) FROM BloodBank GROUP BY blood_group HAVING COUNT(*) > 1);
+
+DELETE FROM BloodBank WHERE id NOT IN (SELECT MIN(id) FROM BloodBank GROUP BY blood_group);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_bloodbank_blood_group ON BloodBank (blood_group);
+
+-- get_donor_details, name-prefix search, blood group filter sorted by name
+CREATE INDEX IF NOT EXISTS idx_donors_name ON Donors (name);
+CREATE INDEX IF NOT EXISTS idx_donors_blood_group_name ON Donors (blood_group, name);
+
+-- fetch_transaction_history: default order and keyset paging, plus each filter
+CREATE INDEX IF NOT EXISTS idx_transactions_date ON BloodTransactions (transaction_date);
+CREATE INDEX IF NOT EXISTS idx_transactions_type_date ON BloodTransactions (transaction_type, transaction_date);
+CREATE INDEX IF NOT EXISTS idx_transactions_group_date ON BloodTransactions (blood_group, transaction_date);
+CREATE INDEX IF NOT EXISTS idx_transactions_name ON BloodTransactions (name);
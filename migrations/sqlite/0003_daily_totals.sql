@@ -0,0 +1,13 @@
+-- Per-day, per-group totals of the BloodTransactions ledger, matching
+-- migrations/mysql/0003_daily_totals.sql.
+-- Existing history is filled in by `python reports.py --backfill`.
+
+CREATE TABLE IF NOT EXISTS DailyBloodTotals (
+    day DATE NOT NULL,
+    blood_group VARCHAR(5) NOT NULL,
+    donations INT NOT NULL DEFAULT 0,
+    donated_units INT NOT NULL DEFAULT 0,
+    requests INT NOT NULL DEFAULT 0,
+    requested_units INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, blood_group)
+) WITHOUT ROWID;
@@ -0,0 +1,17 @@
+-- Stock per donated batch, matching migrations/mysql/0004_blood_batches.sql.
+
+CREATE TABLE IF NOT EXISTS BloodBatches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    blood_group VARCHAR(5) NOT NULL,
+    units_remaining INT NOT NULL,
+    collected_on DATE NOT NULL,
+    expires_on DATE NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_batches_group_expiry ON BloodBatches (blood_group, expires_on);
+
+-- Stock held before batches were tracked: one batch per group, collected today
+-- (42 days, fixed: the default config.BLOOD_SHELF_LIFE_DAYS; a changed value applies to new batches only)
+INSERT INTO BloodBatches (blood_group, units_remaining, collected_on, expires_on)
+SELECT blood_group, units_available, date('now', 'localtime'), date('now', 'localtime', '+42 days')
+FROM BloodBank WHERE units_available > 0;
@@ -0,0 +1,22 @@
+-- Change log of BloodBank, matching migrations/mysql/0005_stock_changes.sql.
+-- AUTOINCREMENT keeps ids increasing even after the newest rows are pruned.
+
+CREATE TABLE IF NOT EXISTS StockChanges (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    blood_group VARCHAR(5) NOT NULL,
+    units_available INT NOT NULL,
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TRIGGER IF NOT EXISTS stock_changes_insert AFTER INSERT ON BloodBank
+BEGIN
+    INSERT INTO StockChanges (blood_group, units_available)
+    VALUES (NEW.blood_group, NEW.units_available);
+END;
+
+CREATE TRIGGER IF NOT EXISTS stock_changes_update AFTER UPDATE OF units_available ON BloodBank
+WHEN NEW.units_available IS NOT OLD.units_available
+BEGIN
+    INSERT INTO StockChanges (blood_group, units_available)
+    VALUES (NEW.blood_group, NEW.units_available);
+END;
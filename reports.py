@@ -0,0 +1,84 @@
+# reports.py
+"""
+Donation and request totals per day and blood group.
+
+    python reports.py --backfill          fill DailyBloodTotals from the existing ledger
+    python reports.py                     monthly totals for the last 12 months
+    python reports.py --from 2024-01-01 --to 2024-03-31 --daily
+
+Every ledger write keeps DailyBloodTotals up to date, so reports read a few
+rows per day instead of scanning BloodTransactions. The backfill is needed
+once, for history recorded before the table existed. It recomputes one month
+per transaction, so stations can keep working while it runs, and it is safe
+to run again.
+"""
+
+import argparse
+import datetime
+import sys
+
+from storage import open_database
+
+
+def month_ranges(first, last):
+    """Yield (start, end) date pairs covering first..last, one per calendar month."""
+    start = first
+    while start <= last:
+        next_month = (start.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+        yield start, min(next_month - datetime.timedelta(days=1), last)
+        start = next_month
+
+
+def backfill(db, progress=print):
+    """Rebuild DailyBloodTotals for the whole ledger. Returns the number of months done."""
+    first, last = db.ledger_date_range()
+    if first is None:
+        return 0
+    months = 0
+    for start, end in month_ranges(first, last):
+        db.rebuild_daily_totals(start, end)
+        months += 1
+        if progress:
+            progress(f"{start:%Y-%m} done")
+    return months
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report or backfill daily blood totals.")
+    parser.add_argument("--backfill", action="store_true", help="rebuild totals from the ledger")
+    parser.add_argument("--from", dest="start", type=datetime.date.fromisoformat)
+    parser.add_argument("--to", dest="end", type=datetime.date.fromisoformat)
+    parser.add_argument("--group", help="only this blood group")
+    parser.add_argument("--daily", action="store_true", help="one line per day instead of per month")
+    args = parser.parse_args(argv)
+
+    db = open_database()
+    try:
+        if args.backfill:
+            months = backfill(db)
+            print(f"Backfilled {months} month(s).")
+            return 0
+
+        end = args.end or datetime.date.today()
+        # Default: the start of the month 11 months back, so 12 whole months show
+        month_index = end.year * 12 + end.month - 1 - 11
+        start = args.start or datetime.date(month_index // 12, month_index % 12 + 1, 1)
+        if args.daily:
+            rows = db.fetch_daily_totals(start, end, args.group)
+            period = "day"
+        else:
+            rows = db.fetch_monthly_totals(start, end, args.group)
+            period = "month"
+        print(f"{period:10} {'group':5} {'donations':>9} {'units':>6} {'requests':>8} {'units':>6}")
+        for row in rows:
+            print(
+                f"{str(row[period]):10} {row['blood_group']:5} {row['donations']:9}"
+                f" {row['donated_units']:6} {row['requests']:8} {row['requested_units']:6}"
+            )
+        return 0
+    finally:
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,462 @@
+# service.py
+"""
+Headless HTTP/JSON service over the storage layer, for lab systems that post
+donations and requests without the desktop UI.
+
+    python service.py                       listen on config.SERVICE_HOST:SERVICE_PORT
+    python service.py --port 9000
+
+    GET    /inventory                       units per blood group
+    POST   /donations                       {"donor_id": 7, "units": 1}
+                                            or {"name", "blood_group", "units"}
+    POST   /requests                        {"name", "blood_group", "units", "substitute": false}
+    POST   /orders                          {"name", "lines": [["A+", 2], ["O-", 1]]}
+    GET    /donors                          ?name=&blood_group=&sort_by=&descending=
+    GET    /donors/search                   ?prefix=&limit=
+    POST   /donors                          {"name", "blood_group", "contact", "donation_date"}
+    GET    /donors/<id>
+    PUT    /donors/<id>                     same body as POST /donors
+    DELETE /donors/<id>
+    GET    /history                         ?limit=&start_date=&end_date=&transaction_type=
+                                            &blood_group=&name=&sort_by=&descending=
+                                            &after_value=&after_id=  (from the previous "next")
+    GET    /metrics                         data layer metrics (instrumentation.py)
+
+The event loop only parses HTTP and JSON. Storage calls run on a pool of
+config.SERVICE_WORKERS threads, each holding one Database for its lifetime,
+so the number of database connections is bounded whatever the client count.
+At most config.SERVICE_MAX_IN_FLIGHT requests are handled at once; beyond that
+the service answers 503 at once rather than queueing without limit.
+Connections are kept alive between requests.
+"""
+
+import argparse
+import asyncio
+import datetime
+import decimal
+import json
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import config
+import instrumentation
+import migrate
+from config import BLOOD_GROUPS
+from storage import HISTORY_SORT_COLUMNS, open_database
+
+REASONS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+MAX_PAGE_SIZE = 1000  # largest history page a client may ask for
+
+
+class BadRequest(ValueError):
+    """Invalid input from the client; answered with 400."""
+
+
+# Input checks
+
+
+def _blood_group(value):
+    if value not in BLOOD_GROUPS:
+        raise BadRequest(f"blood_group must be one of {', '.join(BLOOD_GROUPS)}")
+    return value
+
+
+def _positive_int(value, field):
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise BadRequest(f"{field} must be a positive whole number")
+    try:
+        number = int(value)
+    except ValueError:
+        raise BadRequest(f"{field} must be a positive whole number")
+    if number <= 0:
+        raise BadRequest(f"{field} must be a positive whole number")
+    return number
+
+
+def _text(body, field, max_length=255):
+    value = body.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise BadRequest(f"{field} is required")
+    value = value.strip()
+    if len(value) > max_length:
+        raise BadRequest(f"{field} is longer than {max_length} characters")
+    return value
+
+
+def _date(value, field):
+    if value in (None, ""):
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f"{field} must be a date (YYYY-MM-DD)")
+
+
+def _flag(value):
+    return str(value).lower() in ("1", "true", "yes")
+
+
+def _donor_fields(body):
+    return (
+        _text(body, "name"),
+        _blood_group(body.get("blood_group")),
+        _text(body, "contact", 15),
+        _date(body.get("donation_date"), "donation_date"),
+    )
+
+
+# Handlers: handler(db, query, body, *path_args) -> (status, payload), run on a worker thread
+
+
+def inventory(db, query, body):
+    return 200, db.fetch_all_blood_records()
+
+
+def donate(db, query, body):
+    units = _positive_int(body.get("units"), "units")
+    if body.get("donor_id") is not None:
+        # Fresh, not cached: another station may have changed or deleted the donor
+        donor = db.get_donor(_positive_int(body["donor_id"], "donor_id"), cached=False)
+        if donor is None:
+            return 404, {"error": "No such donor."}
+        name, blood_group = donor["name"], donor["blood_group"]
+    else:
+        name, blood_group = _text(body, "name"), _blood_group(body.get("blood_group"))
+    # Stock change and ledger row commit together or not at all, as in the UI
+    with db.transaction():
+        balance = db.add_donation(blood_group, units)
+        db.add_transaction(name, blood_group, units, "DONATION")
+    return 201, {"blood_group": blood_group, "units": units, "balance": balance}
+
+
+def request(db, query, body):
+    name = _text(body, "name")
+    blood_group = _blood_group(body.get("blood_group"))
+    units = _positive_int(body.get("units"), "units")
+    with db.transaction():
+        success, message, balance = db.process_request(blood_group, units)
+        if success:
+            db.add_transaction(name, blood_group, units, "REQUEST")
+    if success:
+        return 201, {"message": message, "allocation": [[blood_group, units, balance]]}
+    if _flag(body.get("substitute", False)):
+        success, message, allocation = db.process_compatible_request(name, blood_group, units)
+        if success:
+            return 201, {"message": message, "allocation": allocation}
+    return 409, {"error": message}
+
+
+def order(db, query, body):
+    name = _text(body, "name")
+    lines = body.get("lines")
+    if not isinstance(lines, list) or not lines:
+        raise BadRequest("lines must be a list of [blood_group, units] pairs")
+    parsed = []
+    for line in lines:
+        if not isinstance(line, (list, tuple)) or len(line) != 2:
+            raise BadRequest("lines must be a list of [blood_group, units] pairs")
+        parsed.append((_blood_group(line[0]), _positive_int(line[1], "units")))
+    success, message, balances = db.process_batch_request(name, parsed)
+    if success:
+        return 201, {"message": message, "balances": balances}
+    return 409, {"error": message}
+
+
+def list_donors(db, query, body):
+    sort_by = query.get("sort_by", "name")
+    donors = db.fetch_full_donor_list(
+        blood_group=query.get("blood_group") or None,
+        name=query.get("name") or None,
+        sort_by=sort_by,
+        descending=_flag(query.get("descending", False)),
+    )
+    return 200, donors
+
+
+def search_donors(db, query, body):
+    prefix = query.get("prefix", "").strip()
+    if not prefix:
+        raise BadRequest("prefix is required")
+    limit = _positive_int(query.get("limit", config.DONOR_SEARCH_LIMIT), "limit")
+    return 200, db.search_donors(prefix, min(limit, MAX_PAGE_SIZE))
+
+
+def register_donor(db, query, body):
+    donor_id = db.register_donor(*_donor_fields(body))
+    return 201, db.get_donor(donor_id)
+
+
+def get_donor(db, query, body, donor_id):
+    donor = db.get_donor(int(donor_id))
+    if donor is None:
+        return 404, {"error": "No such donor."}
+    return 200, donor
+
+
+def update_donor(db, query, body, donor_id):
+    if not db.update_donor(int(donor_id), *_donor_fields(body)):
+        return 404, {"error": "No such donor."}
+    return 200, db.get_donor(int(donor_id))
+
+
+def delete_donor(db, query, body, donor_id):
+    if not db.delete_donor(int(donor_id)):
+        return 404, {"error": "No such donor."}
+    return 200, {"deleted": int(donor_id)}
+
+
+def history(db, query, body):
+    sort_by = query.get("sort_by", "transaction_date")
+    if sort_by not in HISTORY_SORT_COLUMNS:
+        raise BadRequest(f"sort_by must be one of {', '.join(HISTORY_SORT_COLUMNS)}")
+    limit = min(_positive_int(query.get("limit", config.HISTORY_PAGE_SIZE), "limit"), MAX_PAGE_SIZE)
+    after = None
+    if query.get("after_id"):
+        value = query.get("after_value", "")
+        if sort_by == "transaction_date":
+            value = _date(value, "after_value")
+        elif sort_by == "units":
+            value = _positive_int(value, "after_value")
+        after = (value, _positive_int(query["after_id"], "after_id"))
+    rows = db.fetch_transaction_history(
+        after=after,
+        limit=limit,
+        start_date=_date(query.get("start_date"), "start_date"),
+        end_date=_date(query.get("end_date"), "end_date"),
+        transaction_type=query.get("transaction_type") or None,
+        blood_group=query.get("blood_group") or None,
+        name=query.get("name") or None,
+        sort_by=sort_by,
+        descending=_flag(query.get("descending", True)),
+    )
+    # Keyset cursor for the page after this one
+    following = None
+    if len(rows) == limit:
+        following = {"after_value": rows[-1][sort_by], "after_id": rows[-1]["id"]}
+    return 200, {"rows": rows, "next": following}
+
+
+def metrics(db, query, body):
+    return 200, instrumentation.metrics.snapshot()
+
+
+# (method, path pattern, handler); pattern groups become handler arguments
+ROUTES = [
+    ("GET", r"/inventory", inventory),
+    ("POST", r"/donations", donate),
+    ("POST", r"/requests", request),
+    ("POST", r"/orders", order),
+    ("GET", r"/donors", list_donors),
+    ("GET", r"/donors/search", search_donors),
+    ("POST", r"/donors", register_donor),
+    ("GET", r"/donors/(\d+)", get_donor),
+    ("PUT", r"/donors/(\d+)", update_donor),
+    ("DELETE", r"/donors/(\d+)", delete_donor),
+    ("GET", r"/history", history),
+    ("GET", r"/metrics", metrics),
+]
+_COMPILED_ROUTES = [(method, re.compile(pattern + r"/?"), handler) for method, pattern, handler in ROUTES]
+
+
+def route(method, path):
+    """Return (status, handler, path_args): 404/405 with no handler when nothing matches."""
+    status = 404
+    for route_method, pattern, handler in _COMPILED_ROUTES:
+        match = pattern.fullmatch(path)
+        if match:
+            if route_method == method:
+                return 200, handler, match.groups()
+            status = 405
+    return status, None, ()
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class Service:
+    """The HTTP server: parses requests on the event loop, runs handlers on worker threads."""
+
+    def __init__(self, host=None, port=None, workers=None, max_in_flight=None, token=None):
+        self.host = host or config.SERVICE_HOST
+        self.port = config.SERVICE_PORT if port is None else port
+        self.token = config.SERVICE_TOKEN if token is None else token
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or config.SERVICE_WORKERS, thread_name_prefix="service-db"
+        )
+        self._in_flight = asyncio.Semaphore(max_in_flight or config.SERVICE_MAX_IN_FLIGHT)
+        self._local = threading.local()
+        self._databases = []
+        self._databases_lock = threading.Lock()
+        self._server = None
+
+    def _database(self):
+        """The calling worker thread's own Database."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = open_database()
+            self._local.db = db
+            with self._databases_lock:
+                self._databases.append(db)
+        return db
+
+    def _call(self, handler, query, body, args):
+        return handler(self._database(), query, body, *args)
+
+    async def dispatch(self, method, target, headers, raw_body):
+        """Answer one request. Returns (status, payload)."""
+        if self.token and headers.get("authorization") != f"Bearer {self.token}":
+            return 401, {"error": "Missing or wrong bearer token."}
+        url = urlsplit(target)
+        status, handler, args = route(method, url.path)
+        if handler is None:
+            return status, {"error": REASONS[status]}
+        try:
+            body = json.loads(raw_body) if raw_body else {}
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            return 400, {"error": f"Body is not valid JSON: {e}"}
+        if not isinstance(body, dict):
+            return 400, {"error": "Body must be a JSON object."}
+        query = dict(parse_qsl(url.query))
+
+        if self._in_flight.locked():
+            return 503, {"error": "Too many requests in progress; try again shortly."}
+        async with self._in_flight:
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(
+                    self._executor, self._call, handler, query, body, args
+                )
+            except ValueError as e:
+                # BadRequest, and the storage layer's own checks (e.g. an unknown sort column)
+                return 400, {"error": str(e)}
+            except Exception as e:
+                print(f"Service error on {method} {url.path}: {e!r}")
+                return 500, {"error": "Internal error."}
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(
+                        reader.readline(), config.SERVICE_IDLE_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    return
+                if not request_line:
+                    return
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request line."}, False)
+                    return
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0 or length > config.SERVICE_MAX_BODY:
+                    await self._respond(writer, 413, {"error": "Body too large."}, False)
+                    return
+                raw_body = await reader.readexactly(length) if length else b""
+
+                connection = headers.get("connection", "").lower()
+                if version == "HTTP/1.1":
+                    keep_alive = connection != "close"
+                else:
+                    keep_alive = connection == "keep-alive"
+                status, payload = await self.dispatch(method.upper(), target, headers, raw_body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass  # client went away or sent garbage; drop the connection
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, default=_json_default).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def start(self):
+        """Start listening; returns once the socket is bound (port 0 picks a free one)."""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Serving on http://{self.host}:{self.port}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stop listening, let running handlers finish and close every connection."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=True)
+        with self._databases_lock:
+            for db in self._databases:
+                db.close_connection()
+            self._databases.clear()
+
+
+async def _run(service):
+    try:
+        await service.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the blood bank over HTTP/JSON.")
+    parser.add_argument("--host", default=config.SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVICE_PORT)
+    args = parser.parse_args(argv)
+
+    if config.DB_AUTO_MIGRATE:
+        migrate.apply_migrations()
+    instrumentation.start_periodic_dump()
+    try:
+        asyncio.run(_run(Service(args.host, args.port)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
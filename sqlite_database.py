@@ -0,0 +1,933 @@
+# sqlite_database.py
+
+import datetime
+import sqlite3
+from contextlib import contextmanager
+
+import config
+from cache import LRUCache
+from compatibility import describe_plan, plan_substitution
+from instrumentation import TimedCursor, instrumented
+from storage import (
+    DONOR_SORT_COLUMNS,
+    EXPORT_TABLES,
+    HISTORY_SORT_COLUMNS,
+    Storage,
+    daily_total_rows,
+    plan_allocation,
+    prefix_pattern,
+    where_clause,
+)
+
+# DATE columns are stored as ISO text and read back as datetime.date, as with MySQL
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_converter("DATE", lambda value: datetime.date.fromisoformat(value.decode()))
+
+# Donor records by (database file, id), shared by every SQLiteDatabase in the process
+_donor_cache = LRUCache(config.DONOR_CACHE_SIZE)
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+@instrumented
+class SQLiteDatabase(Storage):
+    """
+    The SQLite backend: the whole database is one local file, for single-station
+    sites that don't want to run a MySQL server. Each instance holds its own
+    connection; opening one is cheap, so there is no pool.
+
+    The file is in WAL mode, so the history and export windows can read while a
+    donation is being written. Statements are compiled once per connection and
+    reused from sqlite3's statement cache.
+    """
+
+    dialect = "sqlite"
+
+    def __init__(self, path=None):
+        # A "file:name?mode=memory&cache=shared" URI gives an in-memory database
+        # that every connection in the process shares (handy for tests)
+        self.path = path or config.SQLITE_PATH
+        self.connection = None
+        self._in_transaction = False
+        try:
+            self.connection = sqlite3.connect(
+                self.path,
+                timeout=config.SQLITE_BUSY_TIMEOUT,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                # Standalone statements commit on their own, as with MySQL's autocommit;
+                # transaction() opens an explicit transaction.
+                isolation_level=None,
+                # Worker threads use a connection one at a time; shutdown closes it from the Tk thread
+                check_same_thread=False,
+                cached_statements=config.SQLITE_STATEMENT_CACHE,
+                uri=True,
+            )
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            # In WAL mode NORMAL only syncs at checkpoints; a power cut can lose the
+            # last commits but never corrupts the file
+            self.connection.execute("PRAGMA synchronous = NORMAL")
+        except sqlite3.Error as e:
+            print("Error while opening SQLite database", e)
+
+    def _cursor(self, dictionary=False):
+        cursor = self.connection.cursor()
+        if dictionary:
+            cursor.row_factory = _dict_row
+        return TimedCursor(cursor)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run several calls as one unit of work: a single commit on success,
+        a rollback if the block raises. Nested blocks join the outer one.
+        BEGIN IMMEDIATE takes the write lock up front, so two stations can
+        never interleave their reads and writes.
+        """
+        if self._in_transaction:
+            yield self
+            return
+        self.connection.execute("BEGIN IMMEDIATE")
+        self._in_transaction = True
+        try:
+            yield self
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        else:
+            self.connection.execute("COMMIT")
+        finally:
+            self._in_transaction = False
+
+    def fetch_all_blood_records(self):
+        """All BloodBank rows as dictionaries with blood_group and units_available."""
+        cursor = self._cursor(dictionary=True)
+        cursor.execute("SELECT blood_group, units_available FROM BloodBank")
+        records = cursor.fetchall()
+        cursor.close()
+        return records
+
+    def update_blood_units(self, blood_group, new_units):
+        """Set a group's units, replacing its batches with one collected today."""
+        with self.transaction():
+            cursor = self._cursor()
+            sql = "UPDATE BloodBank SET units_available = ? WHERE blood_group = ?"
+            cursor.execute(sql, (new_units, blood_group))
+            cursor.execute("DELETE FROM BloodBatches WHERE blood_group = ?", (blood_group,))
+            if new_units > 0:
+                self._add_batches(cursor, [(blood_group, new_units, None)])
+            cursor.close()
+
+    def get_units_for_blood_group(self, blood_group):
+        cursor = self._cursor()
+        sql = "SELECT units_available FROM BloodBank WHERE blood_group = ?"
+        cursor.execute(sql, (blood_group,))
+        record = cursor.fetchone()
+        cursor.close()
+        return record[0] if record else None
+
+    def add_donation(self, blood_group, units, collected_on=None):
+        """
+        Increases the blood units for the given blood group and returns the new balance.
+        If the blood group does not exist, it inserts a new record.
+        The units are stored as one batch collected on `collected_on` (default today).
+        """
+        if units <= 0:
+            raise ValueError("Units must be a positive number.")
+        with self.transaction():
+            cursor = self._cursor()
+            # RETURNING hands back the new balance from the same statement
+            sql = """
+                UPDATE BloodBank SET units_available = units_available + ?
+                WHERE blood_group = ?
+                RETURNING units_available
+            """
+            cursor.execute(sql, (units, blood_group))
+            record = cursor.fetchone()
+            if record:
+                balance = record[0]
+            else:
+                sql = "INSERT INTO BloodBank (blood_group, units_available) VALUES (?, ?)"
+                cursor.execute(sql, (blood_group, units))
+                balance = units
+            self._add_batches(cursor, [(blood_group, units, collected_on)])
+            cursor.close()
+        return balance
+
+    def _add_batches(self, cursor, batches):
+        """Insert (blood_group, units, collected_on) batches; a date of None means today."""
+        today = datetime.date.today()
+        shelf_life = datetime.timedelta(days=config.BLOOD_SHELF_LIFE_DAYS)
+        rows = []
+        for blood_group, units, collected_on in batches:
+            collected_on = collected_on or today
+            rows.append((blood_group, units, collected_on, collected_on + shelf_life))
+        sql = """
+            INSERT INTO BloodBatches (blood_group, units_remaining, collected_on, expires_on)
+            VALUES (?, ?, ?, ?)
+        """
+        cursor.executemany(sql, rows)
+
+    def _live_batches(self, cursor, blood_group, day=None):
+        """
+        Yield (id, units_remaining) for the group's batches on the shelf on `day`
+        (today by default): collected by then and not yet expired. Soonest-expiring
+        first, ALLOCATION_FETCH_ROWS at a time from idx_batches_group_expiry.
+        """
+        sql = """
+            SELECT id, units_remaining, expires_on FROM BloodBatches
+            WHERE blood_group = ? AND expires_on >= ? AND collected_on <= ?
+                AND (expires_on > ? OR (expires_on = ? AND id > ?))
+            ORDER BY expires_on, id
+            LIMIT ?
+        """
+        day = day or datetime.date.today()
+        after = (datetime.date.min, datetime.date.min, 0)
+        while True:
+            cursor.execute(sql, (blood_group, day, day, *after, config.ALLOCATION_FETCH_ROWS))
+            rows = cursor.fetchall()
+            for batch_id, remaining, _ in rows:
+                yield batch_id, remaining
+            if len(rows) < config.ALLOCATION_FETCH_ROWS:
+                return
+            _, _, expires_on = rows[-1]
+            after = (expires_on, expires_on, rows[-1][0])
+
+    def _apply_allocation(self, cursor, plan):
+        """Write a plan from plan_allocation(): delete emptied batches, shrink the partial one."""
+        emptied, partial = plan
+        if emptied:
+            placeholders = ", ".join(["?"] * len(emptied))
+            cursor.execute(f"DELETE FROM BloodBatches WHERE id IN ({placeholders})", emptied)
+        if partial:
+            cursor.execute("UPDATE BloodBatches SET units_remaining = ? WHERE id = ?", partial)
+
+    def process_request(self, blood_group, units):
+        """
+        Issues the requested units from the group's unexpired batches,
+        soonest-expiring first, if there are enough of them.
+        Returns (success, message, balance) where balance is the units left
+        after the deduction, or None when the request failed.
+        """
+        if units <= 0:
+            return False, "Units must be a positive number.", None
+        # The write lock is held from the first statement, so the stock and
+        # batches read here can't change before they are updated
+        with self.transaction():
+            cursor = self._cursor()
+            try:
+                sql = "SELECT units_available FROM BloodBank WHERE blood_group = ?"
+                cursor.execute(sql, (blood_group,))
+                record = cursor.fetchone()
+                if record is None:
+                    return False, "Blood group not found.", None
+                if record[0] < units:
+                    return False, "Insufficient units available.", None
+                plan = plan_allocation(self._live_batches(cursor, blood_group), units)
+                if plan is None:
+                    return False, "Insufficient unexpired units available.", None
+                self._apply_allocation(cursor, plan)
+                sql = "UPDATE BloodBank SET units_available = units_available - ? WHERE blood_group = ?"
+                cursor.execute(sql, (units, blood_group))
+            finally:
+                cursor.close()
+        return True, "Request completed successfully.", record[0] - units
+
+    def process_batch_request(self, name, lines):
+        """
+        Fill a multi-group order in full or not at all.
+        The transaction holds the database's write lock from its first statement,
+        so the stock read here can't change before the update.
+        Returns (success, message, balances) like Database.process_batch_request.
+        """
+        wanted = {}
+        for blood_group, units in lines:
+            if units <= 0:
+                return False, "Units must be a positive number.", {}
+            wanted[blood_group] = wanted.get(blood_group, 0) + units
+        if not wanted:
+            return False, "The order has no lines.", {}
+        groups = sorted(wanted)
+        placeholders = ", ".join(["?"] * len(groups))
+
+        with self.transaction():
+            cursor = self._cursor()
+            try:
+                sql = f"""
+                    SELECT blood_group, units_available FROM BloodBank
+                    WHERE blood_group IN ({placeholders})
+                """
+                cursor.execute(sql, groups)
+                stock = dict(cursor.fetchall())
+                missing = [g for g in groups if g not in stock]
+                if missing:
+                    return False, f"Blood group not found: {', '.join(missing)}.", {}
+                short = [g for g in groups if stock[g] < wanted[g]]
+                if short:
+                    return False, f"Insufficient units available for {', '.join(short)}.", {}
+                # Plan every group before writing any, so a short group leaves nothing changed
+                plans = {g: plan_allocation(self._live_batches(cursor, g), wanted[g]) for g in groups}
+                expired = [g for g in groups if plans[g] is None]
+                if expired:
+                    return (
+                        False,
+                        f"Insufficient unexpired units available for {', '.join(expired)}.",
+                        {},
+                    )
+                for blood_group in groups:
+                    self._apply_allocation(cursor, plans[blood_group])
+
+                cases = " ".join(["WHEN ? THEN ?"] * len(groups))
+                params = []
+                for blood_group in groups:
+                    params += [blood_group, wanted[blood_group]]
+                sql = f"""
+                    UPDATE BloodBank
+                    SET units_available = units_available - CASE blood_group {cases} END
+                    WHERE blood_group IN ({placeholders})
+                """
+                cursor.execute(sql, params + groups)
+
+                today = datetime.date.today()
+                sql = """
+                    INSERT INTO BloodTransactions
+                    (name, blood_group, units, transaction_date, transaction_type)
+                    VALUES (?, ?, ?, ?, 'REQUEST')
+                """
+                cursor.executemany(sql, [(name, g, wanted[g], today) for g in groups])
+                self._add_to_daily_totals(
+                    cursor, daily_total_rows((today, g, wanted[g], "REQUEST") for g in groups)
+                )
+            finally:
+                cursor.close()
+
+        balances = {g: stock[g] - wanted[g] for g in groups}
+        return True, "Order completed successfully.", balances
+
+    def process_compatible_request(self, name, blood_group, units, apply=True, expected=None):
+        """
+        Fill a request with compatible substitutes; see Database.process_compatible_request.
+        The write lock is held from the first read, and the plan counts only unexpired batches.
+        """
+        if units <= 0:
+            return False, "Units must be a positive number.", []
+        with self.transaction():
+            cursor = self._cursor()
+            try:
+                cursor.execute("SELECT blood_group, units_available FROM BloodBank")
+                totals = dict(cursor.fetchall())
+                sql = """
+                    SELECT blood_group, SUM(units_remaining) FROM BloodBatches
+                    WHERE expires_on >= ?
+                    GROUP BY blood_group
+                """
+                cursor.execute(sql, (datetime.date.today(),))
+                stock = {g: units for g, units in cursor.fetchall() if g in totals}
+                plan = plan_substitution(stock, blood_group, units)
+                if plan is None:
+                    return False, f"Not enough units compatible with {blood_group} available.", []
+                if expected is not None and [tuple(step) for step in expected] != plan:
+                    return False, "Stock changed since the substitution was proposed.", []
+                allocation = [(g, n, totals[g] - n) for g, n in plan]
+                if not apply:
+                    return True, describe_plan(blood_group, plan), allocation
+
+                batch_plans = {g: plan_allocation(self._live_batches(cursor, g), n) for g, n in plan}
+                expired = [g for g, batch_plan in batch_plans.items() if batch_plan is None]
+                if expired:
+                    return (
+                        False,
+                        f"Insufficient unexpired units available for {', '.join(expired)}.",
+                        [],
+                    )
+                for batch_plan in batch_plans.values():
+                    self._apply_allocation(cursor, batch_plan)
+                self._adjust_stock(cursor, {g: -n for g, n in plan})
+                today = datetime.date.today()
+                sql = """
+                    INSERT INTO BloodTransactions
+                    (name, blood_group, units, transaction_date, transaction_type)
+                    VALUES (?, ?, ?, ?, 'REQUEST')
+                """
+                cursor.executemany(sql, [(name, g, n, today) for g, n in plan])
+                self._add_to_daily_totals(
+                    cursor, daily_total_rows((today, g, n, "REQUEST") for g, n in plan)
+                )
+            finally:
+                cursor.close()
+        return True, describe_plan(blood_group, plan), allocation
+
+    def changes_since(self, position):
+        """Stock changes after change-log `position`; see Database.changes_since."""
+        cursor = self._cursor()
+        try:
+            if position is None:
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM StockChanges")
+                return cursor.fetchone()[0], {}
+            sql = """
+                SELECT id, blood_group, units_available FROM StockChanges
+                WHERE id > ? ORDER BY id
+            """
+            cursor.execute(sql, (position - config.CHANGE_FEED_OVERLAP,))
+            rows = cursor.fetchall()
+            if not rows:
+                return position, {}
+            if rows[0][0] > position + 1:
+                # A gap right after `position` is either pruned rows or ids
+                # skipped by rolled-back writes; only pruning empties the log below it
+                cursor.execute("SELECT MIN(id) FROM StockChanges")
+                if cursor.fetchone()[0] == rows[0][0]:
+                    return rows[-1][0], None
+            changes = {}
+            for _, blood_group, units_available in rows:
+                changes[blood_group] = units_available
+            return max(position, rows[-1][0]), changes
+        finally:
+            cursor.close()
+
+    def prune_stock_changes(self):
+        """Delete change-log rows older than the retention period, keeping the newest."""
+        cursor = self._cursor()
+        cursor.execute("SELECT MAX(id) FROM StockChanges")
+        (newest,) = cursor.fetchone()
+        if newest is not None:
+            cursor.execute(
+                "DELETE FROM StockChanges WHERE changed_at < datetime('now', ?) AND id < ?",
+                (f"-{config.CHANGE_LOG_RETENTION_HOURS} hours", newest),
+            )
+        cursor.close()
+
+    def authenticate_admin(self, username, password):
+        cursor = self._cursor()
+        sql = "SELECT 1 FROM Admins WHERE username = ? AND password_hash = ?"
+        cursor.execute(sql, (username, password))
+        admin = cursor.fetchone()
+        cursor.close()
+        return admin is not None
+
+    def register_donor(self, name, blood_group, contact, donation_date):
+        """Register a new donor and record the donation date. Returns the new donor's id."""
+        cursor = self._cursor()
+        sql = "INSERT INTO Donors (name, blood_group, contact, donation_date) VALUES (?, ?, ?, ?)"
+        cursor.execute(sql, (name, blood_group, contact, donation_date))
+        donor_id = cursor.lastrowid
+        cursor.close()
+        return donor_id
+
+    def fetch_transaction_history(
+        self,
+        after=None,
+        limit=None,
+        start_date=None,
+        end_date=None,
+        transaction_type=None,
+        blood_group=None,
+        name=None,
+        sort_by="transaction_date",
+        descending=True,
+    ):
+        """Filtered, sorted, keyset-paged ledger rows; see Database.fetch_transaction_history."""
+        if sort_by not in HISTORY_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort transactions by {sort_by!r}")
+        conditions = []
+        params = []
+        if start_date is not None:
+            conditions.append("transaction_date >= ?")
+            params.append(start_date)
+        if end_date is not None:
+            conditions.append("transaction_date <= ?")
+            params.append(end_date)
+        if transaction_type:
+            conditions.append("transaction_type = ?")
+            params.append(transaction_type)
+        if blood_group:
+            conditions.append("blood_group = ?")
+            params.append(blood_group)
+        if name:
+            conditions.append("name LIKE ? ESCAPE '\\'")
+            params.append(prefix_pattern(name))
+        op = "<" if descending else ">"
+        if after is not None:
+            # The row value comparison lets SQLite seek into the index; the
+            # expanded OR form it would scan from the first row
+            conditions.append(f"({sort_by}, id) {op} (?, ?)")
+            params += list(after)
+
+        direction = "DESC" if descending else "ASC"
+        sql = f"""
+            SELECT id, name, blood_group, units, transaction_date, transaction_type
+            FROM BloodTransactions{where_clause(conditions)}
+            ORDER BY {sort_by} {direction}, id {direction}
+        """
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        cursor = self._cursor(dictionary=True)
+        cursor.execute(sql, params)
+        records = cursor.fetchall()
+        cursor.close()
+        return records
+
+    def add_transaction(self, name, blood_group, units, transaction_type):
+        """
+        Record a blood transaction (donation or request) dated today, and add it
+        to today's DailyBloodTotals row in the same transaction.
+        """
+        today = datetime.date.today()
+        with self.transaction():
+            cursor = self._cursor()
+            sql = """
+                INSERT INTO BloodTransactions
+                (name, blood_group, units, transaction_date, transaction_type)
+                VALUES (?, ?, ?, ?, ?)
+            """
+            cursor.execute(sql, (name, blood_group, units, today, transaction_type))
+            self._add_to_daily_totals(
+                cursor, daily_total_rows([(today, blood_group, units, transaction_type)])
+            )
+            cursor.close()
+
+    def _add_to_daily_totals(self, cursor, rows):
+        """
+        Add (day, blood_group, donations, donated_units, requests, requested_units)
+        increments to DailyBloodTotals.
+        """
+        sql = """
+            INSERT INTO DailyBloodTotals
+            (day, blood_group, donations, donated_units, requests, requested_units)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (day, blood_group) DO UPDATE SET
+                donations = donations + excluded.donations,
+                donated_units = donated_units + excluded.donated_units,
+                requests = requests + excluded.requests,
+                requested_units = requested_units + excluded.requested_units
+        """
+        cursor.executemany(sql, rows)
+
+    def fetch_daily_totals(self, start_date, end_date, blood_group=None):
+        """Per-day, per-group totals between two dates (inclusive), from DailyBloodTotals."""
+        sql = """
+            SELECT day, blood_group, donations, donated_units, requests, requested_units
+            FROM DailyBloodTotals
+            WHERE day BETWEEN ? AND ?
+        """
+        params = [start_date, end_date]
+        if blood_group:
+            sql += " AND blood_group = ?"
+            params.append(blood_group)
+        sql += " ORDER BY day, blood_group"
+        cursor = self._cursor(dictionary=True)
+        cursor.execute(sql, params)
+        totals = cursor.fetchall()
+        cursor.close()
+        return totals
+
+    def fetch_monthly_totals(self, start_date, end_date, blood_group=None):
+        """The daily totals between two dates summed per month ("YYYY-MM") and group."""
+        sql = """
+            SELECT SUBSTR(day, 1, 7) AS month, blood_group,
+                SUM(donations) AS donations, SUM(donated_units) AS donated_units,
+                SUM(requests) AS requests, SUM(requested_units) AS requested_units
+            FROM DailyBloodTotals
+            WHERE day BETWEEN ? AND ?
+        """
+        params = [start_date, end_date]
+        if blood_group:
+            sql += " AND blood_group = ?"
+            params.append(blood_group)
+        sql += " GROUP BY month, blood_group ORDER BY month, blood_group"
+        cursor = self._cursor(dictionary=True)
+        cursor.execute(sql, params)
+        totals = cursor.fetchall()
+        cursor.close()
+        return totals
+
+    def fetch_daily_usage(self, start_date, end_date):
+        """Units issued per day and group, as columns (days, blood_groups, units)."""
+        cursor = self._cursor()
+        sql = """
+            SELECT day, blood_group, requested_units FROM DailyBloodTotals
+            WHERE day BETWEEN ? AND ? AND requested_units > 0
+        """
+        cursor.execute(sql, (start_date, end_date))
+        rows = cursor.fetchall()
+        cursor.close()
+        if not rows:
+            return (), (), ()
+        days, blood_groups, units = zip(*rows)
+        return days, blood_groups, units
+
+    def ledger_date_range(self):
+        cursor = self._cursor()
+        cursor.execute("SELECT MIN(transaction_date), MAX(transaction_date) FROM BloodTransactions")
+        first, last = cursor.fetchone()
+        cursor.close()
+        # Aggregates have no declared type, so they come back as ISO text
+        if first is None:
+            return None, None
+        return datetime.date.fromisoformat(first), datetime.date.fromisoformat(last)
+
+    def rebuild_daily_totals(self, start_date, end_date):
+        """
+        Recompute DailyBloodTotals between two dates (inclusive) from the ledger,
+        in one transaction; its write lock keeps other writers out until it commits.
+        """
+        with self.transaction():
+            cursor = self._cursor()
+            cursor.execute(
+                "DELETE FROM DailyBloodTotals WHERE day BETWEEN ? AND ?", (start_date, end_date)
+            )
+            sql = """
+                INSERT INTO DailyBloodTotals
+                (day, blood_group, donations, donated_units, requests, requested_units)
+                SELECT transaction_date, blood_group,
+                    SUM(transaction_type = 'DONATION'),
+                    SUM(CASE WHEN transaction_type = 'DONATION' THEN units ELSE 0 END),
+                    SUM(transaction_type = 'REQUEST'),
+                    SUM(CASE WHEN transaction_type = 'REQUEST' THEN units ELSE 0 END)
+                FROM BloodTransactions
+                WHERE transaction_date BETWEEN ? AND ?
+                GROUP BY transaction_date, blood_group
+            """
+            cursor.execute(sql, (start_date, end_date))
+            cursor.close()
+
+    def fetch_donors(self):
+        cursor = self._cursor(dictionary=True)
+        cursor.execute("SELECT name, blood_group FROM Donors ORDER BY name")
+        donors = cursor.fetchall()
+        cursor.close()
+        return donors
+
+    def search_donors(self, prefix, limit=None):
+        """Donors whose name starts with `prefix`, alphabetically, at most `limit` of them."""
+        if limit is None:
+            limit = config.DONOR_SEARCH_LIMIT
+        cursor = self._cursor(dictionary=True)
+        sql = """
+            SELECT id, name, blood_group FROM Donors
+            WHERE name LIKE ? ESCAPE '\\'
+            ORDER BY name, id
+            LIMIT ?
+        """
+        cursor.execute(sql, (prefix_pattern(prefix), limit))
+        donors = cursor.fetchall()
+        cursor.close()
+        return donors
+
+    def get_donor(self, donor_id, cached=True):
+        """
+        Fetch one donor by id, through the LRU cache of this process (not
+        shared with other processes; cached=False reads it fresh).
+        """
+        key = (self.path, donor_id)
+        donor = _donor_cache.get(key) if cached else None
+        if donor is None:
+            cursor = self._cursor(dictionary=True)
+            sql = "SELECT id, name, blood_group, contact, donation_date FROM Donors WHERE id = ?"
+            cursor.execute(sql, (donor_id,))
+            donor = cursor.fetchone()
+            cursor.close()
+            if donor is None:
+                return None
+            _donor_cache.put(key, donor)
+        return dict(donor)
+
+    def get_donor_details(self, donor_name):
+        cursor = self._cursor(dictionary=True)
+        cursor.execute(
+            "SELECT id, name, blood_group, contact, donation_date FROM Donors WHERE name = ?",
+            (donor_name,),
+        )
+        donor = cursor.fetchone()
+        cursor.close()
+        return donor
+
+    def fetch_full_donor_list(self, blood_group=None, name=None, sort_by="name", descending=False):
+        """Fetch donors with complete information, filtered and sorted in SQL."""
+        if sort_by not in DONOR_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort donors by {sort_by!r}")
+        conditions = []
+        params = []
+        if blood_group:
+            conditions.append("blood_group = ?")
+            params.append(blood_group)
+        if name:
+            conditions.append("name LIKE ? ESCAPE '\\'")
+            params.append(prefix_pattern(name))
+        direction = "DESC" if descending else "ASC"
+        sql = f"""
+            SELECT id, name, blood_group, contact, donation_date
+            FROM Donors{where_clause(conditions)}
+            ORDER BY {sort_by} {direction}, id {direction}
+        """
+        cursor = self._cursor(dictionary=True)
+        cursor.execute(sql, params)
+        donors = cursor.fetchall()
+        cursor.close()
+        return donors
+
+    def update_donor(self, donor_id, name, blood_group, contact, donation_date):
+        """Replace a donor's details. Returns False if there is no such donor."""
+        cursor = self._cursor()
+        sql = """
+            UPDATE Donors SET name = ?, blood_group = ?, contact = ?, donation_date = ?
+            WHERE id = ?
+        """
+        cursor.execute(sql, (name, blood_group, contact, donation_date, donor_id))
+        found = cursor.rowcount > 0
+        cursor.close()
+        _donor_cache.pop((self.path, donor_id))
+        return found
+
+    def delete_donor(self, donor_id):
+        """Delete a donor by ID, keeping their transaction history."""
+        try:
+            cursor = self._cursor()
+            cursor.execute("DELETE FROM Donors WHERE id = ?", (donor_id,))
+            affected_rows = cursor.rowcount
+            cursor.close()
+            _donor_cache.pop((self.path, donor_id))
+            return affected_rows > 0
+        except sqlite3.Error as e:
+            print(f"Error deleting donor: {e}")
+            return False
+
+    def insert_donors(self, donors):
+        """Insert many (name, blood_group, contact, donation_date) rows in one transaction."""
+        with self.transaction():
+            cursor = self._cursor()
+            sql = "INSERT INTO Donors (name, blood_group, contact, donation_date) VALUES (?, ?, ?, ?)"
+            cursor.executemany(sql, donors)  # one compiled statement, re-bound per row
+            cursor.close()
+
+    def insert_transactions(self, transactions):
+        """
+        Insert many (name, blood_group, units, transaction_date, transaction_type)
+        rows, and add them to the daily totals, in one transaction.
+        """
+        with self.transaction():
+            cursor = self._cursor()
+            sql = """
+                INSERT INTO BloodTransactions
+                (name, blood_group, units, transaction_date, transaction_type)
+                VALUES (?, ?, ?, ?, ?)
+            """
+            cursor.executemany(sql, transactions)
+            self._add_to_daily_totals(
+                cursor, daily_total_rows((row[3], row[1], row[2], row[4]) for row in transactions)
+            )
+            cursor.close()
+
+    def import_transactions(self, transactions):
+        """Import ledger rows and their stock changes, in file order; see Database."""
+        deltas, accepted, rejected = {}, [], []
+        with self.transaction():
+            cursor = self._cursor()
+            for i, row in enumerate(transactions):
+                _, blood_group, units, transaction_date, transaction_type = row
+                if transaction_type == "REQUEST":
+                    batches = self._live_batches(cursor, blood_group, transaction_date)
+                    plan = plan_allocation(batches, units)
+                    if plan is None:
+                        rejected.append(
+                            (i, f"request for {units} units exceeds the stock on {transaction_date}")
+                        )
+                        continue
+                    self._apply_allocation(cursor, plan)
+                    deltas[blood_group] = deltas.get(blood_group, 0) - units
+                else:
+                    self._add_batches(cursor, [(blood_group, units, transaction_date)])
+                    deltas[blood_group] = deltas.get(blood_group, 0) + units
+                accepted.append(row)
+            if deltas:
+                self._adjust_stock(cursor, deltas)
+            cursor.close()
+            if accepted:
+                self.insert_transactions(accepted)
+        return rejected
+
+    def apply_stock_deltas(self, deltas):
+        """
+        Add {blood_group: units} (negative to take units away) to BloodBank as one
+        aggregate change per group. Missing groups are created; totals never drop
+        below zero. Units added become a batch collected today; units taken
+        away come from the soonest-expiring unexpired batches, then from
+        expired ones, oldest first.
+        """
+        if not deltas:
+            return
+        with self.transaction():
+            cursor = self._cursor()
+            self._adjust_stock(cursor, deltas)
+            self._add_batches(cursor, [(g, units, None) for g, units in deltas.items() if units > 0])
+            for blood_group, units in deltas.items():
+                if units >= 0:
+                    continue
+                plan = plan_allocation(self._live_batches(cursor, blood_group), -units)
+                if plan is None:
+                    # Too few unexpired units: take them all and the rest from expired
+                    # batches, oldest first, so the batches left still add up to the total
+                    sql = """
+                        SELECT id, units_remaining FROM BloodBatches WHERE blood_group = ?
+                        ORDER BY expires_on < ?, expires_on, id
+                    """
+                    cursor.execute(sql, (blood_group, datetime.date.today()))
+                    plan = plan_allocation(cursor.fetchall(), -units)
+                if plan is None:
+                    # Fewer units than asked for: take them all
+                    cursor.execute("DELETE FROM BloodBatches WHERE blood_group = ?", (blood_group,))
+                else:
+                    self._apply_allocation(cursor, plan)
+            cursor.close()
+
+    def _adjust_stock(self, cursor, deltas):
+        """Add {blood_group: units} to BloodBank totals, never below zero."""
+        groups = list(deltas)
+        placeholders = ", ".join(["?"] * len(groups))
+        sql = f"""
+            INSERT OR IGNORE INTO BloodBank (blood_group, units_available)
+            VALUES {", ".join(["(?, 0)"] * len(groups))}
+        """
+        cursor.execute(sql, groups)
+        cases = " ".join(["WHEN ? THEN ?"] * len(groups))
+        params = []
+        for blood_group in groups:
+            params += [blood_group, deltas[blood_group]]
+        sql = f"""
+            UPDATE BloodBank
+            SET units_available = MAX(units_available + CASE blood_group {cases} END, 0)
+            WHERE blood_group IN ({placeholders})
+        """
+        cursor.execute(sql, params + groups)
+
+    def insert_batches(self, batches):
+        """Add many (blood_group, units, collected_on) batches and their units, in one transaction."""
+        deltas = {}
+        for blood_group, units, _ in batches:
+            deltas[blood_group] = deltas.get(blood_group, 0) + units
+        if not deltas:
+            return
+        with self.transaction():
+            cursor = self._cursor()
+            self._adjust_stock(cursor, deltas)
+            self._add_batches(cursor, batches)
+            cursor.close()
+
+    def discard_expired_batches(self):
+        """Delete expired batches and take their units off BloodBank; see Database."""
+        today = datetime.date.today()
+        with self.transaction():
+            cursor = self._cursor()
+            try:
+                cursor.execute("SELECT blood_group FROM BloodBank")
+                groups = [row[0] for row in cursor.fetchall()]
+                if not groups:
+                    return {}
+                placeholders = ", ".join(["?"] * len(groups))
+                sql = f"""
+                    SELECT blood_group, SUM(units_remaining) FROM BloodBatches
+                    WHERE blood_group IN ({placeholders}) AND expires_on < ?
+                    GROUP BY blood_group
+                """
+                cursor.execute(sql, groups + [today])
+                expired = dict(cursor.fetchall())
+                if not expired:
+                    return {}
+                sql = f"""
+                    DELETE FROM BloodBatches
+                    WHERE blood_group IN ({placeholders}) AND expires_on < ?
+                """
+                cursor.execute(sql, groups + [today])
+                self._adjust_stock(cursor, {g: -units for g, units in expired.items()})
+            finally:
+                cursor.close()
+        return expired
+
+    def count_rows(self, table):
+        table_name, _ = EXPORT_TABLES[table]
+        cursor = self._cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+        (count,) = cursor.fetchone()
+        cursor.close()
+        return count
+
+    def stream_rows(self, table, batch_size):
+        """
+        Yield the rows of an export table as lists of at most `batch_size` tuples,
+        in primary key order. SQLite steps through the result as it is fetched,
+        so only one batch is in memory at a time.
+        """
+        table_name, columns = EXPORT_TABLES[table]
+        cursor = self._cursor()
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {table_name} ORDER BY id")
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+    def applied_migrations(self):
+        """Return the set of schema versions already applied."""
+        cursor = self._cursor()
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS SchemaMigrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        cursor.execute("SELECT version FROM SchemaMigrations")
+        versions = {row[0] for row in cursor.fetchall()}
+        cursor.close()
+        return versions
+
+    def apply_migration(self, version, name, statements):
+        """
+        Run one migration's statements and record its version.
+        SQLite DDL is transactional, so a failing migration leaves no trace.
+        """
+        with self.transaction():
+            cursor = self._cursor()
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO SchemaMigrations (version, name) VALUES (?, ?)", (version, name)
+            )
+            cursor.close()
+
+    def explain(self, sql, params=()):
+        """Return the EXPLAIN QUERY PLAN rows for a query."""
+        cursor = self._cursor(dictionary=True)
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        plan = cursor.fetchall()
+        cursor.close()
+        return plan
+
+    def query_plan_problems(self, sql, params, needs_index_order, bounded_scan=False):
+        """
+        A plan fails if it scans a whole table or index (a SCAN, with or without
+        USING INDEX) where a bounded scan isn't expected, or if it must be
+        sorted and SQLite builds a temporary B-tree to do it.
+        """
+        # Translate the MySQL-dialect checks: ? placeholders, no row locking clause
+        sql = sql.replace("%s", "?").replace(" FOR UPDATE", "")
+        problems = []
+        for row in self.explain(sql, params):
+            detail = row["detail"]
+            if detail.startswith("SCAN ") and not bounded_scan:
+                problems.append(f"full scan ({detail})")
+            elif needs_index_order and "USE TEMP B-TREE FOR ORDER BY" in detail:
+                problems.append(f"sort ({detail})")
+        return problems
+
+    def close_connection(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,60 @@
+# startup_timing.py
+
+import csv
+import datetime
+import os
+import time
+
+import config
+
+_started = time.perf_counter()  # as close to process start as this module is imported
+
+
+class StartupTimer:
+    """
+    Records how long each startup phase took, measured from when this module
+    was first imported. report() prints the phases and appends them as one row
+    to config.STARTUP_TIMING_LOG, so time-to-login-window can be compared
+    across releases.
+    """
+
+    def __init__(self):
+        self.marks = []  # (phase, seconds since start)
+
+    def mark(self, phase):
+        self.marks.append((phase, time.perf_counter() - _started))
+
+    def report(self):
+        for phase, seconds in self.marks:
+            print(f"startup: {phase:16} {seconds * 1000:8.1f} ms")
+        if config.STARTUP_TIMING_LOG:
+            self._append()
+
+    def _append(self):
+        path = config.STARTUP_TIMING_LOG
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            new_file = not os.path.exists(path)
+            with open(path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(["timestamp", "version"] + [phase for phase, _ in self.marks])
+                writer.writerow(
+                    [datetime.datetime.now().isoformat(timespec="seconds"), _version()]
+                    + [f"{seconds * 1000:.1f}" for _, seconds in self.marks]
+                )
+        except OSError as e:
+            print(f"Could not write startup timing: {e}")
+
+
+def _version():
+    """The project version from pyproject.toml, or "" if it can't be read."""
+    try:
+        import tomllib
+
+        with open(os.path.join(os.path.dirname(__file__), "pyproject.toml"), "rb") as f:
+            return tomllib.load(f)["project"]["version"]
+    except Exception:
+        return ""
@@ -0,0 +1,288 @@
+# storage.py
+"""
+The storage interface shared by the database backends.
+
+    mysql   database.Database                a MySQL server, for multi-station sites
+    sqlite  sqlite_database.SQLiteDatabase   one local file, for single-station clinics
+
+config.DB_BACKEND picks the backend; code that needs a database calls
+open_database() rather than naming a backend class. Both backends run the same
+schema (migrations/<backend>/) and give each method the same results.
+"""
+
+import config
+
+# Tables that can be exported, with the columns written out
+EXPORT_TABLES = {
+    "transactions": (
+        "BloodTransactions",
+        ("id", "name", "blood_group", "units", "transaction_date", "transaction_type"),
+    ),
+    "donors": ("Donors", ("id", "name", "blood_group", "contact", "donation_date")),
+}
+
+# Columns the history and donor grids may be sorted on
+HISTORY_SORT_COLUMNS = ("transaction_date", "transaction_type", "name", "blood_group", "units")
+DONOR_SORT_COLUMNS = ("id", "name", "blood_group", "contact", "donation_date")
+
+BACKENDS = ("mysql", "sqlite")
+
+
+def prefix_pattern(text):
+    """LIKE pattern matching values that start with `text` (wildcards escaped with \\)."""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+def where_clause(conditions):
+    return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+
+def daily_total_rows(transactions):
+    """
+    Sum (transaction_date, blood_group, units, transaction_type) ledger rows into
+    (day, blood_group, donations, donated_units, requests, requested_units)
+    increments for DailyBloodTotals, one per day and group.
+    """
+    totals = {}
+    for day, blood_group, units, transaction_type in transactions:
+        row = totals.setdefault((day, blood_group), [0, 0, 0, 0])
+        if transaction_type == "DONATION":
+            row[0] += 1
+            row[1] += units
+        else:
+            row[2] += 1
+            row[3] += units
+    return [key + tuple(row) for key, row in totals.items()]
+
+
+def plan_allocation(batches, units):
+    """
+    Take `units` from (batch_id, units_remaining) rows listed soonest-expiring
+    first, reading no more rows than needed. Returns (emptied_ids, partial),
+    where partial is (units_left, batch_id) for the one batch only partly used
+    (or None), or None if the rows hold fewer than `units` between them.
+    """
+    emptied = []
+    for batch_id, remaining in batches:
+        if remaining > units:
+            return emptied, (remaining - units, batch_id)
+        emptied.append(batch_id)
+        units -= remaining
+        if units == 0:
+            return emptied, None
+    return None
+
+
+def open_database():
+    """Open a Database for the backend named by config.DB_BACKEND."""
+    if config.DB_BACKEND == "sqlite":
+        from sqlite_database import SQLiteDatabase
+
+        return SQLiteDatabase()
+    if config.DB_BACKEND == "mysql":
+        from database import Database
+
+        return Database()
+    raise ValueError(f"Unknown DB_BACKEND {config.DB_BACKEND!r} (expected one of {BACKENDS})")
+
+
+class Storage:
+    """
+    What every backend provides. Methods that return rows give lists of dicts
+    keyed by column name; dates come back as datetime.date.
+    """
+
+    dialect = None  # "mysql" or "sqlite"; names the migrations/ subdirectory
+
+    # Unit of work
+
+    def transaction(self):
+        """Context manager: one commit on success, rollback on error; nested blocks join."""
+        raise NotImplementedError
+
+    def close_connection(self):
+        """Give the connection back; the object must not be used afterwards."""
+        raise NotImplementedError
+
+    # Stock
+
+    def fetch_all_blood_records(self):
+        raise NotImplementedError
+
+    def update_blood_units(self, blood_group, new_units):
+        raise NotImplementedError
+
+    def get_units_for_blood_group(self, blood_group):
+        raise NotImplementedError
+
+    def add_donation(self, blood_group, units, collected_on=None):
+        """
+        Add units to a group (creating it if needed) as one batch collected on
+        `collected_on` (default today), and return the new balance.
+        """
+        raise NotImplementedError
+
+    def process_request(self, blood_group, units):
+        """
+        Issue units from the group's unexpired batches, soonest-expiring first.
+        Returns (success, message, balance).
+        """
+        raise NotImplementedError
+
+    def process_batch_request(self, name, lines):
+        """Fill a multi-group order in full or not at all. Returns (success, message, balances)."""
+        raise NotImplementedError
+
+    def process_compatible_request(self, name, blood_group, units, apply=True, expected=None):
+        """
+        Fill a request from the requested group and, where it is short, from
+        compatible groups (compatibility.plan_substitution), in one locked
+        transaction with a ledger row per group used. With apply=False the
+        plan is only worked out. If `expected` (a plan proposed earlier) is
+        given and stock has changed since, nothing is applied.
+        Returns (success, message, allocation), allocation being
+        [(group, units, balance_after)] in the order taken.
+        """
+        raise NotImplementedError
+
+    def apply_stock_deltas(self, deltas):
+        raise NotImplementedError
+
+    def insert_batches(self, batches):
+        """Add many (blood_group, units, collected_on) batches and their units to stock."""
+        raise NotImplementedError
+
+    def discard_expired_batches(self):
+        """Remove expired batches from stock. Returns {blood_group: units discarded}."""
+        raise NotImplementedError
+
+    # Change feed (StockChanges, filled by triggers on BloodBank)
+
+    def changes_since(self, position):
+        """
+        Stock changes logged after change-log `position`, as (new_position,
+        {blood_group: units_available}) with each group's latest units. Pass
+        None to get the current position. The changes are None when the log
+        no longer reaches back to `position`; reload everything then.
+        """
+        raise NotImplementedError
+
+    def prune_stock_changes(self):
+        """Delete log rows older than config.CHANGE_LOG_RETENTION_HOURS (the newest is kept)."""
+        raise NotImplementedError
+
+    # Donors and admins
+
+    def authenticate_admin(self, username, password):
+        raise NotImplementedError
+
+    def register_donor(self, name, blood_group, contact, donation_date):
+        raise NotImplementedError
+
+    def fetch_donors(self):
+        raise NotImplementedError
+
+    def search_donors(self, prefix, limit=None):
+        raise NotImplementedError
+
+    def get_donor(self, donor_id, cached=True):
+        """One donor by id, or None. cached=False skips the per-process cache."""
+        raise NotImplementedError
+
+    def get_donor_details(self, donor_name):
+        raise NotImplementedError
+
+    def fetch_full_donor_list(self, blood_group=None, name=None, sort_by="name", descending=False):
+        raise NotImplementedError
+
+    def update_donor(self, donor_id, name, blood_group, contact, donation_date):
+        """Replace a donor's details. Returns False if there is no such donor."""
+        raise NotImplementedError
+
+    def delete_donor(self, donor_id):
+        raise NotImplementedError
+
+    def insert_donors(self, donors):
+        raise NotImplementedError
+
+    # Transaction ledger
+
+    def fetch_transaction_history(
+        self,
+        after=None,
+        limit=None,
+        start_date=None,
+        end_date=None,
+        transaction_type=None,
+        blood_group=None,
+        name=None,
+        sort_by="transaction_date",
+        descending=True,
+    ):
+        raise NotImplementedError
+
+    def add_transaction(self, name, blood_group, units, transaction_type):
+        """Record a ledger row dated today and add it to the daily totals, atomically."""
+        raise NotImplementedError
+
+    def insert_transactions(self, transactions):
+        raise NotImplementedError
+
+    def import_transactions(self, transactions):
+        """
+        Insert ledger rows and apply them to the stock in the order given: a
+        DONATION adds a batch collected on its date, a REQUEST takes units from
+        the batches on the shelf on its date or is refused.
+        Returns [(index, reason)] for the refused rows.
+        """
+        raise NotImplementedError
+
+    # Reporting (DailyBloodTotals, kept in step by every ledger write)
+
+    def fetch_daily_totals(self, start_date, end_date, blood_group=None):
+        raise NotImplementedError
+
+    def fetch_monthly_totals(self, start_date, end_date, blood_group=None):
+        raise NotImplementedError
+
+    def fetch_daily_usage(self, start_date, end_date):
+        """
+        Units issued per day and group between two dates, as three parallel
+        columns (days, blood_groups, units); days with no requests are left out.
+        """
+        raise NotImplementedError
+
+    def ledger_date_range(self):
+        """(first, last) transaction date, or (None, None) for an empty ledger."""
+        raise NotImplementedError
+
+    def rebuild_daily_totals(self, start_date, end_date):
+        """Recompute the totals for a date range from the ledger."""
+        raise NotImplementedError
+
+    # Export
+
+    def count_rows(self, table):
+        raise NotImplementedError
+
+    def stream_rows(self, table, batch_size):
+        """Yield an export table's rows as lists of tuples, in primary key order."""
+        raise NotImplementedError
+
+    # Schema
+
+    def applied_migrations(self):
+        raise NotImplementedError
+
+    def apply_migration(self, version, name, statements):
+        raise NotImplementedError
+
+    def query_plan_problems(self, sql, params, needs_index_order, bounded_scan=False):
+        """
+        Reasons the plan for `sql` (%s placeholders) would not scale: a scan of
+        a whole table or index (allowed when bounded_scan, for a LIMIT that
+        stops it early), or, when needs_index_order, a sort the index can't
+        provide. Empty if the plan is fine.
+        """
+        raise NotImplementedError
@@ -0,0 +1,216 @@
+# tests/test_parity.py
+"""
+The storage backends must give every method the same results (storage.py).
+One scenario - history paging, FIFO allocation, compatible substitution and
+the daily totals - runs against a fresh SQLite file and its results are
+checked. With BLOODPY_TEST_MYSQL=1 it also runs against the MySQL database
+in config.py (emptied first, so use a scratch database) and the two sets of
+results must match.
+
+    python -m unittest discover -s tests
+    BLOODPY_TEST_MYSQL=1 python -m unittest discover -s tests
+"""
+
+import datetime
+import decimal
+import os
+import tempfile
+import unittest
+
+import config
+import migrate
+from benchmarks import datagen
+from storage import open_database
+
+TODAY = datetime.date.today()
+PAGE_SIZE = 4
+
+# Ledger rows with repeated dates, so paging has ties to break on id
+LEDGER = [
+    (f"Donor {i:02d}", group, units, datetime.date(2024, month, day), kind)
+    for i, (group, units, month, day, kind) in enumerate(
+        [
+            ("A+", 2, 1, 5, "DONATION"),
+            ("O-", 1, 1, 5, "REQUEST"),
+            ("B+", 3, 1, 5, "DONATION"),
+            ("A+", 1, 1, 20, "REQUEST"),
+            ("AB-", 2, 2, 1, "DONATION"),
+            ("O+", 4, 2, 1, "REQUEST"),
+            ("A+", 2, 2, 1, "REQUEST"),
+            ("B-", 1, 2, 14, "DONATION"),
+            ("O+", 2, 3, 3, "DONATION"),
+            ("A-", 3, 3, 3, "REQUEST"),
+            ("A+", 1, 3, 30, "DONATION"),
+        ]
+    )
+]
+
+
+def days_ago(n):
+    return TODAY - datetime.timedelta(days=n)
+
+
+def _plain(value):
+    """Dates as ISO strings and Decimals as ints, so both backends' rows compare equal."""
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items() if k != "id"}
+    if isinstance(value, decimal.Decimal):
+        return int(value)
+    return value
+
+
+def _batches(db):
+    cursor = db.connection.cursor()
+    cursor.execute(
+        "SELECT blood_group, units_remaining, collected_on FROM BloodBatches"
+        " ORDER BY blood_group, expires_on, units_remaining"
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    return _plain(rows)
+
+
+def _all_pages(db, **query):
+    rows, after = [], None
+    while True:
+        page = db.fetch_transaction_history(after=after, limit=PAGE_SIZE, **query)
+        rows += page
+        if len(page) < PAGE_SIZE:
+            return rows
+        after = (page[-1][query.get("sort_by", "transaction_date")], page[-1]["id"])
+
+
+def run_scenario(db):
+    """Run the same calls on an empty database and return their results, normalised."""
+    datagen.reset(db)
+    results = {}
+
+    # History paging, both directions and on another sort column
+    db.insert_transactions(LEDGER)
+    for label, query in [
+        ("newest first", {}),
+        ("oldest first", {"descending": False}),
+        ("by units", {"sort_by": "units"}),
+        ("blood group A+", {"blood_group": "A+"}),
+        ("name prefix", {"name": "Donor 0"}),
+    ]:
+        results[f"history {label}"] = _plain(_all_pages(db, **query))
+        results[f"history {label} unpaged"] = _plain(db.fetch_transaction_history(**query))
+
+    # FIFO allocation: the batch expiring first goes first, expired batches never
+    db.insert_batches(
+        [
+            ("A+", 3, days_ago(60)),
+            ("A+", 2, days_ago(10)),
+            ("A+", 4, days_ago(5)),
+            ("B+", 4, days_ago(60)),
+            ("O+", 5, days_ago(1)),
+            ("O-", 3, days_ago(1)),
+        ]
+    )
+    results["request A+"] = _plain(db.process_request("A+", 3))
+    results["batches after request"] = _batches(db)
+
+    # Compatible plan: B+ has only expired units, so O+ and then O- cover it
+    results["propose B+"] = _plain(db.process_compatible_request("Ann", "B+", 6, apply=False))
+    results["fill B+"] = _plain(
+        db.process_compatible_request("Ann", "B+", 6, expected=[("O+", 5), ("O-", 1)])
+    )
+    results["discarded"] = _plain(db.discard_expired_batches())
+    results["stock"] = _plain(
+        sorted((r["blood_group"], r["units_available"]) for r in db.fetch_all_blood_records())
+    )
+    results["batches after discard"] = _batches(db)
+
+    # Daily totals, from the bulk ledger and from today's requests
+    db.add_transaction("Bob", "A+", 2, "DONATION")
+    results["daily totals"] = _plain(db.fetch_daily_totals(datetime.date(2024, 1, 1), TODAY))
+    results["monthly totals"] = _plain(
+        db.fetch_monthly_totals(datetime.date(2024, 1, 1), datetime.date(2024, 12, 31))
+    )
+    return results
+
+
+class BackendParityTest(unittest.TestCase):
+    sqlite_results = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls._saved = config.DB_BACKEND, config.SQLITE_PATH
+        cls._directory = tempfile.TemporaryDirectory()
+        config.DB_BACKEND = "sqlite"
+        config.SQLITE_PATH = os.path.join(cls._directory.name, "parity.db")
+        db = open_database()
+        try:
+            migrate.apply_migrations(db)
+            cls.sqlite_results = run_scenario(db)
+        finally:
+            db.close_connection()
+
+    @classmethod
+    def tearDownClass(cls):
+        config.DB_BACKEND, config.SQLITE_PATH = cls._saved
+        cls._directory.cleanup()
+
+    def test_history_pages_match_the_unpaged_listing(self):
+        results = self.sqlite_results
+        for label in ["newest first", "oldest first", "by units", "blood group A+", "name prefix"]:
+            self.assertEqual(results[f"history {label}"], results[f"history {label} unpaged"], label)
+        newest = results["history newest first"]
+        self.assertEqual(len(newest), len(LEDGER))
+        # Ties on a date come newest id first
+        self.assertEqual([r["name"] for r in newest[-3:]], ["Donor 02", "Donor 01", "Donor 00"])
+
+    def test_fifo_allocation(self):
+        results = self.sqlite_results
+        self.assertEqual(results["request A+"], [True, "Request completed successfully.", 6])
+        a_plus = [row for row in results["batches after request"] if row[0] == "A+"]
+        # The 10-day-old batch is used up and the 5-day-old one gives 1; the expired one is untouched
+        self.assertEqual(
+            a_plus, [["A+", 3, days_ago(60).isoformat()], ["A+", 3, days_ago(5).isoformat()]]
+        )
+
+    def test_compatible_plan_skips_expired_stock(self):
+        results = self.sqlite_results
+        self.assertEqual(
+            results["propose B+"], [True, "6 units for B+: O+ 5, O- 1", [["O+", 5, 0], ["O-", 1, 2]]]
+        )
+        self.assertEqual(results["fill B+"], results["propose B+"])
+        self.assertEqual(results["discarded"], {"A+": 3, "B+": 4})
+        self.assertEqual(results["stock"], [["A+", 3], ["B+", 0], ["O+", 0], ["O-", 2]])
+
+    def test_daily_totals(self):
+        results = self.sqlite_results
+        requested = sum(r["requested_units"] for r in results["daily totals"])
+        donated = sum(r["donated_units"] for r in results["daily totals"])
+        ledger_requested = sum(units for _, _, units, _, kind in LEDGER if kind == "REQUEST")
+        ledger_donated = sum(units for _, _, units, _, kind in LEDGER if kind == "DONATION")
+        # Plus today's substitution (6 units) and donation (2 units)
+        self.assertEqual(requested, ledger_requested + 6)
+        self.assertEqual(donated, ledger_donated + 2)
+        self.assertEqual(
+            {r["month"] for r in results["monthly totals"]}, {"2024-01", "2024-02", "2024-03"}
+        )
+
+    @unittest.skipUnless(os.environ.get("BLOODPY_TEST_MYSQL"), "set BLOODPY_TEST_MYSQL=1 to compare with MySQL")
+    def test_mysql_matches_sqlite(self):
+        config.DB_BACKEND = "mysql"
+        try:
+            db = open_database()
+            try:
+                migrate.apply_migrations(db)
+                mysql_results = run_scenario(db)
+            finally:
+                db.close_connection()
+        finally:
+            config.DB_BACKEND = "sqlite"
+        for key, expected in self.sqlite_results.items():
+            self.assertEqual(mysql_results[key], expected, key)
+
+
+if __name__ == "__main__":
+    unittest.main()
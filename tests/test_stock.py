@@ -0,0 +1,300 @@
+# tests/test_stock.py
+"""
+The paths that change stock, on a fresh SQLite file: BloodBank totals and the
+BloodBatches behind them must stay in step.
+
+    python -m unittest tests.test_stock
+"""
+
+import csv
+import datetime
+import os
+import tempfile
+import unittest
+
+import config
+import migrate
+from benchmarks import datagen
+from bulk_import import TRANSACTION_COLUMNS, import_csv
+from storage import open_database
+
+TODAY = datetime.date.today()
+
+
+def days_ago(n):
+    return TODAY - datetime.timedelta(days=n)
+
+
+class StockTestCase(unittest.TestCase):
+    """A migrated SQLite database, emptied before each test."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._saved = config.DB_BACKEND, config.SQLITE_PATH
+        cls._directory = tempfile.TemporaryDirectory()
+        config.DB_BACKEND = "sqlite"
+        config.SQLITE_PATH = os.path.join(cls._directory.name, "stock.db")
+        cls.db = open_database()
+        migrate.apply_migrations(cls.db)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close_connection()
+        config.DB_BACKEND, config.SQLITE_PATH = cls._saved
+        cls._directory.cleanup()
+
+    def setUp(self):
+        datagen.reset(self.db)
+
+    def stock(self):
+        return {r["blood_group"]: r["units_available"] for r in self.db.fetch_all_blood_records()}
+
+    def batches(self, blood_group):
+        """[(units_remaining, collected_on)] for the group, soonest-expiring first."""
+        cursor = self.db.connection.cursor()
+        cursor.execute(
+            "SELECT units_remaining, collected_on FROM BloodBatches"
+            " WHERE blood_group = ? ORDER BY expires_on, id",
+            (blood_group,),
+        )
+        rows = [(units, datetime.date.fromisoformat(str(day))) for units, day in cursor.fetchall()]
+        cursor.close()
+        return rows
+
+    def live_units(self, blood_group):
+        cursor = self.db.connection.cursor()
+        cursor.execute(
+            "SELECT COALESCE(SUM(units_remaining), 0) FROM BloodBatches"
+            " WHERE blood_group = ? AND expires_on >= ?",
+            (blood_group, TODAY),
+        )
+        (units,) = cursor.fetchone()
+        cursor.close()
+        return units
+
+
+class BulkImportTest(StockTestCase):
+    def import_rows(self, rows, **options):
+        path = os.path.join(self._directory.name, "ledger.csv")
+        rejects_path = os.path.join(self._directory.name, "rejects.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(TRANSACTION_COLUMNS)
+            writer.writerows(rows)
+        report = import_csv(
+            "transactions", path, db=self.db, rejects_path=rejects_path, progress=None, **options
+        )
+        with open(rejects_path, newline="", encoding="utf-8") as f:
+            rejects = list(csv.DictReader(f))
+        return report, rejects
+
+    def test_historical_request_uses_its_own_batches(self):
+        self.db.insert_batches([("A+", 10, days_ago(1))])
+        report, rejects = self.import_rows(
+            [
+                ("Ann", "A+", 5, "2020-03-01", "DONATION"),
+                ("Bob", "A+", 5, "2020-03-02", "REQUEST"),
+            ]
+        )
+        self.assertEqual((report.accepted, report.rejected), (2, 0))
+        # The 2020 request emptied the 2020 batch; today's stock is untouched
+        self.assertEqual(self.batches("A+"), [(10, days_ago(1))])
+        self.assertEqual(self.db.discard_expired_batches(), {})
+        self.assertEqual(self.stock(), {"A+": 10})
+        self.assertEqual(self.live_units("A+"), 10)
+
+    def test_rows_apply_in_file_order(self):
+        report, rejects = self.import_rows(
+            [
+                ("Ann", "O-", 2, TODAY.isoformat(), "REQUEST"),
+                ("Bob", "O-", 3, TODAY.isoformat(), "DONATION"),
+                ("Cat", "O-", 2, TODAY.isoformat(), "REQUEST"),
+                ("Dan", "O-", 2, TODAY.isoformat(), "REQUEST"),
+            ]
+        )
+        # The first request comes before the donation, the last after the second took 2 of 3
+        self.assertEqual((report.accepted, report.rejected), (2, 2))
+        self.assertEqual([r["line"] for r in rejects], ["2", "5"])
+        self.assertTrue(rejects[0]["reason"].startswith("request for 2 units exceeds"))
+        self.assertEqual(self.stock(), {"O-": 1})
+        self.assertEqual(self.batches("O-"), [(1, TODAY)])
+        history = self.db.fetch_transaction_history(descending=False)
+        self.assertEqual([r["name"] for r in history], ["Bob", "Cat"])
+
+    def test_request_cannot_use_stock_collected_later(self):
+        self.db.insert_batches([("B+", 10, days_ago(1))])
+        report, rejects = self.import_rows([("Ann", "B+", 1, "2020-03-01", "REQUEST")])
+        self.assertEqual((report.accepted, report.rejected), (0, 1))
+        self.assertEqual(self.stock(), {"B+": 10})
+
+    def test_request_cannot_use_stock_expired_by_its_date(self):
+        self.import_rows([("Ann", "B+", 4, "2020-01-01", "DONATION")])
+        later = datetime.date(2020, 1, 1) + datetime.timedelta(days=config.BLOOD_SHELF_LIFE_DAYS + 1)
+        report, rejects = self.import_rows([("Bob", "B+", 1, later.isoformat(), "REQUEST")])
+        self.assertEqual((report.accepted, report.rejected), (0, 1))
+        self.assertEqual(self.batches("B+"), [(4, datetime.date(2020, 1, 1))])
+
+    def test_invalid_rows_are_rejected(self):
+        report, rejects = self.import_rows(
+            [
+                ("Ann", "C+", 1, "2024-01-01", "DONATION"),
+                ("Bob", "A+", 0, "2024-01-01", "DONATION"),
+                ("Cat", "A+", 1, "01/02/2024", "DONATION"),
+                ("Dan", "A+", 1, "2024-01-01", "LOAN"),
+            ]
+        )
+        self.assertEqual((report.accepted, report.rejected), (0, 4))
+        self.assertEqual(
+            [r["reason"] for r in rejects],
+            [
+                "unknown blood group 'C+'",
+                "units must be positive",
+                "transaction_date is not a YYYY-MM-DD date",
+                "unknown transaction type 'LOAN'",
+            ],
+        )
+        self.assertEqual(self.stock(), {})
+
+    def test_no_stock_writes_the_ledger_only(self):
+        report, _ = self.import_rows(
+            [("Ann", "A+", 3, "2024-01-01", "REQUEST")], update_stock=False
+        )
+        self.assertEqual(report.accepted, 1)
+        self.assertEqual(self.stock(), {})
+        self.assertEqual(len(self.db.fetch_transaction_history()), 1)
+
+
+class ExpiryTest(StockTestCase):
+    def test_discard_expired_batches(self):
+        self.db.insert_batches(
+            [("A+", 3, days_ago(60)), ("A+", 2, days_ago(1)), ("O+", 4, days_ago(43))]
+        )
+        self.assertEqual(self.db.discard_expired_batches(), {"A+": 3, "O+": 4})
+        self.assertEqual(self.stock(), {"A+": 2, "O+": 0})
+        self.assertEqual(self.batches("A+"), [(2, days_ago(1))])
+        self.assertEqual(self.batches("O+"), [])
+        self.assertEqual(self.db.discard_expired_batches(), {})
+
+    def test_batch_on_its_expiry_date_is_kept(self):
+        self.db.insert_batches([("A+", 3, days_ago(config.BLOOD_SHELF_LIFE_DAYS))])
+        self.assertEqual(self.db.discard_expired_batches(), {})
+        self.assertEqual(self.stock(), {"A+": 3})
+
+
+class StockDeltasTest(StockTestCase):
+    def test_units_added_become_a_batch_collected_today(self):
+        self.db.apply_stock_deltas({"AB+": 4})
+        self.assertEqual(self.stock(), {"AB+": 4})
+        self.assertEqual(self.batches("AB+"), [(4, TODAY)])
+
+    def test_units_taken_come_from_the_soonest_expiring_batch(self):
+        self.db.insert_batches([("A+", 3, days_ago(2)), ("A+", 3, days_ago(20))])
+        self.db.apply_stock_deltas({"A+": -4})
+        self.assertEqual(self.stock(), {"A+": 2})
+        self.assertEqual(self.batches("A+"), [(2, days_ago(2))])
+
+    def test_expired_batches_cover_what_live_ones_cannot(self):
+        self.db.insert_batches(
+            [("A+", 2, days_ago(50)), ("A+", 2, days_ago(60)), ("A+", 2, days_ago(1))]
+        )
+        self.db.apply_stock_deltas({"A+": -3})
+        # Live first, then the oldest expired batch
+        self.assertEqual(self.stock(), {"A+": 3})
+        self.assertEqual(self.batches("A+"), [(1, days_ago(60)), (2, days_ago(50))])
+
+    def test_totals_never_drop_below_zero(self):
+        self.db.insert_batches([("B-", 2, days_ago(1))])
+        self.db.apply_stock_deltas({"B-": -5})
+        self.assertEqual(self.stock(), {"B-": 0})
+        self.assertEqual(self.batches("B-"), [])
+
+
+class BatchRequestTest(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db.insert_batches(
+            [("A+", 5, days_ago(1)), ("O-", 2, days_ago(1)), ("O-", 3, days_ago(60))]
+        )
+
+    def test_order_is_filled_and_repeated_groups_summed(self):
+        success, _, balances = self.db.process_batch_request("Ward 3", [("A+", 2), ("A+", 1), ("O-", 2)])
+        self.assertTrue(success)
+        self.assertEqual(balances, {"A+": 2, "O-": 3})
+        self.assertEqual(self.stock(), {"A+": 2, "O-": 3})
+        self.assertEqual(self.batches("O-"), [(3, days_ago(60))])
+        history = self.db.fetch_transaction_history(transaction_type="REQUEST")
+        self.assertEqual(sorted((r["blood_group"], r["units"]) for r in history), [("A+", 3), ("O-", 2)])
+
+    def test_short_group_changes_nothing(self):
+        success, message, balances = self.db.process_batch_request("Ward 3", [("A+", 2), ("O-", 6)])
+        self.assertFalse(success)
+        self.assertEqual(message, "Insufficient units available for O-.")
+        self.assertEqual(balances, {})
+        self.assertEqual(self.stock(), {"A+": 5, "O-": 5})
+        self.assertEqual(self.db.fetch_transaction_history(), [])
+
+    def test_expired_units_do_not_count(self):
+        # O- has 5 in total but only 2 unexpired
+        success, message, _ = self.db.process_batch_request("Ward 3", [("A+", 2), ("O-", 3)])
+        self.assertFalse(success)
+        self.assertEqual(message, "Insufficient unexpired units available for O-.")
+        self.assertEqual(self.batches("A+"), [(5, days_ago(1))])
+        self.assertEqual(self.stock(), {"A+": 5, "O-": 5})
+
+
+class CompatibleRequestTest(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db.insert_batches(
+            [("A-", 2, days_ago(1)), ("O-", 4, days_ago(1)), ("O-", 9, days_ago(60))]
+        )
+
+    def test_substitutes_fill_the_request(self):
+        proposed = self.db.process_compatible_request("Ann", "A-", 5, apply=False)
+        self.assertEqual(proposed[2], [("A-", 2, 0), ("O-", 3, 10)])
+        # Proposing changes nothing
+        self.assertEqual(self.stock(), {"A-": 2, "O-": 13})
+        filled = self.db.process_compatible_request("Ann", "A-", 5, expected=[("A-", 2), ("O-", 3)])
+        self.assertEqual(filled, proposed)
+        self.assertEqual(self.stock(), {"A-": 0, "O-": 10})
+        self.assertEqual(self.batches("O-"), [(9, days_ago(60)), (1, days_ago(1))])
+
+    def test_changed_stock_refuses_the_proposal(self):
+        self.db.process_request("A-", 1)
+        success, message, _ = self.db.process_compatible_request(
+            "Ann", "A-", 5, expected=[("A-", 2), ("O-", 3)]
+        )
+        self.assertFalse(success)
+        self.assertEqual(message, "Stock changed since the substitution was proposed.")
+        self.assertEqual(self.stock(), {"A-": 1, "O-": 13})
+
+    def test_expired_units_are_not_offered(self):
+        success, _, _ = self.db.process_compatible_request("Ann", "A-", 7, apply=False)
+        self.assertFalse(success)
+
+
+class ChangeFeedTest(StockTestCase):
+    def test_changes_since_a_position(self):
+        position, changes = self.db.changes_since(None)
+        self.assertEqual(changes, {})
+        self.db.insert_batches([("A+", 3, days_ago(1))])
+        self.db.process_request("A+", 1)
+        position, changes = self.db.changes_since(position)
+        self.assertEqual(changes, {"A+": 2})
+        # The overlap reads recent rows again; they hold absolute units, so that's harmless
+        self.assertEqual(self.db.changes_since(position), (position, {"A+": 2}))
+
+    def test_pruned_log_asks_for_a_full_reload(self):
+        position, _ = self.db.changes_since(None)
+        for units in (1, 2, 3):
+            self.db.apply_stock_deltas({"A+": units})
+        cursor = self.db.connection.cursor()
+        cursor.execute("UPDATE StockChanges SET changed_at = datetime('now', '-30 days')")
+        cursor.close()
+        self.db.prune_stock_changes()
+        _, changes = self.db.changes_since(position)
+        self.assertIsNone(changes)
+
+
+if __name__ == "__main__":
+    unittest.main()
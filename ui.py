@@ -2,13 +2,18 @@
 
 import customtkinter as ctk
 import tkinter as tk
-from tkinter import ttk, messagebox
-from database import Database
+from tkinter import ttk, messagebox, filedialog
+from background import DatabaseWorker
+from widgets import KeyedTreeview
+from cache import LRUCache
 import datetime
+import config
 import auth  # For logout functionality
-
-# Define blood groups
-BLOOD_GROUPS = ["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"]
+import compatibility
+import export
+import forecast
+import instrumentation
+from config import BLOOD_GROUPS
 
 
 class BloodBankUI:
@@ -16,9 +21,24 @@ class BloodBankUI:
         self.root = root
         self.root.title("Blood Bank Management")
         self.root.geometry("1600x900")
-        self.db = Database()
+        # All database work runs on background threads; results come back via root.after
+        self.worker = DatabaseWorker(root, on_busy=self.show_busy)
         self.current_donor = None
-        self.donate_donor_menu = None  # Initialize the donor menu reference
+        # Inventory snapshot {blood_group: units_available}; the table and the
+        # request dropdown both render from it
+        self.inventory = {}
+        # Expected units issued per day {blood_group: rate}, reloaded with the
+        # inventory; stock-out projections are recomputed from it on every change
+        self.consumption_rates = {}
+        # Position in the StockChanges log the snapshot is current to; a poller
+        # patches in changes made at other stations from there
+        self.change_position = None
+        self.change_poll_after = None
+        # Recent donor searches {prefix: matches}, cleared when donors change
+        self.donor_search_cache = LRUCache(config.DONOR_SEARCH_CACHE_SIZE)
+        self.donor_matches = []
+        self.donor_search_after = None
+        self.selected_donor_id = None
 
         # Set protocol to handle window close events properly
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -27,7 +47,8 @@ class BloodBankUI:
         self.configure_treeview_style()
         
         self.create_widgets()
-        self.populate_treeview()
+        self.refresh_inventory()
+        self.run_housekeeping()
 
     def configure_treeview_style(self):
         """Configure custom style for treeview with larger font"""
@@ -54,11 +75,19 @@ class BloodBankUI:
 
         # Table
         self.tree = ttk.Treeview(
-            tree_frame, columns=("blood_group", "units"), show="headings", height=8, style="Treeview"
+            tree_frame,
+            columns=("blood_group", "units", "daily_use", "days_left", "stockout"),
+            show="headings",
+            height=8,
+            style="Treeview",
         )
         self.tree.heading("blood_group", text="Blood Group")
         self.tree.heading("units", text="Units Available")
+        self.tree.heading("daily_use", text="Used per Day")
+        self.tree.heading("days_left", text="Days of Supply")
+        self.tree.heading("stockout", text="Projected Stock-out")
         self.tree.pack(side=tk.LEFT, fill="x", expand=True)
+        self.inventory_rows = KeyedTreeview(self.tree)
 
         # Scrollbar of the frame
         scrollbar = ttk.Scrollbar(
@@ -67,6 +96,10 @@ class BloodBankUI:
         self.tree.configure(yscrollcommand=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill="y")
 
+        # Groups projected to run out within config.SHORTAGE_WARNING_DAYS
+        self.shortage_label = ctk.CTkLabel(self.root, text="", font=("Helvetica", 15, "bold"))
+        self.shortage_label.pack(padx=10, anchor="w")
+
         # Frame where the 2 forms are
         forms_frame = ctk.CTkFrame(self.root)
         forms_frame.pack(pady=20, padx=20, fill="both", expand=True)
@@ -87,22 +120,24 @@ class BloodBankUI:
             row=1, column=0, padx=5, pady=5
         )
 
-        # Get list of donors
-        donors = self.db.fetch_donors()
-        donor_names = [f"{d['name']} ({d['blood_group']})" for d in donors]
-
-        self.donate_donor_var = ctk.StringVar()
-        self.donate_donor_menu = ctk.CTkOptionMenu(
+        # Typeahead: matching donors are looked up as the name is typed
+        self.donor_search_entry = ctk.CTkEntry(
             donate_frame,
-            values=donor_names if donor_names else ["No donors registered"],
             width=300,
             height=40,
             font=("Helvetica", 14),
-            dropdown_font=("Helvetica", 15),
-            variable=self.donate_donor_var,
-            command=self.on_donor_selected,
+            placeholder_text="Type a donor name",
         )
-        self.donate_donor_menu.grid(row=1, column=1, padx=5, pady=5)
+        self.donor_search_entry.grid(row=1, column=1, padx=5, pady=5)
+        self.donor_search_entry.bind("<KeyRelease>", self.on_donor_search_key)
+
+        # Dropdown with the matches, placed under the search box when there are any
+        self.donor_results = tk.Listbox(
+            donate_frame, height=8, font=("Helvetica", 14), activestyle="none"
+        )
+        self.donor_results.bind("<ButtonRelease-1>", self.on_donor_result_chosen)
+        self.donor_results.bind("<Return>", self.on_donor_result_chosen)
+        self.donor_results.bind("<Escape>", lambda event: self.hide_donor_results())
 
         ctk.CTkLabel(donate_frame, text="Units:", font=("Helvetica", 14)).grid(
             row=2, column=0, padx=5, pady=5
@@ -132,14 +167,15 @@ class BloodBankUI:
         )  # Default to today
         self.donate_date_entry.grid(row=3, column=1, padx=5, pady=5)
 
-        ctk.CTkButton(
+        self.donate_button = ctk.CTkButton(
             donate_frame,
             text="Submit Donation",
             command=self.donate_dbase,
             width=200,
             height=40,
             font=("Helvetica", 14, "bold"),
-        ).grid(row=4, columnspan=2, pady=(0, 20))
+        )
+        self.donate_button.grid(row=4, columnspan=2, pady=(0, 20))
 
         # --- Request Frame ---
         request_container = ctk.CTkFrame(forms_frame)
@@ -168,12 +204,10 @@ class BloodBankUI:
             row=2, column=0, padx=5, pady=5
         )
 
-        # Get available blood groups (only those with units > 0)
-        available_blood_groups = self.get_available_blood_groups()
-        
+        # Filled with the groups that have units once the inventory has loaded
         self.request_bg_entry = ctk.CTkOptionMenu(
             request_frame,
-            values=available_blood_groups if available_blood_groups else ["No blood available"],
+            values=["No blood available"],
             width=300,
             height=40,
             dropdown_font=("Helvetica", 15),
@@ -208,14 +242,15 @@ class BloodBankUI:
         )  # Default to today
         self.request_date_entry.grid(row=4, column=1, padx=5, pady=5)
 
-        ctk.CTkButton(
+        self.request_button = ctk.CTkButton(
             request_frame,
             text="Submit Request",
             command=self.request_dbase,
             width=200,
             height=40,
             font=("Helvetica", 14, "bold"),
-        ).grid(row=5, columnspan=2, pady=(0, 20))
+        )
+        self.request_button.grid(row=5, columnspan=2, pady=(0, 20))
 
         # --- Control Buttons (Donor Registration, Donation History, Logout) ---
         control_frame = ctk.CTkFrame(self.root)
@@ -251,6 +286,37 @@ class BloodBankUI:
         )
         donor_management_button.grid(row=0, column=2, padx=5)
 
+        reports_button = ctk.CTkButton(
+            control_frame,
+            text="Reports",
+            command=self.open_reports,
+            width=200,
+            height=40,
+            font=("Helvetica", 14, "bold"),
+        )
+        reports_button.grid(row=0, column=3, padx=5)
+
+        # Reloads the inventory snapshot, e.g. after another station changed stock
+        refresh_stock_button = ctk.CTkButton(
+            control_frame,
+            text="Refresh Stock",
+            command=self.refresh_inventory,
+            width=200,
+            height=40,
+            font=("Helvetica", 14, "bold"),
+        )
+        refresh_stock_button.grid(row=0, column=4, padx=5)
+
+        diagnostics_button = ctk.CTkButton(
+            control_frame,
+            text="Diagnostics",
+            command=self.open_diagnostics,
+            width=200,
+            height=40,
+            font=("Helvetica", 14, "bold"),
+        )
+        diagnostics_button.grid(row=0, column=5, padx=5)
+
         logout_button = ctk.CTkButton(
             control_frame,
             text="Logout",
@@ -259,25 +325,135 @@ class BloodBankUI:
             height=40,
             font=("Helvetica", 14, "bold"),
         )
-        logout_button.grid(row=0, column=3, padx=5)
+        logout_button.grid(row=0, column=6, padx=5)
+
+        # Busy indicator shown while database work is in flight
+        self.status_label = ctk.CTkLabel(self.root, text="", font=("Helvetica", 13))
+        self.status_label.pack(side=tk.BOTTOM, pady=(0, 5))
+
+    def show_busy(self, busy):
+        """Show or clear the busy indicator."""
+        self.status_label.configure(text="Working..." if busy else "")
+        self.root.configure(cursor="watch" if busy else "")
 
     def get_available_blood_groups(self):
-        """Get blood groups that have available units (> 0)"""
-        records = self.db.fetch_all_blood_records()
+        """Get blood groups that can be supplied, from their own or compatible stock"""
         available_groups = []
-        for record in records:
-            if record["units_available"] > 0:
-                available_groups.append(record["blood_group"])
+        for blood_group in BLOOD_GROUPS:
+            if compatibility.compatible_units(self.inventory, blood_group) > 0:
+                available_groups.append(blood_group)
         return available_groups
 
+    def refresh_inventory(self):
+        """Replace the inventory snapshot and consumption rates with fresh reads (read-only)."""
+
+        def load(db):
+            # Taken before the read, so nothing logged meanwhile is missed
+            position, _ = db.changes_since(None)
+            records = db.fetch_all_blood_records()
+            return position, records, forecast.consumption_rates(db)
+
+        def on_success(result):
+            self.change_position, records, self.consumption_rates = result
+            self.inventory = {r["blood_group"]: r["units_available"] for r in records}
+            self.populate_treeview()
+            self.schedule_change_poll()
+
+        self.worker.submit(load, on_success=on_success)
+
+    def run_housekeeping(self):
+        """
+        Take expired batches out of stock and prune the change log, then come
+        back in HOUSEKEEPING_INTERVAL_MS. Discarding locks stock rows, so it
+        runs on this timer rather than with every reload; the stock it changes
+        reaches the snapshot through the change poll.
+        """
+
+        def work(db):
+            db.prune_stock_changes()
+            return db.discard_expired_batches()
+
+        def on_success(discarded):
+            self.root.after(config.HOUSEKEEPING_INTERVAL_MS, self.run_housekeeping)
+            if discarded:
+                messagebox.showwarning(
+                    "Expired Units",
+                    "Expired units removed from stock: "
+                    + ", ".join(f"{group}: {units}" for group, units in sorted(discarded.items())),
+                )
+
+        def on_error(e):
+            print(f"Housekeeping failed: {e}")
+            self.root.after(config.HOUSEKEEPING_INTERVAL_MS, self.run_housekeeping)
+
+        self.worker.submit(work, on_success=on_success, on_error=on_error, quiet=True)
+
+    def schedule_change_poll(self):
+        if self.change_poll_after is None:
+            self.change_poll_after = self.root.after(config.CHANGE_POLL_MS, self.poll_stock_changes)
+
+    def poll_stock_changes(self):
+        """Patch in stock changed at other stations since the last poll."""
+        self.change_poll_after = None
+        position = self.change_position
+
+        def on_success(result):
+            new_position, changes = result
+            if changes is None:
+                # Further behind than the log keeps; start over from a full read
+                self.refresh_inventory()
+                return
+            self.change_position = new_position
+            changed = {g: units for g, units in changes.items() if self.inventory.get(g) != units}
+            if changed:
+                self.inventory.update(changed)
+                self.populate_treeview()
+            self.schedule_change_poll()
+
+        def on_error(e):
+            print(f"Stock change poll failed: {e}")
+            self.schedule_change_poll()
+
+        # Polls run every few seconds, so they don't show the busy indicator
+        self.worker.submit(
+            lambda db: db.changes_since(position), on_success=on_success, on_error=on_error, quiet=True
+        )
+
+    def update_inventory(self, blood_group, units_available):
+        """Patch one group in the snapshot with the balance a write returned."""
+        self.inventory[blood_group] = units_available
+        self.populate_treeview()
+
     def populate_treeview(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        records = self.db.fetch_all_blood_records()
-        for record in records:
-            self.tree.insert(
-                "", tk.END, values=(record["blood_group"], record["units_available"])
-            )
+        """Render the inventory table, shortage alerts and request dropdown from the snapshot."""
+        projections = forecast.project(self.inventory, self.consumption_rates)
+        rows = []
+        for blood_group, units in self.inventory.items():
+            p = projections.get(blood_group)
+            if p is None or p["stockout_date"] is None:
+                rows.append((blood_group, (blood_group, units, "-", "-", "-")))
+                continue
+            rows.append((
+                blood_group,
+                (
+                    blood_group,
+                    units,
+                    f"{p['daily_rate']:.1f}",
+                    f"{p['days_of_supply']:.1f}",
+                    p["stockout_date"].strftime("%Y-%m-%d"),
+                ),
+            ))
+        # Only groups whose values changed are touched
+        self.inventory_rows.sync(rows)
+
+        alerts = forecast.shortage_alerts(projections)
+        self.shortage_label.configure(
+            text="  ".join(
+                f"{group}: {p['alert'].upper()}, out by {p['stockout_date']:%Y-%m-%d}"
+                for group, p in alerts
+            ),
+            text_color="red" if any(p["alert"] == forecast.CRITICAL for _, p in alerts) else "orange",
+        )
         
         # Update the request blood group dropdown with available blood groups
         available_groups = self.get_available_blood_groups()
@@ -303,19 +479,41 @@ class BloodBankUI:
             return
 
         # Rest of the donation processing
-        try:
-            self.db.add_donation(blood_group, units)
-            self.db.add_transaction(
-                self.current_donor["name"], blood_group, units, "DONATION"
-            )
+        donor_id = self.current_donor["id"]
+        donor_name = self.current_donor["name"]
+
+        def record_donation(db):
+            # The selected record may come from this station's cache; another
+            # station may have changed the donor's group since, so check it afresh
+            donor = db.get_donor(donor_id, cached=False)
+            if donor is None:
+                raise ValueError("The donor no longer exists.")
+            if donor["blood_group"] != blood_group:
+                raise ValueError(
+                    f"The donor's blood group is now {donor['blood_group']}; select the donor again."
+                )
+            # Stock change and ledger row commit together or not at all
+            with db.transaction():
+                balance = db.add_donation(blood_group, units)
+                db.add_transaction(donor_name, blood_group, units, "DONATION")
+            return balance
+
+        def on_success(balance):
+            self.donate_button.configure(state="normal")
             messagebox.showinfo(
                 "Donation", f"Donation of {units} units recorded for blood group {blood_group}."
             )
-            self.populate_treeview()
+            self.update_inventory(blood_group, balance)
             self.donate_units_entry.delete(0, 'end')
-        except Exception as e:
+
+        def on_error(e):
+            self.donate_button.configure(state="normal")
             messagebox.showerror("Error", f"Failed to record donation: {str(e)}")
 
+        # Disabled until the worker answers, so a double click can't donate twice
+        self.donate_button.configure(state="disabled")
+        self.worker.submit(record_donation, on_success=on_success, on_error=on_error)
+
     def request_dbase(self):
         blood_group = self.request_bg_entry.get()
         if blood_group == "No blood available":
@@ -338,19 +536,79 @@ class BloodBankUI:
             messagebox.showerror("Input Error", "Please enter requester name.")
             return
 
-        success, msg = self.db.process_request(blood_group, units)
-        if success:
-            self.db.add_transaction(requester_name, blood_group, units, "REQUEST")
+        def record_request(db):
+            # Stock change and ledger row commit together or not at all
+            with db.transaction():
+                success, msg, balance = db.process_request(blood_group, units)
+                if success:
+                    db.add_transaction(requester_name, blood_group, units, "REQUEST")
+            proposal = None
+            if not success:
+                # The group is short; see whether compatible groups could make it up
+                can_fill, _, allocation = db.process_compatible_request(
+                    requester_name, blood_group, units, apply=False
+                )
+                if can_fill:
+                    proposal = allocation
+            return success, msg, balance, proposal
+
+        def record_substitution(db, plan):
+            return db.process_compatible_request(
+                requester_name, blood_group, units, apply=True, expected=plan
+            )
+
+        def request_done(msg):
             messagebox.showinfo("Request", msg)
-            
+
             # Clear form fields after successful transaction
             self.request_name_entry.delete(0, 'end')
             self.request_units_entry.delete(0, 'end')
-            
-            # Update blood inventory display and available blood groups
-            self.populate_treeview()
-        else:
-            messagebox.showerror("Request Error", msg)
+
+        def on_substituted(result):
+            self.request_button.configure(state="normal")
+            success, msg, allocation = result
+            if not success:
+                messagebox.showerror("Request Error", msg)
+                return
+            for group, _, balance in allocation:
+                self.update_inventory(group, balance)
+            request_done(f"Request completed with substitutes: {msg}.")
+
+        def on_success(result):
+            success, msg, balance, proposal = result
+            if success:
+                self.request_button.configure(state="normal")
+                request_done(msg)
+
+                # Update blood inventory display and available blood groups
+                self.update_inventory(blood_group, balance)
+                return
+            if proposal is None:
+                self.request_button.configure(state="normal")
+                messagebox.showerror("Request Error", msg)
+                return
+            plan = [(group, taken) for group, taken, _ in proposal]
+            substitutes = "\n".join(f"  {group}: {taken} units" for group, taken in plan)
+            if not messagebox.askyesno(
+                "Substitute Compatible Blood",
+                f"{msg}\n\nThe request can be filled from compatible groups:\n"
+                f"{substitutes}\n\nIssue these units instead?",
+            ):
+                self.request_button.configure(state="normal")
+                return
+            self.worker.submit(
+                lambda db: record_substitution(db, plan),
+                on_success=on_substituted,
+                on_error=on_error,
+            )
+
+        def on_error(e):
+            self.request_button.configure(state="normal")
+            messagebox.showerror("Error", f"Failed to process request: {str(e)}")
+
+        # Disabled until the worker answers, so a double click can't request twice
+        self.request_button.configure(state="disabled")
+        self.worker.submit(record_request, on_success=on_success, on_error=on_error)
 
     def open_donor_registration(self):
         """Open a window to register a new donor with enhanced UI"""
@@ -432,10 +690,23 @@ class BloodBankUI:
                 messagebox.showerror("Input Error", "Please fill in all fields.")
                 return
                 
-            self.db.register_donor(name, blood_group, contact, datetime.date.today())
-            messagebox.showinfo("Success", "Donor registered successfully.")
-            self.refresh_donor_list()  # Update the donor dropdown
-            reg_win.destroy()
+            def on_success(_):
+                messagebox.showinfo("Success", "Donor registered successfully.")
+                self.refresh_donor_list()  # Update the donor dropdown
+                reg_win.destroy()
+
+            def on_error(e):
+                submit_button.configure(state="normal")
+                messagebox.showerror("Error", f"Failed to register donor: {str(e)}")
+
+            # Disabled until the worker answers, so a double click can't register twice
+            submit_button.configure(state="disabled")
+            self.worker.submit(
+                lambda db: db.register_donor(name, blood_group, contact, datetime.date.today()),
+                on_success=on_success,
+                on_error=on_error,
+                owner=reg_win,
+            )
 
         # Submit button with larger font, centered
         submit_button = ctk.CTkButton(
@@ -459,7 +730,28 @@ class BloodBankUI:
     def open_donation_history(self):
         history_win = ctk.CTkToplevel(self.root)
         history_win.title("Blood Transaction History")
-        history_win.geometry("800x600")
+        history_win.geometry("1000x600")
+
+        # Filter bar; filtering and sorting are done by the database
+        filter_frame = ctk.CTkFrame(history_win)
+        filter_frame.pack(padx=10, pady=(10, 0), fill="x")
+
+        ctk.CTkLabel(filter_frame, text="From:", font=("Helvetica", 14)).grid(row=0, column=0, padx=5, pady=5)
+        from_entry = ctk.CTkEntry(filter_frame, width=110, placeholder_text="YYYY-MM-DD")
+        from_entry.grid(row=0, column=1, padx=5, pady=5)
+
+        ctk.CTkLabel(filter_frame, text="To:", font=("Helvetica", 14)).grid(row=0, column=2, padx=5, pady=5)
+        to_entry = ctk.CTkEntry(filter_frame, width=110, placeholder_text="YYYY-MM-DD")
+        to_entry.grid(row=0, column=3, padx=5, pady=5)
+
+        type_menu = ctk.CTkOptionMenu(filter_frame, values=["All types", "DONATION", "REQUEST"], width=130)
+        type_menu.grid(row=0, column=4, padx=5, pady=5)
+
+        group_menu = ctk.CTkOptionMenu(filter_frame, values=["All groups"] + BLOOD_GROUPS, width=110)
+        group_menu.grid(row=0, column=5, padx=5, pady=5)
+
+        name_entry = ctk.CTkEntry(filter_frame, width=160, placeholder_text="Name starts with")
+        name_entry.grid(row=0, column=6, padx=5, pady=5)
 
         history_frame = ctk.CTkFrame(history_win)
         history_frame.pack(padx=10, pady=10, fill="both", expand=True)
@@ -471,12 +763,14 @@ class BloodBankUI:
             show="headings",
         )
 
-        # Define column headings
-        tree.heading("date", text="Date")
-        tree.heading("type", text="Type")
-        tree.heading("name", text="Name")
-        tree.heading("blood_group", text="Blood Group")
-        tree.heading("units", text="Units")
+        # Define column headings, with the database column each one sorts on
+        headings = {
+            "date": ("Date", "transaction_date"),
+            "type": ("Type", "transaction_type"),
+            "name": ("Name", "name"),
+            "blood_group": ("Blood Group", "blood_group"),
+            "units": ("Units", "units"),
+        }
 
         # Define column widths
         tree.column("date", width=100)
@@ -488,14 +782,34 @@ class BloodBankUI:
         tree.pack(side=tk.LEFT, fill="both", expand=True)
 
         scrollbar = ttk.Scrollbar(history_frame, orient="vertical", command=tree.yview)
-        tree.configure(yscroll=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill="y")
 
-        # Fetch and display records
-        records = self.db.fetch_transaction_history()
-        if not records:
-            tree.insert("", tk.END, values=("No records found", "-", "-", "-", "-"))
-        else:
+        # Rows are fetched a page at a time; more are loaded as the user scrolls
+        # "generation" changes on every reload so pages of an old query are dropped
+        page = {"after": None, "done": False, "loading": False, "generation": 0}
+        query = {"sort_by": "transaction_date", "descending": True}
+
+        def load_next_page():
+            if page["done"] or page["loading"] or not tree.winfo_exists():
+                return
+            page["loading"] = True
+            generation = page["generation"]
+            after = page["after"]
+            params = dict(query)
+            self.worker.submit(
+                lambda db: db.fetch_transaction_history(
+                    after=after, limit=config.HISTORY_PAGE_SIZE, **params
+                ),
+                on_success=lambda records: show_page(generation, records),
+                on_error=lambda e: show_error(generation, e),
+                owner=history_win,
+            )
+
+        def show_page(generation, records):
+            if generation != page["generation"]:
+                return
+            if not records and page["after"] is None:
+                tree.insert("", tk.END, values=("No records found", "-", "-", "-", "-"))
             for record in records:
                 tree.insert(
                     "",
@@ -508,37 +822,306 @@ class BloodBankUI:
                         record["units"],
                     ),
                 )
+            if len(records) < config.HISTORY_PAGE_SIZE:
+                page["done"] = True
+            else:
+                last = records[-1]
+                page["after"] = (last[query["sort_by"]], last["id"])
+            page["loading"] = False
+
+        def show_error(generation, error):
+            if generation == page["generation"]:
+                page["loading"] = False
+                messagebox.showerror("Database Error", str(error), parent=history_win)
+
+        def reload():
+            tree.delete(*tree.get_children())
+            page.update(after=None, done=False, loading=False, generation=page["generation"] + 1)
+            for column, (title, sort_column) in headings.items():
+                if sort_column == query["sort_by"]:
+                    title += " ▼" if query["descending"] else " ▲"
+                tree.heading(column, text=title)
+            load_next_page()
+
+        def apply_filters():
+            try:
+                start_date = from_entry.get().strip()
+                end_date = to_entry.get().strip()
+                query["start_date"] = datetime.date.fromisoformat(start_date) if start_date else None
+                query["end_date"] = datetime.date.fromisoformat(end_date) if end_date else None
+            except ValueError:
+                messagebox.showerror("Input Error", "Please enter dates as YYYY-MM-DD.", parent=history_win)
+                return
+            transaction_type = type_menu.get()
+            blood_group = group_menu.get()
+            query["transaction_type"] = None if transaction_type == "All types" else transaction_type
+            query["blood_group"] = None if blood_group == "All groups" else blood_group
+            query["name"] = name_entry.get().strip() or None
+            reload()
+
+        def sort_by(sort_column):
+            # Clicking the current sort column flips the direction
+            if query["sort_by"] == sort_column:
+                query["descending"] = not query["descending"]
+            else:
+                query["sort_by"] = sort_column
+                query["descending"] = sort_column == "transaction_date"
+            reload()
+
+        for column, (title, sort_column) in headings.items():
+            tree.heading(column, text=title, command=lambda c=sort_column: sort_by(c))
+
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            # Near the bottom (or the page doesn't fill the view yet): fetch the next page
+            if float(last) >= 0.9:
+                tree.after_idle(load_next_page)
+
+        ctk.CTkButton(filter_frame, text="Apply", command=apply_filters, width=90).grid(
+            row=0, column=7, padx=5, pady=5
+        )
+
+        # Export streams the whole ledger to a file without blocking this window
+        export_status = ctk.CTkLabel(history_win, text="", font=("Helvetica", 13))
+        export_status.pack(side=tk.BOTTOM, pady=(0, 5))
+        ctk.CTkButton(
+            filter_frame,
+            text="Export...",
+            command=lambda: self.export_in_background("transactions", history_win, export_status),
+            width=90,
+        ).grid(row=0, column=8, padx=5, pady=5)
+        name_entry.bind("<Return>", lambda event: apply_filters())
+
+        tree.configure(yscrollcommand=on_scroll)
+        reload()
+
+    def open_reports(self):
+        """Donation and request totals per day or month, from the DailyBloodTotals summary."""
+        reports_win = ctk.CTkToplevel(self.root)
+        reports_win.title("Reports")
+        reports_win.geometry("900x600")
+
+        filter_frame = ctk.CTkFrame(reports_win)
+        filter_frame.pack(padx=10, pady=(10, 0), fill="x")
+
+        today = datetime.date.today()
+        ctk.CTkLabel(filter_frame, text="From:", font=("Helvetica", 14)).grid(row=0, column=0, padx=5, pady=5)
+        from_entry = ctk.CTkEntry(filter_frame, width=110, placeholder_text="YYYY-MM-DD")
+        from_entry.insert(0, (today - datetime.timedelta(days=29)).isoformat())
+        from_entry.grid(row=0, column=1, padx=5, pady=5)
+
+        ctk.CTkLabel(filter_frame, text="To:", font=("Helvetica", 14)).grid(row=0, column=2, padx=5, pady=5)
+        to_entry = ctk.CTkEntry(filter_frame, width=110, placeholder_text="YYYY-MM-DD")
+        to_entry.insert(0, today.isoformat())
+        to_entry.grid(row=0, column=3, padx=5, pady=5)
+
+        period_menu = ctk.CTkOptionMenu(filter_frame, values=["Daily", "Monthly"], width=110)
+        period_menu.grid(row=0, column=4, padx=5, pady=5)
+
+        group_menu = ctk.CTkOptionMenu(filter_frame, values=["All groups"] + BLOOD_GROUPS, width=110)
+        group_menu.grid(row=0, column=5, padx=5, pady=5)
+
+        report_frame = ctk.CTkFrame(reports_win)
+        report_frame.pack(padx=10, pady=10, fill="both", expand=True)
+
+        headings = {
+            "period": "Day",
+            "blood_group": "Blood Group",
+            "donations": "Donations",
+            "donated_units": "Units Donated",
+            "requests": "Requests",
+            "requested_units": "Units Issued",
+            "net": "Net Units",
+        }
+        tree = ttk.Treeview(report_frame, columns=tuple(headings), show="headings")
+        for column, title in headings.items():
+            tree.heading(column, text=title)
+            tree.column(column, width=110)
+        tree.pack(side=tk.LEFT, fill="both", expand=True)
+
+        scrollbar = ttk.Scrollbar(report_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill="y")
+
+        # Totals for the whole range, per group
+        summary_label = ctk.CTkLabel(reports_win, text="", font=("Helvetica", 13), justify="left")
+        summary_label.pack(padx=10, pady=(0, 10), anchor="w")
+
+        # Bumped on every load so an older, slower answer can't overwrite a newer one
+        loads = {"latest": 0}
+
+        def load_report():
+            try:
+                start_date = datetime.date.fromisoformat(from_entry.get().strip())
+                end_date = datetime.date.fromisoformat(to_entry.get().strip())
+            except ValueError:
+                messagebox.showerror("Input Error", "Please enter dates as YYYY-MM-DD.", parent=reports_win)
+                return
+            blood_group = group_menu.get()
+            blood_group = None if blood_group == "All groups" else blood_group
+            monthly = period_menu.get() == "Monthly"
+            loads["latest"] += 1
+            load_id = loads["latest"]
+
+            def fetch(db):
+                if monthly:
+                    return db.fetch_monthly_totals(start_date, end_date, blood_group)
+                return db.fetch_daily_totals(start_date, end_date, blood_group)
+
+            self.worker.submit(
+                fetch,
+                on_success=lambda rows: show_report(load_id, monthly, rows),
+                owner=reports_win,
+            )
+
+        def show_report(load_id, monthly, rows):
+            if load_id != loads["latest"]:
+                return
+            tree.heading("period", text="Month" if monthly else "Day")
+            tree.delete(*tree.get_children())
+            by_group = {}
+            for row in rows:
+                period = row["month"] if monthly else row["day"].strftime("%Y-%m-%d")
+                net = row["donated_units"] - row["requested_units"]
+                tree.insert(
+                    "",
+                    tk.END,
+                    values=(
+                        period,
+                        row["blood_group"],
+                        row["donations"],
+                        row["donated_units"],
+                        row["requests"],
+                        row["requested_units"],
+                        net,
+                    ),
+                )
+                totals = by_group.setdefault(row["blood_group"], [0, 0])
+                totals[0] += row["donated_units"]
+                totals[1] += row["requested_units"]
+            if not rows:
+                tree.insert("", tk.END, values=("No records found", "-", "-", "-", "-", "-", "-"))
+            summary_label.configure(
+                text="   ".join(
+                    f"{group}: +{donated} / -{issued}"
+                    for group, (donated, issued) in sorted(by_group.items())
+                )
+            )
+
+        ctk.CTkButton(filter_frame, text="Apply", command=load_report, width=90).grid(
+            row=0, column=6, padx=5, pady=5
+        )
+        period_menu.configure(command=lambda _: load_report())
+        group_menu.configure(command=lambda _: load_report())
+
+        load_report()
 
     def refresh_donor_list(self):
-        """Update the donor dropdown menu with the latest donor list."""
-        donors = self.db.fetch_donors()
-        donor_names = [f"{d['name']} ({d['blood_group']})" for d in donors]
-        if self.donate_donor_menu:
-            self.donate_donor_menu.configure(
-                values=donor_names if donor_names else ["No donors registered"]
+        """Forget cached donor searches and re-run the current one."""
+        self.donor_search_cache.clear()
+        if self.donor_search_entry.get().strip() and self.current_donor is None:
+            self.search_donors()
+
+    @staticmethod
+    def donor_label(donor):
+        return f"{donor['name']} ({donor['blood_group']})"
+
+    def on_donor_search_key(self, event):
+        """Debounce typing in the donor search box."""
+        if event.keysym == "Escape":
+            self.hide_donor_results()
+            return
+        if event.keysym == "Down" and self.donor_matches:
+            self.donor_results.focus_set()
+            self.donor_results.selection_clear(0, tk.END)
+            self.donor_results.selection_set(0)
+            self.donor_results.activate(0)
+            return
+        if self.donor_search_after is not None:
+            self.root.after_cancel(self.donor_search_after)
+        self.donor_search_after = self.root.after(
+            config.DONOR_SEARCH_DEBOUNCE_MS, self.search_donors
+        )
+
+    def search_donors(self):
+        """Show donors whose name starts with the search text."""
+        self.donor_search_after = None
+        prefix = self.donor_search_entry.get().strip()
+        if self.current_donor and prefix != self.donor_label(self.current_donor):
+            self.current_donor = None  # the text was edited after a donor was picked
+        if not prefix or self.current_donor:
+            self.hide_donor_results()
+            return
+
+        cached = self.donor_search_cache.get(prefix)
+        if cached is not None:
+            self.show_donor_matches(cached)
+            return
+
+        def on_success(donors):
+            self.donor_search_cache.put(prefix, donors)
+            # Only show them if the user hasn't typed on in the meantime
+            if self.donor_search_entry.get().strip() == prefix and self.current_donor is None:
+                self.show_donor_matches(donors)
+
+        self.worker.submit(lambda db: db.search_donors(prefix), on_success=on_success)
+
+    def show_donor_matches(self, donors):
+        self.donor_matches = donors
+        self.donor_results.delete(0, tk.END)
+        for donor in donors:
+            self.donor_results.insert(tk.END, self.donor_label(donor))
+        if donors:
+            self.donor_results.configure(height=min(len(donors), 8))
+            self.donor_results.place(
+                in_=self.donor_search_entry, relx=0, rely=1, relwidth=1
             )
-            if donor_names:  # If there are donors, set to the first one
-                self.donate_donor_menu.set(donor_names[0])
-                self.on_donor_selected(donor_names[0])
-            else:
-                # Reset current donor if no donors available
-                self.current_donor = None
-                self.donate_units_entry.delete(0, 'end')
+            self.donor_results.lift()
+        else:
+            self.hide_donor_results()
 
-    def on_donor_selected(self, selection):
-        """Handle donor selection from dropdown."""
-        if selection != "No donors registered":
-            try:
-                donor_name = selection.split(" (")[
-                    0
-                ]  # Extract name from "Name (Blood Group)"
-                donor = self.db.get_donor_details(donor_name)
-                if donor:
-                    self.current_donor = donor
-                    # We don't have donate_bg_entry, it's stored in current_donor instead
-            except Exception as e:
-                print(f"Error selecting donor: {e}")
-                self.current_donor = None
+    def hide_donor_results(self):
+        self.donor_results.place_forget()
+
+    def on_donor_result_chosen(self, event=None):
+        selection = self.donor_results.curselection()
+        if not selection:
+            return
+        donor = self.donor_matches[selection[0]]
+        self.donor_search_entry.delete(0, tk.END)
+        self.donor_search_entry.insert(0, self.donor_label(donor))
+        self.hide_donor_results()
+        self.donor_search_entry.focus_set()
+        self.on_donor_selected(donor)
+
+    def clear_donor_selection(self):
+        self.current_donor = None
+        self.selected_donor_id = None
+        self.donor_search_entry.delete(0, tk.END)
+        self.hide_donor_results()
+
+    def on_donor_selected(self, donor):
+        """Load the full record for the donor picked in the search results."""
+        donor_id = donor["id"]
+        self.selected_donor_id = donor_id
+
+        def on_success(details):
+            # Ignore the answer if the user has picked someone else meanwhile
+            if details and self.selected_donor_id == donor_id:
+                self.current_donor = details
+                # We don't have donate_bg_entry, it's stored in current_donor instead
+
+        def on_error(e):
+            print(f"Error selecting donor: {e}")
+            self.current_donor = None
+
+        self.current_donor = None
+        # Keyed on id: same-name donors stay distinct, and repeat picks hit the cache
+        self.worker.submit(
+            lambda db: db.get_donor(donor_id),
+            on_success=on_success,
+            on_error=on_error,
+        )
 
     def open_donor_management(self):
         """Open donor management window to view and delete donors"""
@@ -546,6 +1129,14 @@ class BloodBankUI:
         mgmt_win.title("Donor Management")
         mgmt_win.geometry("800x500")
 
+        # Filter bar
+        filter_frame = ctk.CTkFrame(mgmt_win)
+        filter_frame.pack(padx=10, pady=(10, 0), fill="x")
+        group_menu = ctk.CTkOptionMenu(filter_frame, values=["All groups"] + BLOOD_GROUPS, width=120)
+        group_menu.pack(side=tk.LEFT, padx=5, pady=5)
+        name_entry = ctk.CTkEntry(filter_frame, width=200, placeholder_text="Name starts with")
+        name_entry.pack(side=tk.LEFT, padx=5, pady=5)
+
         # Create frame for donor list
         frame = ctk.CTkFrame(mgmt_win)
         frame.pack(padx=10, pady=10, fill="both", expand=True)
@@ -555,11 +1146,13 @@ class BloodBankUI:
         donor_tree = ttk.Treeview(frame, columns=columns, show="headings", height=15)
         
         # Define column headings
-        donor_tree.heading("id", text="ID")
-        donor_tree.heading("name", text="Name")
-        donor_tree.heading("blood_group", text="Blood Group")
-        donor_tree.heading("contact", text="Contact")
-        donor_tree.heading("donation_date", text="Last Donation Date")
+        headings = {
+            "id": "ID",
+            "name": "Name",
+            "blood_group": "Blood Group",
+            "contact": "Contact",
+            "donation_date": "Last Donation Date",
+        }
         
         # Define column widths
         donor_tree.column("id", width=50)
@@ -569,6 +1162,7 @@ class BloodBankUI:
         donor_tree.column("donation_date", width=150)
         
         donor_tree.pack(side=tk.LEFT, fill="both", expand=True)
+        donor_rows = KeyedTreeview(donor_tree)
         
         # Add scrollbar
         scrollbar = ttk.Scrollbar(frame, orient="vertical", command=donor_tree.yview)
@@ -579,21 +1173,59 @@ class BloodBankUI:
         btn_frame = ctk.CTkFrame(mgmt_win)
         btn_frame.pack(pady=10, padx=10, fill="x")
         
+        # Filters and sort order are applied by the database
+        query = {"sort_by": "name", "descending": False}
+        # Bumped on every load so an older, slower answer can't overwrite a newer one
+        loads = {"latest": 0}
+        
         # Function to populate donor list
         def populate_donor_list():
-            for item in donor_tree.get_children():
-                donor_tree.delete(item)
+            for column, title in headings.items():
+                if column == query["sort_by"]:
+                    title += " ▼" if query["descending"] else " ▲"
+                donor_tree.heading(column, text=title)
             
-            donors = self.db.fetch_full_donor_list()
+            blood_group = group_menu.get()
+            params = dict(
+                query,
+                blood_group=None if blood_group == "All groups" else blood_group,
+                name=name_entry.get().strip() or None,
+            )
+            loads["latest"] += 1
+            load_id = loads["latest"]
+            self.worker.submit(
+                lambda db: db.fetch_full_donor_list(**params),
+                on_success=lambda donors: show_donor_list(load_id, donors),
+                owner=mgmt_win,
+            )
+        
+        def show_donor_list(load_id, donors):
+            if load_id != loads["latest"]:
+                return
+            rows = []
             for donor in donors:
                 donor_date_str = donor["donation_date"].strftime('%Y-%m-%d') if donor["donation_date"] else "Never"
-                donor_tree.insert("", tk.END, values=(
+                rows.append((donor["id"], (
                     donor["id"],
                     donor["name"],
                     donor["blood_group"],
                     donor["contact"],
                     donor_date_str
-                ))
+                )))
+            # Only rows that changed since the last load are touched
+            donor_rows.sync(rows)
+        
+        def sort_by(column):
+            # Clicking the current sort column flips the direction
+            if query["sort_by"] == column:
+                query["descending"] = not query["descending"]
+            else:
+                query["sort_by"] = column
+                query["descending"] = False
+            populate_donor_list()
+        
+        for column, title in headings.items():
+            donor_tree.heading(column, text=title, command=lambda c=column: sort_by(c))
         
         # Function to delete selected donor
         def delete_selected_donor():
@@ -606,17 +1238,21 @@ class BloodBankUI:
             donor_name = donor_tree.item(selected_item[0])['values'][1]
             
             if messagebox.askyesno("Delete Donor", f"Are you sure you want to delete donor {donor_name}? This action cannot be undone."):
-                success = self.db.delete_donor(donor_id)
-                if success:
-                    messagebox.showinfo("Success", f"Donor {donor_name} has been deleted")
-                    populate_donor_list()  # Refresh the list
-                    try:
-                        self.refresh_donor_list()  # Update the dropdown in main window
-                    except Exception as e:
-                        print(f"Error refreshing donor list: {e}")
-                        messagebox.showinfo("Note", "Donor deleted, but you may need to restart to see changes in the main screen.")
-                else:
-                    messagebox.showerror("Error", "Could not delete donor. Please try again.")
+                self.worker.submit(
+                    lambda db: db.delete_donor(donor_id),
+                    on_success=lambda success: on_deleted(success, donor_id, donor_name),
+                    owner=mgmt_win,
+                )
+        
+        def on_deleted(success, donor_id, donor_name):
+            if success:
+                messagebox.showinfo("Success", f"Donor {donor_name} has been deleted")
+                if self.current_donor and self.current_donor["id"] == donor_id:
+                    self.clear_donor_selection()
+                populate_donor_list()  # Refresh the list
+                self.refresh_donor_list()  # Update the dropdown in main window
+            else:
+                messagebox.showerror("Error", "Could not delete donor. Please try again.")
         
         # Add buttons
         delete_btn = ctk.CTkButton(
@@ -639,9 +1275,137 @@ class BloodBankUI:
         )
         refresh_btn.pack(side=tk.RIGHT, padx=5, pady=5)
         
+        export_status = ctk.CTkLabel(mgmt_win, text="", font=("Helvetica", 13))
+        export_status.pack(side=tk.BOTTOM, pady=(0, 5))
+        export_btn = ctk.CTkButton(
+            btn_frame,
+            text="Export Donors...",
+            command=lambda: self.export_in_background("donors", mgmt_win, export_status),
+            width=200,
+            height=40,
+            font=("Helvetica", 14, "bold"),
+        )
+        export_btn.pack(side=tk.RIGHT, padx=5, pady=5)
+        
+        # Filters apply on the Apply button, Enter in the name box, or a new group choice
+        ctk.CTkButton(filter_frame, text="Apply", command=populate_donor_list, width=90).pack(
+            side=tk.LEFT, padx=5, pady=5
+        )
+        group_menu.configure(command=lambda _: populate_donor_list())
+        name_entry.bind("<Return>", lambda event: populate_donor_list())
+        
         # Initially populate the donor list
         populate_donor_list()
 
+    def export_in_background(self, table, owner, status_label):
+        """Ask for a file and stream `table` into it as a background job."""
+        path = filedialog.asksaveasfilename(
+            parent=owner,
+            title="Export",
+            initialfile=f"{table}.csv",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Parquet", "*.parquet")],
+        )
+        if not path:
+            return
+
+        def job(db, report, cancelled):
+            # Stops (and removes the partial file) if the window is closed
+            return export.export_table(table, path, db=db, progress=report, cancelled=cancelled)
+
+        def on_progress(done, total):
+            status_label.configure(text=f"Exporting... {done:,} / {total:,} rows")
+
+        def on_success(written):
+            status_label.configure(text="")
+            messagebox.showinfo("Export", f"Exported {written:,} rows to {path}", parent=owner)
+
+        def on_error(e):
+            status_label.configure(text="")
+            messagebox.showerror("Export Error", f"Export failed: {str(e)}", parent=owner)
+
+        status_label.configure(text="Exporting...")
+        self.worker.start_job(
+            job, on_progress=on_progress, on_success=on_success, on_error=on_error, owner=owner
+        )
+
+    def open_diagnostics(self):
+        """Live per-method counters from the data layer instrumentation."""
+        diag_win = ctk.CTkToplevel(self.root)
+        diag_win.title("Diagnostics")
+        diag_win.geometry("1000x500")
+
+        frame = ctk.CTkFrame(diag_win)
+        frame.pack(padx=10, pady=10, fill="both", expand=True)
+
+        headings = {
+            "method": "Method",
+            "calls": "Calls",
+            "errors": "Errors",
+            "rows": "Rows",
+            "mean_ms": "Mean ms",
+            "p50_ms": "p50 ms",
+            "p95_ms": "p95 ms",
+            "p99_ms": "p99 ms",
+            "max_ms": "Max ms",
+        }
+        stats_tree = ttk.Treeview(frame, columns=tuple(headings), show="headings", height=15)
+        for column, title in headings.items():
+            stats_tree.heading(column, text=title)
+            if column == "method":
+                stats_tree.column(column, width=260, anchor="w")
+            else:
+                stats_tree.column(column, width=80, anchor="e")
+        stats_tree.pack(side=tk.LEFT, fill="both", expand=True)
+        stats_rows = KeyedTreeview(stats_tree)
+
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=stats_tree.yview)
+        stats_tree.configure(yscroll=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill="y")
+
+        btn_frame = ctk.CTkFrame(diag_win)
+        btn_frame.pack(pady=(0, 10), padx=10, fill="x")
+        since_label = ctk.CTkLabel(btn_frame, text="", font=("Helvetica", 13))
+        since_label.pack(side=tk.LEFT, padx=10)
+
+        def refresh():
+            if not diag_win.winfo_exists():
+                return
+            rows = []
+            for method, stats in instrumentation.metrics.snapshot().items():
+                rows.append((method, [method] + [stats[c] for c in headings if c != "method"]))
+            stats_rows.sync(rows)
+            slow_log = config.SLOW_QUERY_LOG or "disabled"
+            since_label.configure(
+                text=f"Since {instrumentation.metrics.started:%H:%M:%S}. "
+                f"Slow query log (>= {config.SLOW_QUERY_MS} ms): {slow_log}"
+            )
+            # Counters are in memory, so refreshing costs no database work
+            diag_win.after(1000, refresh)
+
+        def reset():
+            instrumentation.metrics.reset()
+            stats_rows.clear()
+
+        def dump_now():
+            try:
+                instrumentation.dump()
+                messagebox.showinfo(
+                    "Diagnostics", f"Metrics written to {config.METRICS_DUMP_PATH}", parent=diag_win
+                )
+            except OSError as e:
+                messagebox.showerror("Diagnostics", f"Could not write metrics: {e}", parent=diag_win)
+
+        ctk.CTkButton(btn_frame, text="Reset Counters", command=reset, width=160).pack(
+            side=tk.RIGHT, padx=5, pady=5
+        )
+        if config.METRICS_DUMP_PATH:
+            ctk.CTkButton(btn_frame, text="Write Metrics File", command=dump_now, width=160).pack(
+                side=tk.RIGHT, padx=5, pady=5
+            )
+
+        refresh()
+
     def logout(self):
         """Handle logout properly"""
         if messagebox.askyesno("Logout", "Are you sure you want to logout?"):
@@ -651,8 +1415,8 @@ class BloodBankUI:
                 for after_id in pending:
                     self.root.after_cancel(after_id)
                     
-            # Close database connection
-            self.db.close_connection()
+            # Stop background work and return its connections to the pool
+            self.worker.shutdown()
             
             # Destroy current window
             self.root.destroy()
@@ -664,9 +1428,9 @@ class BloodBankUI:
 
     def on_closing(self):
         """Handle window closing properly to avoid Tkinter after script errors"""
-        # Properly close the database connection
-        if hasattr(self, 'db'):
-            self.db.close_connection()
+        # Stop background work and return its connections to the pool
+        if hasattr(self, 'worker'):
+            self.worker.shutdown()
             
         # Cancel any pending 'after' events
         pending = self.root.tk.call('after', 'info')
@@ -0,0 +1,49 @@
+# widgets.py
+
+
+class KeyedTreeview:
+    """
+    Keeps a ttk.Treeview in step with a list of keyed rows.
+
+    sync() compares the new rows with what is on screen and only inserts,
+    updates, moves or deletes the items that changed, so refreshing a large
+    list after a small change costs a handful of Tk calls instead of one per
+    row, and the view doesn't flicker. Items use str(key) as their iid.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self._values = {}  # iid -> values currently displayed
+        self._order = []  # iids in display order
+
+    def sync(self, rows):
+        """Show rows, an iterable of (key, values) in display order."""
+        rows = [(str(key), tuple(values)) for key, values in rows]
+
+        wanted = {iid for iid, _ in rows}
+        stale = [iid for iid in self._order if iid not in wanted]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                del self._values[iid]
+            self._order = [iid for iid in self._order if iid in wanted]
+
+        for index, (iid, values) in enumerate(rows):
+            if iid not in self._values:
+                self.tree.insert("", index, iid=iid, values=values)
+                self._order.insert(index, iid)
+            else:
+                if self._values[iid] != values:
+                    self.tree.item(iid, values=values)
+                if self._order[index] != iid:
+                    self.tree.move(iid, "", index)
+                    self._order.remove(iid)
+                    self._order.insert(index, iid)
+            self._values[iid] = values
+
+    def clear(self):
+        """Remove every row."""
+        if self._order:
+            self.tree.delete(*self._order)
+        self._values.clear()
+        self._order.clear()